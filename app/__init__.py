@@ -6,6 +6,17 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from tortoise.contrib.fastapi import register_tortoise
 from logger import setup_logger
 from app.routes import register_routes
+from app.handlers.ingestion_queue import ingestion_queue
+from app.handlers.media_queue import media_queue
+from app.handlers.activity_counters import activity_compactor
+from app.handlers.analytics_handlers import register_signals as register_analytics_signals
+from app.handlers.retention import retention_worker
+from app.handlers.bot_registry import bot_registry
+from app.utils.passwords import password_hasher
+from app.utils.http_client import http_client
+from app.scheduler.scheduler import scheduler
+from app.s3.s3_manager import s3_manager
+from app.yandex_funcs.transcoder import audio_transcoder
 from config import Settings
 
 
@@ -26,9 +37,38 @@ def create_app() -> FastAPI:
         # generate_schemas=True,
         add_exception_handlers=True,
     )
+    # Сводка расхода токенов обновляется сигналами моделей AnalysisResult
+    register_analytics_signals()
 
     setup_logger()
     # Регистрация маршрутов
     register_routes(app)
 
+    @app.on_event("startup")
+    async def startup_services():
+        await bot_registry.load()
+        await s3_manager.start()
+        await http_client.start()
+        await ingestion_queue.start()
+        await media_queue.start()
+        await audio_transcoder.start()
+        await activity_compactor.start()
+        await retention_worker.start()
+        if settings.SCHEDULER_ENABLED:
+            await scheduler.start()
+
+    async def shutdown_services():
+        await scheduler.stop()
+        await ingestion_queue.stop(timeout=settings.INGEST_DRAIN_TIMEOUT)
+        await media_queue.stop(timeout=settings.INGEST_DRAIN_TIMEOUT)
+        await audio_transcoder.stop()
+        await activity_compactor.stop()
+        await retention_worker.stop()
+        password_hasher.shutdown()
+        await s3_manager.close()
+        await http_client.close()
+
+    # Воркеры должны дописать данные до закрытия соединений Tortoise
+    app.router.on_shutdown.insert(0, shutdown_services)
+
     return app
@@ -0,0 +1,127 @@
+from collections import Counter
+from time import time
+from loguru import logger
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F, Q
+from tortoise.transactions import in_transaction
+from config import Settings
+from app.database.models import ChatActivity, Message
+from app.utils.workers import PeriodicWorker
+
+settings = Settings()
+
+HOUR = 3600
+DAY = 86400
+GRANULARITY_SECONDS = {"hour": HOUR, "day": DAY}
+
+
+async def _increment(key: dict, count: int, using_db=None):
+    """UPDATE ... SET messages_count = messages_count + n, при отсутствии строки — INSERT."""
+    updated = await ChatActivity.filter(**key).using_db(using_db).update(
+        messages_count=F("messages_count") + count)
+    if updated:
+        return
+    try:
+        await ChatActivity.create(**key, messages_count=count, using_db=using_db)
+    except IntegrityError:
+        if using_db is not None:
+            raise
+        # Строку только что создал другой воркер
+        await ChatActivity.filter(**key).update(messages_count=F("messages_count") + count)
+
+
+async def record_activity(records: list[dict]):
+    """Добавляет пачку принятых сообщений в часовые счётчики."""
+    counts = Counter(
+        (r["chat_id"], r["user_id"], r["timestamp"] - r["timestamp"] % HOUR) for r in records)
+    for (chat_id, user_id, bucket_start), count in counts.items():
+        await _increment({
+            "chat_id": chat_id,
+            "user_id": user_id,
+            "granularity": "hour",
+            "bucket_start": bucket_start,
+        }, count)
+
+
+async def has_activity(chat_id: int, since: int) -> bool:
+    """
+    Были ли в чате сообщения с timestamp или временем приёма не раньше since.
+    Счётчики отвечают с точностью до корзины и служат быстрым путём для
+    положительного ответа. Отрицательный ответ проверяется по messages:
+    обновление счётчиков может не пройти, а опоздавшее сообщение попадает
+    в старую корзину.
+    """
+    if await ChatActivity.filter(
+        Q(granularity="hour", bucket_start__gte=since - since % HOUR)
+        | Q(granularity="day", bucket_start__gte=since - since % DAY),
+        chat_id=chat_id,
+        messages_count__gt=0,
+    ).exists():
+        return True
+    return await Message.filter(
+        Q(timestamp__gte=since) | Q(received_at__gte=since), chat_id=chat_id).exists()
+
+
+async def compact_activity(older_than: int, batch_size: int = 5000) -> int:
+    """
+    Сворачивает часовые корзины раньше older_than в суточные.
+    Каждая пачка — одна транзакция: суточные счётчики увеличиваются и
+    часовые строки удаляются вместе. Строки, которые уже сворачивает
+    другой воркер, пропускаются (SKIP LOCKED).
+    """
+    cutoff = older_than - older_than % DAY
+    compacted = 0
+    while True:
+        try:
+            async with in_transaction() as connection:
+                rows = await ChatActivity.filter(
+                    granularity="hour", bucket_start__lt=cutoff
+                ).select_for_update(skip_locked=True).using_db(connection).limit(
+                    batch_size).values_list(
+                        "activity_id", "chat_id", "user_id", "bucket_start", "messages_count")
+                if not rows:
+                    return compacted
+
+                days = Counter()
+                for _, chat_id, user_id, bucket_start, count in rows:
+                    days[(chat_id, user_id, bucket_start - bucket_start % DAY)] += count
+                for (chat_id, user_id, day_start), count in days.items():
+                    await _increment({
+                        "chat_id": chat_id,
+                        "user_id": user_id,
+                        "granularity": "day",
+                        "bucket_start": day_start,
+                    }, count, using_db=connection)
+                await ChatActivity.filter(
+                    activity_id__in=[row[0] for row in rows]
+                ).using_db(connection).delete()
+        except IntegrityError:
+            logger.warning("Суточный счётчик создан параллельно, сжатие повторим позже")
+            return compacted
+        compacted += len(rows)
+        if len(rows) < batch_size:
+            return compacted
+
+
+class ActivityCompactor(PeriodicWorker):
+    """Фоновое сжатие часовых счётчиков старше retention_days."""
+
+    started_message = "🗜 Сжатие счётчиков активности запущено"
+
+    def __init__(self, interval: float = 3600, retention_days: int = 7):
+        super().__init__(interval)
+        self.retention_days = retention_days
+        self.compacted = 0
+
+    async def run_once(self) -> int:
+        compacted = await compact_activity(int(time()) - self.retention_days * DAY)
+        self.compacted += compacted
+        if compacted:
+            logger.info(f"Свёрнуто часовых счётчиков: {compacted}")
+        return compacted
+
+
+activity_compactor = ActivityCompactor(
+    interval=settings.ACTIVITY_COMPACT_INTERVAL,
+    retention_days=settings.ACTIVITY_HOURLY_RETENTION_DAYS,
+)
@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+from loguru import logger
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F
+from tortoise.signals import Signals
+from app.database.models import AnalysisResult, AnalysisUsage
+
+# Модели, на сигналы которых сводка уже подписана
+_registered: set = set()
+
+
+def usage_day(timestamp: int):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).date()
+
+
+async def record_usage(result: AnalysisResult, sign: int = 1):
+    """
+    Добавляет (sign=1) или вычитает (sign=-1) результат анализа из суточной
+    сводки. Счётчики меняются атомарным UPDATE ... SET x = x + n, поэтому
+    параллельные записи из разных воркеров не теряются.
+    """
+    key = {
+        "company_id": result.company_id,
+        "day": usage_day(result.created_at),
+        "chat_id": result.chat_id or 0,
+        "prompt_id": result.prompt_id,
+    }
+    changes = {
+        "analyses_count": F("analyses_count") + sign,
+        "tokens_input": F("tokens_input") + sign * result.tokens_input,
+        "tokens_output": F("tokens_output") + sign * result.tokens_output,
+    }
+    if await AnalysisUsage.filter(**key).update(**changes) or sign < 0:
+        return
+    try:
+        await AnalysisUsage.create(
+            **key,
+            analyses_count=1,
+            tokens_input=result.tokens_input,
+            tokens_output=result.tokens_output,
+        )
+    except IntegrityError:
+        # Строку за этот день только что создал другой воркер
+        await AnalysisUsage.filter(**key).update(**changes)
+
+
+async def _on_analysis_saved(sender, instance: AnalysisResult, created: bool, *args):
+    if not created:
+        return
+    try:
+        await record_usage(instance)
+    except Exception:
+        logger.exception(f"Не удалось обновить сводку по анализу {instance.analysis_id}")
+
+
+async def _on_analysis_deleted(sender, instance: AnalysisResult, *args):
+    try:
+        await record_usage(instance, sign=-1)
+    except Exception:
+        logger.exception(f"Не удалось вычесть из сводки анализ {instance.analysis_id}")
+
+
+def register_signals():
+    """
+    Подписывает суточную сводку на создание и удаление AnalysisResult.
+    Повторный вызов (второй create_app()) ничего не делает.
+
+    Сигналы срабатывают только для save()/create()/delete() экземпляра:
+    QuerySet.update()/delete() и каскадное удаление (компании, чата,
+    промпта) сводку не меняют — после них её нужно пересчитать.
+    """
+    if AnalysisResult in _registered:
+        return
+    _registered.add(AnalysisResult)
+    AnalysisResult.register_listener(Signals.post_save, _on_analysis_saved)
+    AnalysisResult.register_listener(Signals.post_delete, _on_analysis_deleted)
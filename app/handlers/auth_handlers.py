@@ -3,9 +3,11 @@ from jose import JWTError, jwt
 from fastapi import HTTPException, Security, status
 from fastapi.security import HTTPAuthorizationCredentials
 from loguru import logger
+from tortoise.signals import post_save, post_delete
 from config import Settings
-from app.database.models import AdminUser
+from app.database.models import AdminUser, Company
 from app.auth_schemas import bearer_scheme
+from app.utils.cache import LRUCache
 
 # Конфигурация JWT
 settings = Settings()
@@ -14,6 +16,10 @@ ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = int(settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 REFRESH_TOKEN_EXPIRE_DAYS = int(settings.REFRESH_TOKEN_EXPIRE_DAYS)
 
+# Кэш AdminUser (вместе с company) по sub из токена
+principal_cache = LRUCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
+
 
 # Создание токена
 
@@ -34,12 +40,39 @@ def create_refresh_token(data: dict):
 
 
 async def get_current_admin(username: str) -> AdminUser:
+    user = principal_cache.get(username)
+    if user is not None:
+        return user
+
     user = await AdminUser.filter(username=username).prefetch_related("company").first()
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
+    principal_cache.set(username, user)
     return user
 
 
+def invalidate_admin(username: str):
+    principal_cache.pop(username)
+
+
+def invalidate_company(company_id):
+    principal_cache.pop_where(lambda user: user.company_id == company_id)
+
+
+@post_save(AdminUser)
+@post_delete(AdminUser)
+async def _on_admin_changed(sender, instance: AdminUser, *args):
+    # Пользователя могли переименовать, поэтому ищем и по admin_id
+    invalidate_admin(instance.username)
+    principal_cache.pop_where(lambda user: user.admin_id == instance.admin_id)
+
+
+@post_save(Company)
+@post_delete(Company)
+async def _on_company_changed(sender, instance: Company, *args):
+    invalidate_company(instance.company_id)
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(bearer_scheme)) -> str:
     """
     Проверяет токен из заголовка Authorization и возвращает имя пользователя.
@@ -87,7 +120,7 @@ async def login_handler(username: str, password: str):
     if not user:
         return None  # Возвращаем None, если пользователь не найден
 
-    check_password = user.check_password(password)
+    check_password = await user.check_password(password)
     if check_password:
         return user
 
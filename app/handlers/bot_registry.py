@@ -0,0 +1,87 @@
+import asyncio
+from time import monotonic
+from loguru import logger
+from config import Settings
+from app.database.models import BotInfo
+
+settings = Settings()
+
+
+class BotRegistry:
+    """
+    Кэш активных ботов в памяти процесса: secret_token -> BotInfo.
+    Целиком перечитывается из БД раз в ttl секунд; регистрация и
+    деактивация бота в этом процессе обновляют кэш сразу.
+    """
+
+    def __init__(self, ttl: float = 300, max_unknown: int = 10000):
+        self.ttl = ttl
+        self.max_unknown = max_unknown
+        self._by_secret: dict[str, BotInfo] = {}
+        self._unknown: set[str] = set()
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self) -> bool:
+        return self._loaded_at is None or monotonic() - self._loaded_at > self.ttl
+
+    async def load(self):
+        bots = await BotInfo.filter(is_active=True, secret_token__isnull=False)
+        self._by_secret = {bot.secret_token: bot for bot in bots}
+        self._unknown = set()
+        self._loaded_at = monotonic()
+        logger.info(f"Загружено активных ботов в кэш: {len(bots)}")
+
+    async def get(self, secret_token: str) -> BotInfo | None:
+        if self._expired():
+            async with self._lock:
+                if self._expired():
+                    await self.load()
+
+        bot = self._by_secret.get(secret_token)
+        if bot is not None:
+            self.hits += 1
+            return bot
+
+        self.misses += 1
+        if secret_token in self._unknown:
+            return None
+
+        # Бот мог быть зарегистрирован в другом воркере после загрузки кэша
+        bot = await BotInfo.get_or_none(secret_token=secret_token, is_active=True)
+        if bot is None:
+            if len(self._unknown) >= self.max_unknown:
+                self._unknown.clear()
+            self._unknown.add(secret_token)
+            return None
+        self._by_secret[secret_token] = bot
+        return bot
+
+    def put(self, bot: BotInfo):
+        self.invalidate(bot.bot_id)
+        if bot.is_active and bot.secret_token:
+            self._by_secret[bot.secret_token] = bot
+            self._unknown.discard(bot.secret_token)
+
+    def invalidate(self, bot_id: int):
+        self._by_secret = {
+            secret: bot for secret, bot in self._by_secret.items() if bot.bot_id != bot_id
+        }
+
+    def invalidate_all(self):
+        self._by_secret = {}
+        self._unknown = set()
+        self._loaded_at = None
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._by_secret),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+bot_registry = BotRegistry(ttl=settings.BOT_REGISTRY_TTL)
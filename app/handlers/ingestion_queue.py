@@ -0,0 +1,104 @@
+import asyncio
+from loguru import logger
+from config import Settings
+from app.handlers.telegram_handlers import save_messages
+from app.utils.workers import BackgroundWorker
+
+settings = Settings()
+
+
+class IngestionQueueFull(Exception):
+    """Очередь переполнена — вебхук должен ответить ошибкой, Telegram повторит запрос."""
+
+
+class MessageIngestionQueue(BackgroundWorker):
+    """
+    Внутрипроцессная очередь приёма сообщений.
+    Вебхук только кладёт запись в очередь, фоновый воркер пишет
+    сообщения в БД пачками — по размеру пачки или по таймеру.
+    """
+
+    started_message = "🚀 Очередь приёма сообщений запущена"
+    stopped_message = "🛑 Очередь приёма сообщений остановлена"
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        put_timeout: float = 2.0,
+        max_retries: int = 3,
+    ):
+        super().__init__(queue_size=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+
+        self.saved = 0
+        self.dropped = 0
+
+    async def submit(self, record: dict):
+        """
+        Кладёт запись в очередь. Если очередь не освобождается за put_timeout,
+        выбрасывает IngestionQueueFull (backpressure).
+        """
+        if not self.accepting:
+            raise IngestionQueueFull("Очередь не принимает сообщения")
+        try:
+            await self._put(record, self.put_timeout)
+        except asyncio.TimeoutError as exc:
+            logger.warning("⚠️ Очередь приёма сообщений переполнена")
+            raise IngestionQueueFull("Очередь переполнена") from exc
+
+    async def _collect_batch(self) -> list[dict]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush(self, batch: list[dict]):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self.saved += await save_messages(batch)
+                logger.debug(f"Записана пачка сообщений: {len(batch)}")
+                return
+            except Exception:
+                logger.exception(
+                    f"Ошибка записи пачки сообщений (попытка {attempt}/{self.max_retries})")
+                await asyncio.sleep(0.5 * attempt)
+        self.dropped += len(batch)
+        logger.error(f"❌ Пачка из {len(batch)} сообщений потеряна")
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.qsize(),
+            "max_size": self.queue_size,
+            "saved": self.saved,
+            "dropped": self.dropped,
+        }
+
+
+ingestion_queue = MessageIngestionQueue(
+    max_size=settings.INGEST_QUEUE_SIZE,
+    batch_size=settings.INGEST_BATCH_SIZE,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL,
+    put_timeout=settings.INGEST_PUT_TIMEOUT,
+)
@@ -0,0 +1,94 @@
+import asyncio
+from typing import AsyncIterator
+from loguru import logger
+from config import Settings
+from app.database.models import Message
+from app.s3.media_store import store_media_stream
+from app.utils.http_client import http_client
+from app.utils.workers import BackgroundWorker
+
+settings = Settings()
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+
+async def open_telegram_file(bot_token: str, file_id: str) -> AsyncIterator[bytes] | None:
+    """Поток содержимого файла через getFile Bot API; None — файл недоступен."""
+    _, data = await http_client.request_json(
+        "GET", f"{TELEGRAM_API_URL}/bot{bot_token}/getFile", params={"file_id": file_id})
+    if not data or not data.get("ok"):
+        logger.warning(f"getFile не вернул файл {file_id}: {data}")
+        return None
+    return http_client.iter_bytes(
+        f"{TELEGRAM_API_URL}/file/bot{bot_token}/{data['result']['file_path']}")
+
+
+class MediaIngestionQueue(BackgroundWorker):
+    """
+    Загрузка медиафайлов принятых сообщений в S3 вне пишущего воркера
+    очереди приёма: сообщения сохраняются сразу без s3_key, а файл
+    скачивается потоком, кладётся в S3 (store_media_stream) и только затем
+    привязывается к сообщениям. Задача не ждёт места в очереди: при
+    переполнении она отбрасывается, и сообщение остаётся без s3_key.
+    """
+
+    started_message = "📎 Загрузка медиафайлов запущена, потоков: {self.concurrency}"
+    stopped_message = "🛑 Загрузка медиафайлов остановлена"
+
+    def __init__(self, workers: int = 4, max_queue: int = 1000, max_bytes: int = 20 * 1024 * 1024):
+        super().__init__(concurrency=workers, queue_size=max_queue)
+        self.max_bytes = max_bytes
+        self.stored = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, message_ids: list, media: dict) -> bool:
+        """Ставит загрузку файла для сообщений message_ids; False — задача отброшена."""
+        if not self.accepting:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait((message_ids, media))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"⚠️ Очередь медиафайлов переполнена, файл {media['file_id']} пропущен")
+            return False
+        return True
+
+    async def _store(self, media: dict) -> str | None:
+        if (media["file_size"] or 0) > self.max_bytes:
+            logger.warning(f"Файл {media['file_id']} больше лимита getFile, пропущен")
+            return None
+        chunks = await open_telegram_file(media["bot_token"], media["file_id"])
+        if chunks is None:
+            return None
+        return await store_media_stream(chunks, media["file_unique_id"])
+
+    async def _run(self):
+        while True:
+            message_ids, media = await self._queue.get()
+            try:
+                key = await self._store(media)
+                if key is not None:
+                    await Message.filter(message_id__in=message_ids).update(s3_key=key)
+                    self.stored += 1
+            except Exception:
+                self.failed += 1
+                logger.exception(f"Не удалось сохранить медиафайл {media['file_id']}")
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "stored": self.stored,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+media_queue = MediaIngestionQueue(
+    workers=settings.INGEST_MEDIA_CONCURRENCY,
+    max_queue=settings.INGEST_MEDIA_QUEUE_SIZE,
+    max_bytes=settings.INGEST_MEDIA_MAX_BYTES,
+)
@@ -0,0 +1,115 @@
+from time import time
+from typing import NamedTuple
+from loguru import logger
+from tortoise.transactions import in_transaction
+from config import Settings
+from app.database.models import Company, Message, MessageArchive
+from app.s3.message_archive import upload_segment
+from app.s3.s3_manager import AsyncS3Manager, s3_manager
+from app.utils.helpers import MessageRow
+from app.utils.workers import PeriodicWorker
+
+settings = Settings()
+
+DAY = 86400
+
+
+class ArchiveConflict(Exception):
+    """Часть сообщений сегмента уже удалена другим воркером."""
+
+
+class ArchiveBatches(NamedTuple):
+    """Сообщений в одном сегменте и в одном DELETE при переносе."""
+    segment_size: int = settings.ARCHIVE_SEGMENT_SIZE
+    delete_batch: int = settings.ARCHIVE_DELETE_BATCH
+
+
+async def archive_company(
+    company_id,
+    retention_days: int,
+    now: int | None = None,
+    batches: ArchiveBatches = ArchiveBatches(),
+    manager: AsyncS3Manager = s3_manager,
+) -> int:
+    """
+    Переносит сообщения компании старше retention_days (по границе суток UTC)
+    в архив S3 сегментами по batches.segment_size, от старых к новым.
+    Сегмент сначала загружается, затем в одной транзакции записывается
+    MessageArchive и удаляются его сообщения пачками по batches.delete_batch.
+    Возвращает число перенесённых сообщений.
+    """
+    cutoff = (now or int(time())) - retention_days * DAY
+    cutoff -= cutoff % DAY
+    archived = 0
+    while True:
+        rows = [
+            MessageRow(*row)
+            for row in await Message.filter(
+                chat__company=company_id, timestamp__lt=cutoff
+            ).order_by("timestamp", "message_id").limit(batches.segment_size).values_list(
+                *MessageRow._fields)
+        ]
+        if not rows:
+            return archived
+
+        key, size = await upload_segment(company_id, rows, manager)
+        try:
+            async with in_transaction() as connection:
+                await MessageArchive.create(
+                    company_id=company_id,
+                    s3_key=key,
+                    ts_from=rows[0].timestamp,
+                    ts_to=rows[-1].timestamp,
+                    messages_count=len(rows),
+                    size=size,
+                    using_db=connection,
+                )
+                deleted = 0
+                for start in range(0, len(rows), batches.delete_batch):
+                    batch = rows[start:start + batches.delete_batch]
+                    deleted += await Message.filter(
+                        message_id__in=[row.message_id for row in batch]
+                    ).using_db(connection).delete()
+                if deleted != len(rows):
+                    raise ArchiveConflict(f"удалено {deleted} из {len(rows)}")
+        except Exception as e:
+            # Сегмент без записи в message_archives никто не прочитает
+            await manager.delete_object(key)
+            if isinstance(e, ArchiveConflict):
+                logger.warning(f"Архивирование компании {company_id} прервано: {e}")
+                return archived
+            raise
+        archived += len(rows)
+        logger.info(f"🗄 Компания {company_id}: в архив {key} перенесено сообщений: {len(rows)}")
+        if len(rows) < batches.segment_size:
+            return archived
+
+
+class RetentionWorker(PeriodicWorker):
+    """Периодически применяет политики хранения всех компаний."""
+
+    started_message = "🗄 Архивирование сообщений по политикам хранения запущено"
+
+    def __init__(self, interval: float = 21600):
+        super().__init__(interval)
+        self.archived = 0
+        self.failed = 0
+
+    async def run_once(self) -> int:
+        archived = 0
+        policies = await Company.filter(message_retention_days__isnull=False).values_list(
+            "company_id", "message_retention_days")
+        for company_id, retention_days in policies:
+            try:
+                archived += await archive_company(company_id, retention_days)
+            except Exception:
+                self.failed += 1
+                logger.exception(f"Ошибка архивирования сообщений компании {company_id}")
+        self.archived += archived
+        return archived
+
+    def stats(self) -> dict:
+        return {"archived": self.archived, "failed": self.failed}
+
+
+retention_worker = RetentionWorker(interval=settings.RETENTION_INTERVAL)
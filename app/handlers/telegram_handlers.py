@@ -1,4 +1,213 @@
+from time import time
+from loguru import logger
+from config import Settings
+from app.database.models import Chat, MediaObject, Message, User, UserRole, UserRoleEnum
+from app.handlers.activity_counters import record_activity
+from app.handlers.media_queue import media_queue
+from app.search.message_search import message_search
+
+settings = Settings()
+
+# Поля сообщения с файлом; у photo — список размеров, берём самый большой
+MEDIA_KINDS = ("voice", "audio", "video_note", "video", "animation", "document", "photo")
+
+
+def _media(bot, message: dict) -> dict | None:
+    for kind in MEDIA_KINDS:
+        media = message.get(kind)
+        if isinstance(media, list):
+            media = media[-1] if media else None
+        if media and media.get("file_id"):
+            return {
+                "bot_token": bot.bot_token,
+                "file_id": media["file_id"],
+                "file_unique_id": media.get("file_unique_id"),
+                "file_size": media.get("file_size"),
+            }
+    return None
+
+
+def parse_update(bot, payload: dict) -> dict | None:
+    """
+    Достаёт из апдейта Telegram данные сообщения.
+    Возвращает None, если апдейт не содержит сообщения. Посты каналов
+    не принимаются: у них нет автора-пользователя (from), только sender_chat.
+    """
+    message = payload.get("message") or payload.get("edited_message")
+    if not message:
+        return None
+
+    sender = message.get("from") or {}
+    chat = message.get("chat") or {}
+    if not sender.get("id") or not chat.get("id"):
+        return None
+
+    full_name = " ".join(
+        part for part in (sender.get("first_name"), sender.get("last_name")) if part
+    )
+    return {
+        "company_id": bot.company_id,
+        "user_id": sender["id"],
+        "username": sender.get("username"),
+        "account_name": full_name or None,
+        "chat_id": chat["id"],
+        "chat_name": chat.get("title") or chat.get("username"),
+        "telegram_message_id": message.get("message_id"),
+        "timestamp": message.get("date") or int(time()),
+        "text": message.get("text") or message.get("caption"),
+        "media": _media(bot, message) if settings.INGEST_MEDIA else None,
+    }
+
+
+async def _ensure_chats(records: list[dict]):
+    chats = {r["chat_id"]: r for r in records}
+    existing = set(await Chat.filter(chat_id__in=list(chats)).values_list("chat_id", flat=True))
+    missing = [
+        Chat(chat_id=chat_id, chat_name=r["chat_name"], company_id=r["company_id"])
+        for chat_id, r in chats.items() if chat_id not in existing
+    ]
+    if missing:
+        await Chat.bulk_create(missing, ignore_conflicts=True)
+        logger.info(f"Добавлено новых чатов: {len(missing)}")
+
+
+async def _ensure_users(records: list[dict]):
+    users = {r["user_id"]: r for r in records}
+    existing = set(await User.filter(user_id__in=list(users)).values_list("user_id", flat=True))
+    missing = [r for user_id, r in users.items() if user_id not in existing]
+    if not missing:
+        return
+
+    role, _ = await UserRole.get_or_create(
+        role_id=UserRoleEnum.USER, defaults={"role_name": "Пользователь"})
+    await User.bulk_create([
+        User(
+            user_id=r["user_id"],
+            username=r["username"],
+            account_name=r["account_name"],
+            role=role,
+            company_id=r["company_id"],
+        )
+        for r in missing
+    ], ignore_conflicts=True)
+    logger.info(f"Добавлено новых пользователей: {len(missing)}")
+
+
+def _message_key(record: dict):
+    if record.get("telegram_message_id") is None:
+        return None
+    return record["chat_id"], record["telegram_message_id"]
+
+
+async def _existing_messages(records: list[dict]) -> dict[tuple, Message]:
+    keys = {_message_key(r) for r in records} - {None}
+    if not keys:
+        return {}
+    messages = await Message.filter(
+        chat_id__in={chat_id for chat_id, _ in keys},
+        telegram_message_id__in={message_id for _, message_id in keys},
+    )
+    return {
+        (m.chat_id, m.telegram_message_id): m for m in messages
+        if (m.chat_id, m.telegram_message_id) in keys
+    }
+
+
+def _file_key(media: dict) -> str:
+    return media["file_unique_id"] or media["file_id"]
+
+
+async def _known_media(records: list[dict]) -> dict[str, str]:
+    """s3_key файлов пачки, уже загруженных раньше, по file_unique_id — одним запросом."""
+    unique_ids = {r["media"]["file_unique_id"] for r in records if r.get("media")} - {None}
+    if not unique_ids:
+        return {}
+    return dict(await MediaObject.filter(
+        file_unique_id__in=unique_ids).values_list("file_unique_id", "s3_key"))
+
+
+def _queue_media(messages: list[Message], records: list[dict]):
+    """
+    Ставит в media_queue загрузку файлов, которых ещё нет в S3. Один файл
+    в пачке (пересылка в несколько чатов) скачивается один раз.
+    """
+    files: dict[str, tuple[list, dict]] = {}
+    for message, r in zip(messages, records):
+        if r.get("media") and message.s3_key is None:
+            ids, _ = files.setdefault(_file_key(r["media"]), ([], r["media"]))
+            ids.append(message.message_id)
+    for ids, media in files.values():
+        media_queue.submit(ids, media)
+
+
+async def save_messages(records: list[dict]) -> int:
+    """
+    Сохраняет пачку разобранных сообщений одним bulk_create,
+    предварительно создавая недостающие чаты и пользователей.
+    Сообщение Telegram, которое уже есть в БД (повторная доставка
+    апдейта), не дублируется; правка (edited_message) обновляет текст.
+    Медиафайлы новых сообщений загружаются в S3 в фоне (media_queue).
+    Возвращает число добавленных и изменённых сообщений.
+    """
+    if not records:
+        return 0
+
+    # В пачке остаётся последняя версия каждого сообщения: правка идёт после оригинала
+    latest = {}
+    for index, r in enumerate(records):
+        latest[_message_key(r) or index] = r
+    records = list(latest.values())
+
+    await _ensure_chats(records)
+    await _ensure_users(records)
+    existing = await _existing_messages(records)
+
+    new_records, edited = [], []
+    for r in records:
+        message = existing.get(_message_key(r))
+        if message is None:
+            new_records.append(r)
+        elif message.text != r["text"]:
+            message.text = r["text"]
+            message.edits_count += 1
+            edited.append(message)
+
+    known_media = await _known_media(new_records)
+    messages = [
+        Message(
+            user_id=r["user_id"],
+            chat_id=r["chat_id"],
+            telegram_message_id=r.get("telegram_message_id"),
+            timestamp=r["timestamp"],
+            text=r["text"],
+            s3_key=known_media.get(r["media"]["file_unique_id"]) if r.get("media") else None,
+        )
+        for r in new_records
+    ]
+    # ignore_conflicts — на случай, если то же сообщение параллельно записал другой воркер
+    if messages:
+        await Message.bulk_create(messages, ignore_conflicts=True)
+        _queue_media(messages, new_records)
+    if edited:
+        await Message.bulk_update(edited, fields=["text", "edits_count"])
+        logger.info(f"Обновлено отредактированных сообщений: {len(edited)}")
+
+    # Сообщения уже записаны: ошибки счётчиков и индекса не должны вызывать повтор пачки
+    try:
+        await record_activity(new_records)
+    except Exception:
+        logger.exception("Не удалось обновить счётчики активности")
+    try:
+        await message_search.index_messages(messages)
+        await message_search.update_messages(edited)
+    except Exception:
+        logger.exception("Не удалось обновить поисковый индекс сообщений")
+    return len(messages) + len(edited)
+
+
 async def process_update(bot, payload):
-    print(bot)
-    print(payload)
-    return
+    """Синхронная обработка одного апдейта (без очереди)."""
+    record = parse_update(bot, payload)
+    if record is None:
+        return 0
+    return await save_messages([record])
@@ -0,0 +1,7 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class RetentionPolicySchema(BaseModel):
+    message_retention_days: Optional[int] = Field(
+        None, ge=1, description="Через сколько дней сообщения уходят в архив S3; null — не архивировать")
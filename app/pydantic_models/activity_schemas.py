@@ -0,0 +1,42 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+from fastapi import Query
+
+ACTIVITY_GROUPS = ("chat_id", "user_id")
+
+
+class ActivityRowSchema(BaseModel):
+    bucket_start: int
+    # Часы старше срока хранения уже свёрнуты в сутки: такие строки приходят с granularity=day
+    granularity: str
+    chat_id: Optional[int] = None
+    user_id: Optional[int] = None
+    messages_count: int
+
+
+class ActivityResponseSchema(BaseModel):
+    granularity: str
+    group_by: List[str]
+    rows: List[ActivityRowSchema]
+
+
+def activity_params(
+    date_from: Optional[int] = Query(None, description="Начало периода (unix time)"),
+    date_to: Optional[int] = Query(None, description="Конец периода (unix time)"),
+    granularity: Literal["hour", "day"] = Query("day", description="Размер корзины: hour или day"),
+    group_by: List[str] = Query([], description="Группировка: chat_id, user_id (можно несколько)"),
+    chat_id: Optional[int] = Query(None, description="Фильтр по чату"),
+    user_id: Optional[int] = Query(None, description="Фильтр по пользователю"),
+):
+    filters = {}
+    if chat_id is not None:
+        filters["chat_id"] = chat_id
+    if user_id is not None:
+        filters["user_id"] = user_id
+    return {
+        "filters": filters,
+        "date_from": date_from,
+        "date_to": date_to,
+        "granularity": granularity,
+        "group_by": group_by,
+    }
@@ -0,0 +1,82 @@
+from datetime import date
+from typing import List, Optional
+from pydantic import BaseModel
+from fastapi import Query
+
+USAGE_GROUPS = ("day", "chat_id", "prompt_id")
+
+
+class UsageRowSchema(BaseModel):
+    day: Optional[date] = None
+    chat_id: Optional[int] = None
+    prompt_id: Optional[str] = None
+    analyses_count: int
+    tokens_input: int
+    tokens_output: int
+
+
+class UsageResponseSchema(BaseModel):
+    group_by: List[str]
+    rows: List[UsageRowSchema]
+
+
+def usage_params(
+    date_from: Optional[date] = Query(None, description="Первый день (UTC), включительно"),
+    date_to: Optional[date] = Query(None, description="Последний день (UTC), включительно"),
+    group_by: List[str] = Query(
+        ["day"], description="Группировка: day, chat_id, prompt_id (можно несколько)"),
+    chat_id: Optional[int] = Query(None, description="Фильтр по чату"),
+):
+    filters = {}
+    if date_from is not None:
+        filters["day__gte"] = date_from
+    if date_to is not None:
+        filters["day__lte"] = date_to
+    if chat_id is not None:
+        filters["chat_id"] = chat_id
+    return {
+        "filters": filters,
+        "group_by": group_by,
+    }
+
+
+class AnalysisResultSchema(BaseModel):
+    analysis_id: str
+    prompt_id: str
+    chat_id: Optional[int] = None
+    user_id: Optional[int] = None
+    date_from: Optional[int] = None
+    date_to: Optional[int] = None
+    created_at: int
+    tokens_input: int
+    tokens_output: int
+    result_text: str
+
+
+class AnalysisResultListSchema(BaseModel):
+    results: List[AnalysisResultSchema]
+    next_cursor: Optional[str] = None
+
+
+def analysis_result_params(
+    chat_id: Optional[int] = Query(None, description="Фильтр по чату"),
+    prompt_id: Optional[str] = Query(None, description="Фильтр по промпту"),
+    created_from: Optional[int] = Query(None, description="Создан не раньше (unix time)"),
+    created_to: Optional[int] = Query(None, description="Создан не позже (unix time)"),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущего ответа"),
+    page_size: Optional[int] = Query(20, ge=1, le=100),
+):
+    filters = {}
+    if chat_id is not None:
+        filters["chat_id"] = chat_id
+    if prompt_id is not None:
+        filters["prompt_id"] = prompt_id
+    if created_from is not None:
+        filters["created_at__gte"] = created_from
+    if created_to is not None:
+        filters["created_at__lte"] = created_to
+    return {
+        "filters": filters,
+        "cursor": cursor,
+        "page_size": page_size,
+    }
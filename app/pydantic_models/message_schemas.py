@@ -0,0 +1,61 @@
+from typing import List, Optional
+from pydantic import BaseModel
+from fastapi import Query
+
+
+def message_export_params(
+    chat_id: Optional[int] = Query(None, description="Фильтр по чату"),
+    user_id: Optional[int] = Query(None, description="Фильтр по пользователю"),
+    date_from: Optional[int] = Query(None, description="Начало окна (unix time)"),
+    date_to: Optional[int] = Query(None, description="Конец окна (unix time)"),
+    export_format: Optional[str] = Query(
+        "ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson / csv"),
+):
+    filters = {}
+    if chat_id is not None:
+        filters["chat_id"] = chat_id
+    if user_id is not None:
+        filters["user_id"] = user_id
+    if date_from is not None:
+        filters["timestamp__gte"] = date_from
+    if date_to is not None:
+        filters["timestamp__lte"] = date_to
+    return {
+        "filters": filters,
+        "format": export_format,
+    }
+
+
+class MessageSearchResultSchema(BaseModel):
+    message_id: str
+    chat_id: int
+    user_id: int
+    timestamp: int
+    text: Optional[str] = None
+
+
+class MessageSearchListSchema(BaseModel):
+    results: List[MessageSearchResultSchema]
+    next_cursor: Optional[str] = None
+
+
+def message_search_params(
+    q: str = Query(..., min_length=1, max_length=500, description="Слова для поиска"),
+    chat_id: Optional[int] = Query(None, description="Фильтр по чату"),
+    user_id: Optional[int] = Query(None, description="Фильтр по пользователю"),
+    date_from: Optional[int] = Query(None, description="Начало окна (unix time)"),
+    date_to: Optional[int] = Query(None, description="Конец окна (unix time)"),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущего ответа"),
+    page_size: Optional[int] = Query(20, ge=1, le=100),
+):
+    return {
+        "query": q,
+        "filters": {
+            "chat_id": chat_id,
+            "user_id": user_id,
+            "date_from": date_from,
+            "date_to": date_to,
+        },
+        "cursor": cursor,
+        "page_size": page_size,
+    }
@@ -33,8 +33,10 @@ class PromptResponseSchema(BaseModel):
 
 
 class PromptListResponseSchema(BaseModel):
-    total: int
+    # None, если total не запрошен
+    total: Optional[int] = None
     prompts: List[PromptSchema]
+    next_cursor: Optional[str] = None
 
 
 class PromptAutomaticSchema(BaseModel):
@@ -45,15 +47,19 @@ def prompt_filter_params(
     search: Optional[str] = Query(
         None, description="Фильтр по названию промпта"),
     sort_by: Optional[str] = Query(
-        "prompt_name", description="Поле сортировки"),
-    order: Optional[str] = Query("asc", description="asc / desc"),
-    page: Optional[int] = Query(1, ge=1),
+        "prompt_name", pattern="^(prompt_name|created_at)$", description="Поле сортировки"),
+    order: Optional[str] = Query("asc", pattern="^(asc|desc)$", description="asc / desc"),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor из предыдущего ответа"),
+    with_total: Optional[bool] = Query(
+        True, description="Посчитать общее количество (на первой странице)"),
     page_size: Optional[int] = Query(10, ge=1, le=100)
 ):
     return {
         "search": search,
         "sort_by": sort_by,
         "order": order,
-        "page": page,
+        "cursor": cursor,
+        "with_total": with_total,
         "page_size": page_size
     }
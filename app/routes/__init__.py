@@ -1,6 +1,11 @@
 from .auth_route import auth_router
 from .account_route import account_router
 from .prompt_route import prompt_router
+from .bot_route import bot_router
+from .metrics_route import metrics_router
+from .message_route import message_router
+from .analytics_route import analytics_router
+from .activity_route import activity_router
 
 
 def register_routes(app):
@@ -8,3 +13,11 @@ def register_routes(app):
     app.include_router(
         account_router, prefix="/api/accounts", tags=["Accounts"])
     app.include_router(prompt_router, prefix="/api/prompts", tags=["Prompts"])
+    app.include_router(bot_router, tags=["Bots"])
+    app.include_router(
+        message_router, prefix="/api/messages", tags=["Messages"])
+    app.include_router(metrics_router, prefix="/api/metrics", tags=["Metrics"])
+    app.include_router(
+        analytics_router, prefix="/api/analytics", tags=["Analytics"])
+    app.include_router(
+        activity_router, prefix="/api/activity", tags=["Activity"])
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends
+from loguru import logger
 # Depends, который парсит JWT
 from app.handlers.auth_handlers import get_current_user
 # или только AdminUser, если ты хочешь только для админов
-from app.database.models import AdminUser
+from app.database.models import AdminUser, Company
+from app.pydantic_models.account_schemas import RetentionPolicySchema
 
 account_router = APIRouter()
 
@@ -14,3 +16,21 @@ async def get_account_info(admin: AdminUser = Depends(get_current_user)):
         "username": admin.username,
         "company_name": admin.company.company_name,
     }
+
+
+@account_router.get("/retention", response_model=RetentionPolicySchema, summary="Политика хранения сообщений")
+async def get_retention_policy(admin: AdminUser = Depends(get_current_user)):
+    days = await Company.filter(company_id=admin.company_id).first().values_list(
+        "message_retention_days", flat=True)
+    return RetentionPolicySchema(message_retention_days=days)
+
+
+@account_router.put("/retention", response_model=RetentionPolicySchema, summary="Изменение политики хранения")
+async def set_retention_policy(
+    data: RetentionPolicySchema = Body(...),
+    admin: AdminUser = Depends(get_current_user)
+):
+    logger.info(f"Политика хранения компании {admin.company_id}: {data.message_retention_days}")
+    await Company.filter(company_id=admin.company_id).update(
+        message_retention_days=data.message_retention_days)
+    return data
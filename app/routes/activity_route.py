@@ -0,0 +1,65 @@
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException
+from loguru import logger
+from tortoise.expressions import Q
+from tortoise.functions import Sum
+from app.handlers.auth_handlers import get_current_user
+from app.handlers.activity_counters import DAY, GRANULARITY_SECONDS
+from app.database.models import AdminUser, ChatActivity
+from app.pydantic_models.activity_schemas import (
+    ACTIVITY_GROUPS,
+    activity_params,
+    ActivityResponseSchema,
+)
+
+activity_router = APIRouter()
+
+
+@activity_router.get("", response_model=ActivityResponseSchema, summary="Активность чатов по времени")
+async def get_activity(
+    params: dict = Depends(activity_params),
+    admin: AdminUser = Depends(get_current_user)
+):
+    group_by = list(dict.fromkeys(params["group_by"]))
+    unknown = set(group_by) - set(ACTIVITY_GROUPS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Недопустимая группировка: {sorted(unknown)}")
+    logger.info(f"Запрос активности: {params}")
+
+    # Корзина, в которую попадает date_from, включается целиком
+    query = ChatActivity.filter(chat__company_id=admin.company_id, **params["filters"])
+    date_from, date_to = params["date_from"], params["date_to"]
+    if date_from is not None:
+        query = query.filter(
+            Q(granularity="hour", bucket_start__gte=date_from - date_from % GRANULARITY_SECONDS["hour"])
+            | Q(granularity="day", bucket_start__gte=date_from - date_from % DAY))
+    if date_to is not None:
+        query = query.filter(bucket_start__lte=date_to)
+
+    # Суммирование по корзинам в БД, до нужной гранулярности — здесь
+    keys = ["granularity", "bucket_start", *group_by]
+    rows = await query.annotate(total=Sum("messages_count")).group_by(*keys).values(*keys, "total")
+
+    size = GRANULARITY_SECONDS[params["granularity"]]
+    buckets = Counter()
+    for row in rows:
+        granularity = "day" if row["granularity"] == "day" else params["granularity"]
+        buckets[(
+            row["bucket_start"] - row["bucket_start"] % size,
+            granularity,
+            *(row[key] for key in group_by),
+        )] += row["total"] or 0
+
+    return ActivityResponseSchema(
+        granularity=params["granularity"],
+        group_by=group_by,
+        rows=[
+            {
+                "bucket_start": key[0],
+                "granularity": key[1],
+                **dict(zip(group_by, key[2:])),
+                "messages_count": count,
+            }
+            for key, count in sorted(buckets.items())
+        ],
+    )
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, HTTPException
+from loguru import logger
+from tortoise.functions import Sum
+from app.handlers.auth_handlers import get_current_user
+from app.database.models import AdminUser, AnalysisResult, AnalysisUsage
+from app.pydantic_models.analytics_schemas import (
+    USAGE_GROUPS,
+    usage_params,
+    UsageResponseSchema,
+    analysis_result_params,
+    AnalysisResultListSchema,
+)
+from app.utils.pagination import InvalidCursor, paginate_keyset
+
+analytics_router = APIRouter()
+
+
+@analytics_router.get("/usage", response_model=UsageResponseSchema, summary="Расход токенов на анализ")
+async def get_usage(
+    params: dict = Depends(usage_params),
+    admin: AdminUser = Depends(get_current_user)
+):
+    group_by = list(dict.fromkeys(params["group_by"]))
+    unknown = set(group_by) - set(USAGE_GROUPS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Недопустимая группировка: {sorted(unknown)}")
+    logger.info(f"Запрос расхода токенов: {params}")
+
+    # Читаем суточную сводку, а не analysis_results: O(дней × чатов × промптов)
+    query = AnalysisUsage.filter(company_id=admin.company_id, **params["filters"]).annotate(
+        total_analyses=Sum("analyses_count"),
+        total_input=Sum("tokens_input"),
+        total_output=Sum("tokens_output"),
+    )
+    if group_by:
+        query = query.group_by(*group_by).order_by(*group_by)
+    else:
+        query = query.group_by("company_id")
+    rows = await query.values(*group_by, "total_analyses", "total_input", "total_output")
+
+    return UsageResponseSchema(
+        group_by=group_by,
+        rows=[
+            {
+                **{key: (str(row[key]) if key == "prompt_id" else row[key]) for key in group_by},
+                "analyses_count": row["total_analyses"] or 0,
+                "tokens_input": row["total_input"] or 0,
+                "tokens_output": row["total_output"] or 0,
+            }
+            for row in rows
+        ],
+    )
+
+
+@analytics_router.get("/results", response_model=AnalysisResultListSchema, summary="Результаты анализа")
+async def get_analysis_results(
+    params: dict = Depends(analysis_result_params),
+    admin: AdminUser = Depends(get_current_user)
+):
+    logger.info(f"Запрос результатов анализа: {params}")
+    try:
+        page = await paginate_keyset(
+            AnalysisResult.filter(company_id=admin.company_id, **params["filters"]),
+            fields=[
+                "analysis_id", "prompt_id", "chat_id", "user_id", "date_from", "date_to",
+                "created_at", "tokens_input", "tokens_output", "result_text",
+            ],
+            sort_field="created_at",
+            pk_field="analysis_id",
+            descending=True,
+            limit=params["page_size"],
+            cursor=params["cursor"],
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    return AnalysisResultListSchema(
+        results=[
+            {**row, "analysis_id": str(row["analysis_id"]), "prompt_id": str(row["prompt_id"])}
+            for row in page.items
+        ],
+        next_cursor=page.next_cursor,
+    )
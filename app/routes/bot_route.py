@@ -1,14 +1,18 @@
 import secrets
-import aiohttp
 
-from fastapi import APIRouter, Request, Header, HTTPException
+from fastapi import APIRouter, Request, Header, HTTPException, Depends, Path, status
+from loguru import logger
 from pydantic import BaseModel
 
 
 from config import Settings  # конфиг с URL
 # твоя логика обработки апдейтов
-from app.handlers.telegram_handlers import process_update
-from app.database.models import BotInfo
+from app.handlers.telegram_handlers import parse_update, process_update
+from app.handlers.ingestion_queue import ingestion_queue, IngestionQueueFull
+from app.handlers.bot_registry import bot_registry
+from app.handlers.auth_handlers import get_current_user
+from app.utils.http_client import http_client
+from app.database.models import BotInfo, AdminUser
 
 
 bot_router = APIRouter(prefix="/api/bots")
@@ -21,46 +25,64 @@ class RegisterBotRequest(BaseModel):
 
 
 @bot_router.post("/register")
-async def register_bot(data: RegisterBotRequest):
+async def register_bot(data: RegisterBotRequest, admin: AdminUser = Depends(get_current_user)):
     try:
-        bot = await validate_token_and_register(data.token)
+        bot = await validate_token_and_register(data.token, admin.company)
         await set_webhook(bot)
     except ValueError as e:
         raise HTTPException(status_code=400, detail="Invalid bot token") from e
+    bot_registry.put(bot)
     return {"message": "Bot registered and webhook set", "bot_id": bot.bot_id}
 
 
-async def validate_token_and_register(token: str) -> BotInfo:
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"https://api.telegram.org/bot{token}/getMe") as resp:
-            data = await resp.json()
-            if not data.get("ok"):
-                raise ValueError("Invalid token")
-            bot_info = data["result"]
+@bot_router.post("/{bot_id}/deactivate", summary="Отключение бота", status_code=status.HTTP_204_NO_CONTENT)
+async def deactivate_bot(
+        bot_id: int = Path(..., title="ID бота"),
+        admin: AdminUser = Depends(get_current_user)):
+    updated_rows = await BotInfo.filter(bot_id=bot_id, company=admin.company).update(is_active=False)
+    if not updated_rows:
+        logger.warning(f"Бот {bot_id} не найден")
+        raise HTTPException(status_code=404, detail="Бот не найден")
+    bot_registry.invalidate(bot_id)
+    logger.success(f"Бот {bot_id} отключён")
+
+
+async def validate_token_and_register(token: str, company) -> BotInfo:
+    _, data = await http_client.request_json(
+        "GET", f"https://api.telegram.org/bot{token}/getMe")
+    if not data or not data.get("ok"):
+        raise ValueError("Invalid token")
+    bot_info = data["result"]
 
     bot_id = bot_info["id"]
     username = bot_info["username"]
 
     secret = secrets.token_hex(16)  # для валидации входящих запросов
 
-    bot = await BotInfo.create(
+    # Повторная регистрация того же бота перевыпускает секрет
+    bot, _ = await BotInfo.update_or_create(
         bot_id=bot_id,
-        name=username,
-        token=token,
-        secret_token=secret
+        defaults={
+            "bot_name": username,
+            "bot_token": token,
+            "company": company,
+            "is_active": True,
+            "secret_token": secret,
+        }
     )
 
     return bot
 
 
 async def set_webhook(bot: BotInfo):
-    url = f"https://api.telegram.org/bot{bot.token}/setWebhook"
+    url = f"https://api.telegram.org/bot{bot.bot_token}/setWebhook"
     payload = {
-        "url": f"{settings.WEBHOOK_BASE_URL}/webhook",
+        "url": f"{settings.WEBHOOK_BASE_URL}/api/bots/webhook",
         "secret_token": bot.secret_token,
     }
-    async with aiohttp.ClientSession() as session:
-        await session.post(url, json=payload)
+    _, data = await http_client.request_json("POST", url, json=payload)
+    if not data or not data.get("ok"):
+        logger.error(f"Не удалось установить вебхук бота {bot.bot_id}: {data}")
 
 
 @bot_router.post("/webhook")
@@ -68,10 +90,24 @@ async def telegram_webhook(request: Request, x_telegram_bot_api_secret_token: st
     if not x_telegram_bot_api_secret_token:
         raise HTTPException(status_code=403, detail="Missing secret token")
 
-    bot = await BotInfo.get_or_none(secret_token=x_telegram_bot_api_secret_token)
+    bot = await bot_registry.get(x_telegram_bot_api_secret_token)
     if not bot:
         raise HTTPException(status_code=403, detail="Unknown bot")
 
     payload = await request.json()
-    await process_update(bot, payload)
+
+    # Без запущенного воркера (например, до startup) пишем сразу
+    if not ingestion_queue.running:
+        await process_update(bot, payload)
+        return {"ok": True}
+
+    record = parse_update(bot, payload)
+    if record is None:
+        return {"ok": True}
+
+    try:
+        await ingestion_queue.submit(record)
+    except IngestionQueueFull as e:
+        # Telegram повторит доставку апдейта при не-2xx ответе
+        raise HTTPException(status_code=503, detail="Queue is full") from e
     return {"ok": True}
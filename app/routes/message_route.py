@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from app.handlers.auth_handlers import get_current_user
+from app.database.models import AdminUser
+from app.pydantic_models.message_schemas import (
+    message_export_params,
+    message_search_params,
+    MessageSearchListSchema,
+)
+from app.search.message_search import SearchQuery, message_search
+from app.s3.message_archive import iter_company_messages
+from app.utils.helpers import MessageRow
+from app.utils.pagination import InvalidCursor
+
+message_router = APIRouter()
+
+
+async def _ndjson_lines(rows):
+    async for row in rows:
+        data = row._asdict()
+        data["message_id"] = str(row.message_id)
+        yield json.dumps(data, ensure_ascii=False) + "\n"
+
+
+async def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(MessageRow._fields)
+    async for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+@message_router.get("/export", summary="Потоковая выгрузка сообщений компании")
+async def export_messages(
+    params: dict = Depends(message_export_params),
+    admin: AdminUser = Depends(get_current_user)
+):
+    logger.info(f"Выгрузка сообщений: {params}")
+    rows = iter_company_messages(admin.company_id, **params["filters"])
+
+    if params["format"] == "csv":
+        return StreamingResponse(
+            _csv_lines(rows),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=messages.csv"}
+        )
+    return StreamingResponse(_ndjson_lines(rows), media_type="application/x-ndjson")
+
+
+@message_router.get("/search", response_model=MessageSearchListSchema, summary="Полнотекстовый поиск по сообщениям")
+async def search_messages(
+    params: dict = Depends(message_search_params),
+    admin: AdminUser = Depends(get_current_user)
+):
+    logger.info(f"Поиск по сообщениям: {params}")
+    try:
+        page = await message_search.search(admin.company_id, SearchQuery(
+            params["query"],
+            **params["filters"],
+            limit=params["page_size"],
+            cursor=params["cursor"],
+        ))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    return MessageSearchListSchema(results=page.items, next_cursor=page.next_cursor)
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends
+from app.handlers.auth_handlers import get_current_user, principal_cache
+from app.handlers.activity_counters import activity_compactor
+from app.handlers.retention import retention_worker
+from app.handlers.bot_registry import bot_registry
+from app.handlers.ingestion_queue import ingestion_queue
+from app.handlers.media_queue import media_queue
+from app.scheduler.scheduler import scheduler
+from app.s3.s3_manager import s3_manager
+from app.utils.http_client import http_client
+from app.utils.governor import governors_stats
+from app.yandex_funcs.analysis_engine import analysis_engine
+from app.yandex_funcs.transcoder import audio_transcoder
+from app.yandex_funcs.transcription_cache import transcription_cache
+from app.database.models import AdminUser
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("", summary="Метрики кэшей и фоновых очередей")
+async def get_metrics(admin: AdminUser = Depends(get_current_user)):
+    return {
+        "principal_cache": principal_cache.stats(),
+        "bot_registry": bot_registry.stats(),
+        "ingestion_queue": ingestion_queue.stats(),
+        "media_queue": media_queue.stats(),
+        "scheduler": scheduler.stats(),
+        "s3_index": s3_manager.index.stats(),
+        "audio_transcoder": audio_transcoder.stats(),
+        "transcription_cache": transcription_cache.stats(),
+        "http": http_client.stats(),
+        "api_governors": governors_stats(),
+        "analysis": analysis_engine.stats(),
+        "activity_compactor": {"compacted": activity_compactor.compacted},
+        "retention": retention_worker.stats(),
+    }
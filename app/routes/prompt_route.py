@@ -4,6 +4,7 @@ from loguru import logger
 from tortoise.expressions import Q
 from app.handlers.auth_handlers import get_current_user
 from app.database.models import Prompt, AdminUser
+from app.utils.pagination import InvalidCursor, paginate_keyset
 from app.pydantic_models.prompt_schemas import (
     PromptCreateSchema,
     PromptEditSchema,
@@ -97,25 +98,20 @@ async def get_prompts(
         if filters.get("search"):
             query &= Q(prompt_name__icontains=filters["search"])
 
-        order_by = f"{'-' if filters.get('order') == 'desc' else ''}{filters.get('sort_by', 'prompt_name')}"
-        page = filters.get("page", 1)
-        page_size = filters.get("page_size", 10)
-
-        total_count = await Prompt.filter(query).count()
-
-        prompts = await Prompt.filter(query).order_by(order_by).offset(
-            (page - 1) * page_size
-        ).limit(page_size).values(
-            "prompt_id",
-            "prompt_name",
-            "text",
-            "use_automatic",
-            "company_id",
-            "created_at"
+        page = await paginate_keyset(
+            Prompt.filter(query),
+            fields=["prompt_id", "prompt_name", "text", "use_automatic", "company_id", "created_at"],
+            sort_field=filters.get("sort_by", "prompt_name"),
+            pk_field="prompt_id",
+            descending=filters.get("order") == "desc",
+            limit=filters.get("page_size", 10),
+            cursor=filters.get("cursor"),
+            with_total=filters.get("with_total", True),
         )
 
         return PromptListResponseSchema(
-            total=total_count,
+            total=page.total,
+            next_cursor=page.next_cursor,
             prompts=[
                 PromptSchema(
                     prompt_id=p["prompt_id"],
@@ -125,10 +121,12 @@ async def get_prompts(
                     company=p["company_id"],
                     created_at=p["created_at"]
                 )
-                for p in prompts
+                for p in page.items
             ]
         )
 
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e:
         logger.exception("Ошибка при получении списка промптов")
         raise HTTPException(status_code=500, detail="Ошибка сервера") from e
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import AsyncIterator, Awaitable, Callable
+from tortoise.exceptions import IntegrityError
+from app.database.models import MediaObject
+from app.s3.s3_manager import AsyncS3Manager, s3_manager
+
+# Больше этого размера sha256 считается в потоке, чтобы не блокировать цикл
+HASH_IN_THREAD_THRESHOLD = 1024 * 1024
+
+
+async def content_hash(file_bytes: bytes) -> str:
+    if len(file_bytes) > HASH_IN_THREAD_THRESHOLD:
+        return await asyncio.to_thread(lambda: hashlib.sha256(file_bytes).hexdigest())
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+async def find_media(file_unique_id: str) -> str | None:
+    """
+    s3_key уже загруженного файла по Telegram file_unique_id.
+    Позволяет не скачивать файл из Telegram повторно.
+    """
+    return await MediaObject.filter(
+        file_unique_id=file_unique_id).first().values_list("s3_key", flat=True)
+
+
+def media_key(digest: str, manager: AsyncS3Manager = s3_manager) -> str:
+    return f"{manager.bucket_folder}/media/{digest}"
+
+
+async def _save(
+    digest: str,
+    file_unique_id: str | None,
+    size: int,
+    upload: Callable[[str], Awaitable],
+    manager: AsyncS3Manager,
+) -> str:
+    """Регистрирует содержимое с хэшем digest, загружая его через upload(key) только один раз."""
+    existing = await MediaObject.get_or_none(content_hash=digest)
+    if existing is not None:
+        if file_unique_id and existing.file_unique_id is None:
+            existing.file_unique_id = file_unique_id
+            try:
+                await existing.save(update_fields=["file_unique_id"])
+            except IntegrityError:
+                pass
+        logging.info(f"♻️ Содержимое уже загружено: {existing.s3_key}")
+        return existing.s3_key
+
+    key = media_key(digest, manager)
+    await upload(key)
+    try:
+        await MediaObject.create(
+            content_hash=digest,
+            file_unique_id=file_unique_id,
+            s3_key=key,
+            size=size,
+        )
+    except IntegrityError:
+        # Тот же файл параллельно загрузил другой запрос: при совпадении
+        # содержимого ключ тот же, и объект в S3 один
+        winner = await MediaObject.get_or_none(content_hash=digest)
+        if winner is None and file_unique_id:
+            winner = await MediaObject.get_or_none(file_unique_id=file_unique_id)
+        if winner is None:
+            raise
+        if winner.s3_key != key:
+            await manager.delete_object(key)
+        return winner.s3_key
+    return key
+
+
+async def _known(file_unique_id: str | None) -> str | None:
+    if not file_unique_id:
+        return None
+    key = await find_media(file_unique_id)
+    if key is not None:
+        logging.info(f"♻️ Файл {file_unique_id} уже загружен: {key}")
+    return key
+
+
+async def store_media(
+    file_bytes: bytes,
+    file_unique_id: str | None = None,
+    manager: AsyncS3Manager = s3_manager,
+) -> str:
+    """
+    Загружает медиафайл с дедупликацией по содержимому и возвращает s3_key,
+    который нужно сохранить в Message.s3_key. Одинаковый файл (пересланный,
+    отправленный в несколько чатов) хранится в S3 один раз. Ключ — sha256
+    содержимого, поэтому последующие загрузки не могут перезаписать объект
+    чужими данными.
+    """
+    key = await _known(file_unique_id)
+    if key is not None:
+        return key
+    digest = await content_hash(file_bytes)
+    return await _save(
+        digest, file_unique_id, len(file_bytes),
+        lambda target: manager.upload_object(target, file_bytes), manager)
+
+
+async def _read_spool(spool, chunk_size: int) -> AsyncIterator[bytes]:
+    await asyncio.to_thread(spool.seek, 0)
+    while chunk := await asyncio.to_thread(spool.read, chunk_size):
+        yield chunk
+
+
+async def store_media_stream(
+    chunks: AsyncIterator[bytes],
+    file_unique_id: str | None = None,
+    manager: AsyncS3Manager = s3_manager,
+) -> str:
+    """
+    store_media для потока (файл, скачиваемый из Telegram). Ключ зависит от
+    sha256 всего содержимого, поэтому поток сначала пишется во временный
+    файл с подсчётом хэша, затем загружается в S3 через upload_object_stream.
+    Временный файл занимает в памяти не больше manager.part_size.
+    """
+    key = await _known(file_unique_id)
+    if key is not None:
+        return key
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=manager.part_size) as spool:
+        async for chunk in chunks:
+            digest.update(chunk)
+            size += len(chunk)
+            await asyncio.to_thread(spool.write, chunk)
+        return await _save(
+            digest.hexdigest(), file_unique_id, size,
+            lambda target: manager.upload_object_stream(
+                target, _read_spool(spool, manager.part_size)),
+            manager)
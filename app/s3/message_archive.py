@@ -0,0 +1,179 @@
+import asyncio
+import gzip
+import heapq
+import json
+import operator
+import uuid
+import zlib
+from typing import AsyncIterator
+from app.database.models import MessageArchive
+from app.s3.s3_manager import AsyncS3Manager, s3_manager
+from app.utils.helpers import MessageRow, message_page_query, message_window_digest
+
+# Фильтры окна в формате Tortoise, которые понимает чтение архива
+FILTER_OPS = {
+    "": operator.eq,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+# Условие на сегмент, при котором в нём могут быть сообщения окна
+SEGMENT_BOUNDS = {
+    "timestamp__gte": "ts_to__gte",
+    "timestamp__gt": "ts_to__gt",
+    "timestamp__lte": "ts_from__lte",
+    "timestamp__lt": "ts_from__lt",
+}
+
+
+def encode_segment(rows: list[MessageRow]) -> bytes:
+    lines = "".join(
+        json.dumps({**row._asdict(), "message_id": str(row.message_id)}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+    return gzip.compress(lines.encode())
+
+
+def _decode_row(line: bytes) -> MessageRow:
+    data = json.loads(line)
+    return MessageRow(**{**data, "message_id": uuid.UUID(data["message_id"])})
+
+
+def _matches(row: MessageRow, filters: dict) -> bool:
+    for key, value in filters.items():
+        field, _, op = key.partition("__")
+        if not FILTER_OPS[op](getattr(row, field), value):
+            return False
+    return True
+
+
+async def upload_segment(
+    company_id, rows: list[MessageRow], manager: AsyncS3Manager = s3_manager
+) -> tuple[str, int]:
+    """Загружает сегмент в S3 и возвращает (ключ, размер)."""
+    body = await asyncio.to_thread(encode_segment, rows)
+    key = (
+        f"{manager.bucket_folder}/archive/{company_id}/"
+        f"{rows[0].timestamp}-{uuid.uuid4().hex}.ndjson.gz"
+    )
+    await manager.upload_object(key, body)
+    return key, len(body)
+
+
+async def iter_segment(key: str, manager: AsyncS3Manager = s3_manager) -> AsyncIterator[MessageRow]:
+    """Читает сегмент потоком: распаковка и разбор по мере скачивания."""
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    tail = b""
+    async for chunk in manager.iter_object(key):
+        tail += decompressor.decompress(chunk)
+        *lines, tail = tail.split(b"\n")
+        for line in lines:
+            if line:
+                yield _decode_row(line)
+    tail += decompressor.flush()
+    if tail.strip():
+        yield _decode_row(tail)
+
+
+def _segments(company_id, filters: dict):
+    query = MessageArchive.filter(company_id=company_id)
+    for key, bound in SEGMENT_BOUNDS.items():
+        if key in filters:
+            query = query.filter(**{bound: filters[key]})
+    return query
+
+
+def _row_key(row: MessageRow):
+    return row.timestamp, row.message_id
+
+
+async def _iter_segments(
+    keys: list[str], filters: dict, manager: AsyncS3Manager
+) -> AsyncIterator[MessageRow]:
+    for key in keys:
+        async for row in iter_segment(key, manager):
+            if _matches(row, filters):
+                yield row
+
+
+async def iter_archived_messages(
+    company_id, manager: AsyncS3Manager = s3_manager, **filters
+) -> AsyncIterator[MessageRow]:
+    """Сообщения окна из архивных сегментов; сегменты вне окна не скачиваются."""
+    keys = await _segments(company_id, filters).order_by("archive_id").values_list(
+        "s3_key", flat=True)
+    async for row in _iter_segments(keys, filters, manager):
+        yield row
+
+
+async def iter_company_messages(
+    company_id, manager: AsyncS3Manager = s3_manager, chunk_size: int = 1000, **filters
+) -> AsyncIterator[MessageRow]:
+    """
+    Сообщения окна независимо от того, где они хранятся: сначала архив
+    (он старше), затем БД по возрастанию (timestamp, message_id).
+    Фильтры — как у iter_messages_for_company.
+
+    Архивирование может идти параллельно чтению. Сегмент — это самые старые
+    сообщения БД, поэтому после каждой страницы проверяются сегменты,
+    появившиеся после начала чтения: их сообщения, ещё не выданные из БД,
+    отдаются из сегмента в общем порядке, а уже выданные отбрасываются по
+    message_id текущей страницы.
+    """
+    # Архив старше срока хранения: его сообщения приняты раньше любой
+    # границы received_at__lte, а в сегментах времени приёма нет
+    archive_filters = {k: v for k, v in filters.items() if k != "received_at__lte"}
+    seen = await MessageArchive.filter(company_id=company_id).order_by(
+        "-archive_id").first().values_list("archive_id", flat=True) or 0
+    keys = await _segments(company_id, archive_filters).filter(archive_id__lte=seen).order_by(
+        "archive_id").values_list("s3_key", flat=True)
+    async for row in _iter_segments(keys, archive_filters, manager):
+        yield row
+
+    last: MessageRow | None = None
+    pending: list[MessageRow] = []
+    while True:
+        page = [
+            MessageRow(*row)
+            for row in await message_page_query(company_id, last, chunk_size, **filters)
+        ]
+        added = await _segments(company_id, archive_filters).filter(
+            archive_id__gt=seen).order_by("archive_id").values_list("archive_id", "s3_key")
+        if added:
+            seen = added[-1][0]
+            page_ids = {row.message_id for row in page}
+            async for row in _iter_segments([key for _, key in added], archive_filters, manager):
+                if (last is None or _row_key(row) > _row_key(last)) \
+                        and row.message_id not in page_ids:
+                    pending.append(row)
+            pending.sort(key=_row_key)
+
+        if len(page) < chunk_size:
+            ready, pending = pending, []
+        else:
+            boundary = _row_key(page[-1])
+            ready = [row for row in pending if _row_key(row) <= boundary]
+            pending = pending[len(ready):]
+        for row in heapq.merge(page, ready, key=_row_key):
+            yield row
+
+        if len(page) < chunk_size:
+            return
+        last = page[-1]
+
+
+async def window_digest(
+    company_id, **filters
+) -> tuple[int, int | None, int | None, int, tuple]:
+    """
+    message_window_digest по БД плюс номера пересекающихся с окном
+    архивных сегментов. Сегменты неизменны, поэтому отпечаток окна
+    по-прежнему меняется только с новыми сообщениями и правками.
+    Количество — только по БД: сегмент может пересекать окно, не содержа
+    его сообщений, поэтому пустоту окна с сегментами определяет само чтение.
+    """
+    count, first, last, edits = await message_window_digest(company_id, **filters)
+    archive_ids = await _segments(company_id, filters).order_by("archive_id").values_list(
+        "archive_id", flat=True)
+    return count, first, last, edits, tuple(archive_ids)
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Awaitable, Callable
+from app.utils.cache import LRUCache
+
+
+class S3ObjectIndex:
+    """
+    Индекс объектов S3 в памяти процесса: telegram_id -> {key: {size, etag}}.
+    Префикс один раз полностью читается из S3, дальше поддерживается
+    инкрементально при успешных загрузках. Через ttl префикс перечитывается,
+    чтобы подхватить загрузки из других воркеров.
+    """
+
+    def __init__(self, max_prefixes: int = 10000, ttl: float | None = 3600):
+        self._prefixes = LRUCache(maxsize=max_prefixes, ttl=ttl)
+        self._syncing: dict[int, asyncio.Future] = {}
+
+    def get(self, telegram_id: int) -> dict[str, dict] | None:
+        return self._prefixes.get(telegram_id)
+
+    async def get_or_sync(
+        self, telegram_id: int, loader: Callable[[], Awaitable[dict[str, dict]]]
+    ) -> dict[str, dict]:
+        objects = self.get(telegram_id)
+        if objects is not None:
+            return objects
+
+        # Параллельные запросы одного префикса ждут одну синхронизацию
+        pending = self._syncing.get(telegram_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._syncing[telegram_id] = future
+        try:
+            objects = await loader()
+            self._prefixes.set(telegram_id, objects)
+            future.set_result(objects)
+            return objects
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение уже пробрасываем сами, ждущих может не быть
+            future.exception()
+            raise
+        finally:
+            del self._syncing[telegram_id]
+
+    def add(self, telegram_id: int, key: str, size: int, etag: str | None):
+        objects = self._prefixes.peek(telegram_id)
+        if objects is not None:
+            objects[key] = {"size": size, "etag": etag}
+
+    def discard(self, telegram_id: int, key: str):
+        objects = self._prefixes.peek(telegram_id)
+        if objects is not None:
+            objects.pop(key, None)
+
+    def invalidate(self, telegram_id: int):
+        self._prefixes.pop(telegram_id)
+
+    def stats(self) -> dict:
+        return self._prefixes.stats()
@@ -1,7 +1,12 @@
+import asyncio
 import logging
+from contextlib import AsyncExitStack
+from typing import AsyncIterator
 import aioboto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from config import Settings
+from app.s3.object_index import S3ObjectIndex
 
 settings = Settings()
 
@@ -13,72 +18,244 @@ class AsyncS3Manager:
     aws_secret_access_key = settings.AWS_SECRET_ACCESS_KEY
     bucket_name = settings.BUCKET_NAME
     bucket_folder = "web_app"
+    max_pool_connections = settings.S3_MAX_POOL_CONNECTIONS
+    part_size = settings.S3_PART_SIZE
+    upload_concurrency = settings.S3_UPLOAD_CONCURRENCY
+
+    def __init__(self):
+        # Один клиент на всё время жизни приложения: пул соединений,
+        # keep-alive и учётные данные переиспользуются между вызовами
+        self._session = None
+        self._client = None
+        self._exit_stack: AsyncExitStack | None = None
+        self._lock = asyncio.Lock()
+        self.index = S3ObjectIndex(
+            max_prefixes=settings.S3_INDEX_MAX_PREFIXES, ttl=settings.S3_INDEX_TTL)
 
     def _get_session(self):
         return aioboto3.Session()
 
+    async def start(self):
+        if self._client is not None:
+            return
+        async with self._lock:
+            if self._client is not None:
+                return
+            self._session = self._get_session()
+            stack = AsyncExitStack()
+            self._client = await stack.enter_async_context(self._session.client(
+                "s3",
+                endpoint_url=self.endpoint_url,
+                region_name=self.region_name,
+                aws_access_key_id=self.aws_access_key_id,
+                aws_secret_access_key=self.aws_secret_access_key,
+                config=Config(
+                    max_pool_connections=self.max_pool_connections,
+                    retries={"max_attempts": 3, "mode": "standard"},
+                ),
+            ))
+            self._exit_stack = stack
+            logging.info("S3-клиент открыт")
+
+    async def close(self):
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+            logging.info("S3-клиент закрыт")
+        self._exit_stack = None
+        self._client = None
+        self._session = None
+
+    async def _get_client(self):
+        if self._client is None:
+            await self.start()
+        return self._client
+
     def _build_path(self, telegram_id: int, filename: str) -> str:
         return f"{self.bucket_folder}/{telegram_id}/{filename}"
 
+    def _build_prefix(self, telegram_id: int) -> str:
+        return f"{self.bucket_folder}/{telegram_id}/"
+
     async def upload_bytes(self, file_bytes: bytes, telegram_id: int, filename: str):
         key = self._build_path(telegram_id, filename)
-        session = self._get_session()
-        async with session.client(
-            "s3",
-            endpoint_url=self.endpoint_url,
-            region_name=self.region_name,
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-        ) as s3:
+        s3 = await self._get_client()
+        try:
+            response = await s3.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=file_bytes,
+                ACL="private"
+            )
+            self.index.add(telegram_id, key, len(file_bytes), response.get("ETag"))
+            logging.info(f"✅ Файл загружен: {key}")
+            return key
+        except ClientError as e:
+            logging.error(f"Ошибка загрузки: {e}")
+            raise
+
+    async def upload_stream(
+        self, chunks: AsyncIterator[bytes], telegram_id: int, filename: str
+    ) -> str:
+        """Потоковая загрузка в папку пользователя (upload_object_stream)."""
+        key = self._build_path(telegram_id, filename)
+        size, etag = await self.upload_object_stream(key, chunks)
+        self.index.add(telegram_id, key, size, etag)
+        return key
+
+    async def upload_object_stream(
+        self, key: str, chunks: AsyncIterator[bytes]
+    ) -> tuple[int, str | None]:
+        """
+        Потоковая загрузка (например, файла, скачиваемого из Telegram) через
+        S3 multipart upload. В памяти одновременно не больше
+        upload_concurrency + 1 частей по part_size; части грузятся параллельно.
+        Файл меньше одной части загружается обычным put_object.
+        Возвращает (размер, ETag).
+        """
+        s3 = await self._get_client()
+        buffer = bytearray()
+        size = 0
+        upload_id = None
+        tasks: list[asyncio.Task] = []
+        slots = asyncio.Semaphore(self.upload_concurrency)
+
+        async def upload_part(part_number: int, body: bytes) -> dict:
             try:
-                await s3.put_object(
+                response = await s3.upload_part(
                     Bucket=self.bucket_name,
                     Key=key,
-                    Body=file_bytes,
-                    ACL="private"
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body,
                 )
+                return {"PartNumber": part_number, "ETag": response["ETag"]}
+            finally:
+                slots.release()
+
+        async def submit_part(body: bytes):
+            nonlocal upload_id
+            if upload_id is None:
+                response = await s3.create_multipart_upload(
+                    Bucket=self.bucket_name, Key=key, ACL="private")
+                upload_id = response["UploadId"]
+            await slots.acquire()
+            tasks.append(asyncio.create_task(upload_part(len(tasks) + 1, body)))
+
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                size += len(chunk)
+                while len(buffer) >= self.part_size:
+                    await submit_part(bytes(buffer[:self.part_size]))
+                    del buffer[:self.part_size]
+                # Ошибку части видим сразу, не дочитывая поток
+                for task in tasks:
+                    if task.done() and task.exception():
+                        raise task.exception()
+
+            if upload_id is None:
+                response = await s3.put_object(
+                    Bucket=self.bucket_name, Key=key, Body=bytes(buffer), ACL="private")
                 logging.info(f"✅ Файл загружен: {key}")
-                return key
-            except ClientError as e:
-                logging.error(f"Ошибка загрузки: {e}")
-                raise
+                return size, response.get("ETag")
+
+            if buffer:
+                await submit_part(bytes(buffer))
+                buffer.clear()
+            parts = await asyncio.gather(*tasks)
+            response = await s3.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": list(parts)},
+            )
+            logging.info(f"✅ Файл загружен частями ({len(parts)}): {key}")
+            return size, response.get("ETag")
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            if upload_id is not None:
+                try:
+                    await s3.abort_multipart_upload(
+                        Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+                    logging.warning(f"Multipart-загрузка прервана: {key}")
+                except ClientError as e:
+                    logging.error(f"Не удалось отменить multipart-загрузку {key}: {e}")
+            raise
+
+    async def upload_object(self, key: str, body: bytes) -> str:
+        """Загрузка по готовому ключу (служебные объекты вне папок пользователей)."""
+        s3 = await self._get_client()
+        try:
+            await s3.put_object(Bucket=self.bucket_name, Key=key, Body=body, ACL="private")
+        except ClientError as e:
+            logging.error(f"Ошибка загрузки: {e}")
+            raise
+        logging.info(f"✅ Файл загружен: {key}")
+        return key
+
+    async def iter_object(self, key: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """Потоковое чтение объекта частями, без загрузки целиком в память."""
+        s3 = await self._get_client()
+        response = await s3.get_object(Bucket=self.bucket_name, Key=key)
+        async with response["Body"] as body:
+            while chunk := await body.read(chunk_size):
+                yield chunk
+
+    async def delete_object(self, key: str):
+        s3 = await self._get_client()
+        await s3.delete_object(Bucket=self.bucket_name, Key=key)
+        parts = key.split("/")
+        if len(parts) == 3 and parts[0] == self.bucket_folder and parts[1].lstrip("-").isdigit():
+            self.index.discard(int(parts[1]), key)
+        logging.info(f"Файл удалён: {key}")
 
     async def generate_presigned_url(self, telegram_id: int, filename: str, expiration=3600):
-        key = self._build_path(telegram_id, filename)
-        session = self._get_session()
-        async with session.client(
-            "s3",
-            endpoint_url=self.endpoint_url,
-            region_name=self.region_name,
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-        ) as s3:
-            try:
-                return await s3.generate_presigned_url(
-                    ClientMethod='get_object',
-                    Params={"Bucket": self.bucket_name, "Key": key},
-                    ExpiresIn=expiration
-                )
-            except ClientError as e:
-                logging.error(f"Ошибка при генерации ссылки: {e}")
-                return None
+        return await self.generate_presigned_url_for_key(
+            self._build_path(telegram_id, filename), expiration)
+
+    async def generate_presigned_url_for_key(self, key: str, expiration=3600):
+        """Только подпись ссылки локально — запросов в S3 нет."""
+        s3 = await self._get_client()
+        try:
+            return await s3.generate_presigned_url(
+                ClientMethod='get_object',
+                Params={"Bucket": self.bucket_name, "Key": key},
+                ExpiresIn=expiration
+            )
+        except ClientError as e:
+            logging.error(f"Ошибка при генерации ссылки: {e}")
+            return None
+
+    async def iter_objects(self, prefix: str) -> AsyncIterator[dict]:
+        """Все объекты под префиксом, страницами по 1000 через ContinuationToken."""
+        s3 = await self._get_client()
+        params = {"Bucket": self.bucket_name, "Prefix": prefix}
+        while True:
+            response = await s3.list_objects_v2(**params)
+            for obj in response.get("Contents", []):
+                yield obj
+            if not response.get("IsTruncated"):
+                return
+            params["ContinuationToken"] = response["NextContinuationToken"]
+
+    async def _load_user_objects(self, telegram_id: int) -> dict[str, dict]:
+        return {
+            obj["Key"]: {"size": obj.get("Size"), "etag": obj.get("ETag")}
+            async for obj in self.iter_objects(self._build_prefix(telegram_id))
+        }
+
+    async def list_user_objects(self, telegram_id: int) -> dict[str, dict]:
+        """key -> {size, etag}; из S3 читается только при первом обращении."""
+        return await self.index.get_or_sync(
+            telegram_id, lambda: self._load_user_objects(telegram_id))
 
     async def list_user_files(self, telegram_id: int) -> list[str]:
-        prefix = f"{self.bucket_folder}/{telegram_id}/"
-        session = self._get_session()
-        async with session.client(
-            "s3",
-            endpoint_url=self.endpoint_url,
-            region_name=self.region_name,
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-        ) as s3:
-            try:
-                response = await s3.list_objects_v2(
-                    Bucket=self.bucket_name,
-                    Prefix=prefix
-                )
-                return [obj["Key"] for obj in response.get("Contents", [])]
-            except ClientError as e:
-                logging.error(f"Ошибка при получении списка файлов: {e}")
-                return []
+        try:
+            return sorted(await self.list_user_objects(telegram_id))
+        except ClientError as e:
+            logging.error(f"Ошибка при получении списка файлов: {e}")
+            return []
+
+
+s3_manager = AsyncS3Manager()
@@ -0,0 +1,41 @@
+from datetime import datetime
+from loguru import logger
+from config import Settings
+from app.database.models import ChatSchedule
+from app.handlers.activity_counters import has_activity
+from app.utils.governor import PRIORITY_SCHEDULED, priority_lane
+from app.yandex_funcs.analysis_engine import AnalysisWindow, analysis_engine
+
+settings = Settings()
+
+
+async def run_schedule(schedule: ChatSchedule, previous_run: datetime | None, fire_at: datetime):
+    """Анализ сообщений чата с прошлого запуска до момента срабатывания."""
+    if previous_run is not None and not await has_activity(
+            schedule.chat_id, int(previous_run.timestamp())):
+        logger.info(
+            f"Расписание {schedule.schedule_id}: в чате {schedule.chat_id} нет новых сообщений, анализ пропущен")
+        return None
+    await schedule.fetch_related("chat", "prompt")
+    logger.info(
+        f"Запуск расписания {schedule.schedule_id} для чата {schedule.chat_id}")
+    # Запросы к API по расписанию пропускают вперёд интерактивные
+    with priority_lane(PRIORITY_SCHEDULED):
+        if schedule.schedule_type == "interval" and settings.ANALYSIS_INCREMENTAL:
+            return await analysis_engine.analyze_incremental(
+                schedule.prompt,
+                schedule.chat.company_id,
+                AnalysisWindow(chat_id=schedule.chat_id, date_to=int(fire_at.timestamp())),
+                schedule=schedule,
+                full_recompute_every=settings.ANALYSIS_FULL_RECOMPUTE_EVERY,
+            )
+        return await analysis_engine.analyze(
+            schedule.prompt,
+            schedule.chat.company_id,
+            AnalysisWindow(
+                chat_id=schedule.chat_id,
+                date_from=int(previous_run.timestamp()) if previous_run else None,
+                date_to=int(fire_at.timestamp()),
+            ),
+            schedule=schedule,
+        )
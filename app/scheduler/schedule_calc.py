@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone, tzinfo
+from croniter import croniter
+
+CATCH_UP_SKIP = "skip"
+CATCH_UP_LATEST = "latest"
+CATCH_UP_ALL = "all"
+
+
+def _aware(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def _next_interval(schedule, after: datetime, tz: tzinfo) -> datetime | None:
+    minutes = (schedule.interval_hours or 0) * 60 + (schedule.interval_minutes or 0)
+    if minutes <= 0:
+        return None
+    return after + timedelta(minutes=minutes)
+
+
+def _next_daily(schedule, after: datetime, tz: tzinfo) -> datetime | None:
+    if schedule.time_of_day is None:
+        return None
+    local = after.astimezone(tz)
+    at = schedule.time_of_day.replace(tzinfo=None, microsecond=0)
+    candidate = datetime.combine(local.date(), at, tzinfo=tz)
+    if candidate <= local:
+        candidate = datetime.combine(local.date() + timedelta(days=1), at, tzinfo=tz)
+    return candidate.astimezone(timezone.utc)
+
+
+def _next_cron(schedule, after: datetime, tz: tzinfo) -> datetime | None:
+    if not schedule.cron_expression:
+        return None
+    moment = croniter(schedule.cron_expression, after.astimezone(tz)).get_next(datetime)
+    return moment.astimezone(timezone.utc)
+
+
+def _next_once(schedule, after: datetime, tz: tzinfo) -> datetime | None:
+    if schedule.last_run_at is not None or schedule.run_at is None:
+        return None
+    return _aware(schedule.run_at)
+
+
+NEXT_RUN = {
+    "interval": _next_interval,
+    "daily_time": _next_daily,
+    "cron": _next_cron,
+    "once": _next_once,
+}
+
+
+def next_run_time(schedule, after: datetime, tz: tzinfo = timezone.utc) -> datetime | None:
+    """
+    Ближайший запуск расписания строго после after (UTC).
+    None — расписание больше не должно срабатывать.
+    """
+    next_run = NEXT_RUN.get(schedule.schedule_type)
+    return next_run(schedule, _aware(after), tz) if next_run else None
+
+
+def _catch_up_skip(schedule, missed: datetime, now: datetime, tz: tzinfo, limit: int):
+    # Пропущенные запуски не выполняются, ждём следующего по расписанию
+    if schedule.schedule_type == "once":
+        return None
+    return next_run_time(schedule, now, tz)
+
+
+def _catch_up_latest(schedule, missed: datetime, now: datetime, tz: tzinfo, limit: int):
+    # Один запуск сразу за все пропущенные
+    return now
+
+
+def _catch_up_all(schedule, missed: datetime, now: datetime, tz: tzinfo, limit: int):
+    # Каждый пропущенный запуск по очереди, но не больше limit
+    moment = missed
+    for _ in range(limit):
+        moment = next_run_time(schedule, moment, tz)
+        if moment is None or moment >= now:
+            return missed
+    return now
+
+
+CATCH_UP_POLICIES = {
+    CATCH_UP_SKIP: _catch_up_skip,
+    CATCH_UP_LATEST: _catch_up_latest,
+    CATCH_UP_ALL: _catch_up_all,
+}
+
+
+def compute_next_fire(
+    schedule,
+    now: datetime,
+    tz: tzinfo = timezone.utc,
+    catch_up: str = CATCH_UP_LATEST,
+    max_catch_up: int = 10,
+) -> datetime | None:
+    """
+    Время следующего срабатывания с учётом пропущенных запусков
+    (например, после простоя сервиса) по политике catch_up.
+    """
+    now = _aware(now)
+    if schedule.last_run_at is not None:
+        reference = _aware(schedule.last_run_at)
+    else:
+        reference = datetime.fromtimestamp(schedule.created_at, tz=timezone.utc)
+
+    upcoming = next_run_time(schedule, reference, tz)
+    if upcoming is None or upcoming >= now:
+        return upcoming
+    policy = CATCH_UP_POLICIES.get(catch_up, _catch_up_latest)
+    return policy(schedule, upcoming, now, tz, max_catch_up)
@@ -0,0 +1,349 @@
+import asyncio
+import heapq
+import os
+import socket
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from loguru import logger
+from tortoise.expressions import Q
+from tortoise.signals import post_save, post_delete
+from config import Settings
+from app.database.models import ChatSchedule
+from app.scheduler.jobs import run_schedule
+from app.scheduler.schedule_calc import compute_next_fire
+
+settings = Settings()
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass(frozen=True)
+class SchedulerSettings:
+    """Настройки планировщика; по умолчанию — из переменных SCHEDULER_*."""
+    tz: str = settings.SCHEDULER_TIMEZONE
+    catch_up: str = settings.SCHEDULER_CATCH_UP
+    max_catch_up: int = settings.SCHEDULER_MAX_CATCH_UP
+    concurrency: int = settings.SCHEDULER_CONCURRENCY
+    refresh_interval: float = settings.SCHEDULER_REFRESH_INTERVAL
+    lease_ttl: float = settings.SCHEDULER_LEASE_TTL
+    retry_delay: float = settings.SCHEDULER_RETRY_DELAY
+
+
+class ScheduleHeap:
+    """
+    Min-куча (время запуска, schedule_id, версия). Перестановка расписания
+    добавляет новую запись, устаревшие отбрасываются по номеру версии
+    (ленивое удаление).
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, int]] = []
+        self._versions: dict[int, int] = {}
+        self._version = 0
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def __contains__(self, schedule_id: int) -> bool:
+        return schedule_id in self._versions
+
+    @property
+    def size(self) -> int:
+        return len(self._heap)
+
+    def _entry(self, schedule_id: int, fire_at: datetime) -> tuple[float, int, int]:
+        self._version += 1
+        self._versions[schedule_id] = self._version
+        return fire_at.timestamp(), schedule_id, self._version
+
+    def rebuild(self, fire_times: dict[int, datetime]):
+        """Полная пересборка — O(n)."""
+        self._versions = {}
+        self._heap = [self._entry(schedule_id, at) for schedule_id, at in fire_times.items()]
+        heapq.heapify(self._heap)
+
+    def push(self, schedule_id: int, fire_at: datetime):
+        heapq.heappush(self._heap, self._entry(schedule_id, fire_at))
+        # Слишком много устаревших записей — пересобираем кучу
+        if len(self._heap) > 2 * len(self._versions) + 64:
+            self._heap = [e for e in self._heap if self._versions.get(e[1]) == e[2]]
+            heapq.heapify(self._heap)
+
+    def remove(self, schedule_id: int):
+        self._versions.pop(schedule_id, None)
+
+    def peek(self) -> tuple[float, int] | None:
+        """Ближайшая актуальная запись (время, schedule_id) или None."""
+        while self._heap and self._versions.get(self._heap[0][1]) != self._heap[0][2]:
+            heapq.heappop(self._heap)
+        return self._heap[0][:2] if self._heap else None
+
+    def pop(self):
+        _, schedule_id, _ = heapq.heappop(self._heap)
+        self._versions.pop(schedule_id, None)
+
+
+class ScheduleRunner:
+    """
+    Планировщик ChatSchedule на min-куче времён следующего запуска.
+    Воркер спит до ближайшего срабатывания, а не опрашивает таблицу;
+    перестановка расписания — O(log n).
+
+    Куча есть в каждом воркере, но запуск выполняет только тот, кто взял
+    аренду в chat_schedules; аренда упавшего воркера перехватывается
+    после истечения lease_ttl.
+    """
+
+    def __init__(
+        self,
+        job=run_schedule,
+        options: SchedulerSettings = SchedulerSettings(),
+        worker_id: str | None = None,
+    ):
+        self.job = job
+        self.options = options
+        # Уникален для каждого воркера gunicorn и каждого контейнера
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self.heap = ScheduleHeap()
+        # Выполняющиеся запуски по schedule_id
+        self._jobs: dict[int, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(options.concurrency)
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self.counters = Counter(fired=0, failed=0)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def fired(self) -> int:
+        return self.counters["fired"]
+
+    @property
+    def failed(self) -> int:
+        return self.counters["failed"]
+
+    async def start(self):
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        await self.load()
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"⏰ Планировщик запущен, расписаний: {len(self.heap)}")
+
+    async def stop(self, timeout: float = 30.0):
+        if self._task is not None:
+            # Флаг вместо cancel: в 3.11 wait_for может проглотить отмену
+            self._stopping = True
+            self._wakeup.set()
+            done, _ = await asyncio.wait({self._task}, timeout=timeout)
+            if not done:
+                logger.error("Цикл планировщика не остановился вовремя, отменяем")
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._jobs:
+            await asyncio.wait(self._jobs.values(), timeout=timeout)
+        logger.info("🛑 Планировщик остановлен")
+
+    async def load(self):
+        """Полная пересборка кучи из всех включённых расписаний — O(n)."""
+        schedules = await ChatSchedule.filter(enabled=True)
+        now = utcnow()
+        fire_times = {}
+        for schedule in schedules:
+            fire_at = self._next_fire(schedule, now)
+            if fire_at is not None:
+                fire_times[schedule.schedule_id] = fire_at
+        self.heap.rebuild(fire_times)
+
+    def _next_fire(self, schedule: ChatSchedule, now: datetime) -> datetime | None:
+        return compute_next_fire(
+            schedule, now, ZoneInfo(self.options.tz),
+            catch_up=self.options.catch_up, max_catch_up=self.options.max_catch_up)
+
+    def reschedule(self, schedule: ChatSchedule):
+        """Пересчитывает время запуска одного расписания — O(log n)."""
+        self.remove(schedule.schedule_id)
+        if not schedule.enabled:
+            return
+        fire_at = self._next_fire(schedule, utcnow())
+        if fire_at is not None:
+            self._push(schedule.schedule_id, fire_at)
+
+    def _push(self, schedule_id: int, fire_at: datetime):
+        self.heap.push(schedule_id, fire_at)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def remove(self, schedule_id: int):
+        self.heap.remove(schedule_id)
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        refresh_at = loop.time() + self.options.refresh_interval
+        while not self._stopping:
+            if loop.time() >= refresh_at:
+                # Подхватываем расписания, изменённые в других процессах
+                await self.load()
+                refresh_at = loop.time() + self.options.refresh_interval
+
+            timeout = refresh_at - loop.time()
+            nearest = self.heap.peek()
+            if nearest is not None:
+                fire_ts, schedule_id = nearest
+                delay = fire_ts - utcnow().timestamp()
+                if delay <= 0:
+                    self.heap.pop()
+                    self._spawn(schedule_id, datetime.fromtimestamp(fire_ts, tz=timezone.utc))
+                    continue
+                timeout = min(timeout, delay)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    def _spawn(self, schedule_id: int, fire_at: datetime):
+        if schedule_id in self._jobs:
+            logger.warning(f"Расписание {schedule_id} ещё выполняется, запуск пропущен")
+            return
+        self._jobs[schedule_id] = asyncio.create_task(self._fire(schedule_id, fire_at))
+
+    async def _claim(self, schedule: ChatSchedule, fire_at: datetime) -> bool:
+        """
+        Берёт аренду на запуск одним UPDATE: проходит, только если last_run_at
+        не изменился и аренда свободна или истекла (воркер-владелец упал).
+        False — расписание выполняет или уже выполнил другой воркер.
+        """
+        now = utcnow()
+        query = ChatSchedule.filter(
+            Q(lease_owner__isnull=True) | Q(lease_expires_at__lt=now),
+            schedule_id=schedule.schedule_id,
+            enabled=True,
+        )
+        if schedule.last_run_at is None:
+            query = query.filter(last_run_at__isnull=True)
+        else:
+            query = query.filter(last_run_at=schedule.last_run_at)
+
+        return bool(await query.update(
+            lease_owner=self.worker_id,
+            lease_expires_at=now + timedelta(seconds=self.options.lease_ttl),
+        ))
+
+    async def _complete(self, schedule: ChatSchedule, fire_at: datetime) -> bool:
+        """Фиксирует запуск и освобождает аренду, если она всё ещё наша."""
+        changes = {
+            "last_run_at": fire_at,
+            "lease_owner": None,
+            "lease_expires_at": None,
+        }
+        if schedule.schedule_type == "once":
+            changes["enabled"] = False
+        return bool(await ChatSchedule.filter(
+            schedule_id=schedule.schedule_id, lease_owner=self.worker_id
+        ).update(**changes))
+
+    async def _release(self, schedule: ChatSchedule) -> bool:
+        """Освобождает аренду, не отмечая запуск: last_run_at остаётся прежним."""
+        return bool(await ChatSchedule.filter(
+            schedule_id=schedule.schedule_id, lease_owner=self.worker_id
+        ).update(lease_owner=None, lease_expires_at=None))
+
+    async def _renew_lease(self, schedule_id: int):
+        while True:
+            await asyncio.sleep(self.options.lease_ttl / 3)
+            try:
+                renewed = await ChatSchedule.filter(
+                    schedule_id=schedule_id, lease_owner=self.worker_id
+                ).update(lease_expires_at=utcnow() + timedelta(seconds=self.options.lease_ttl))
+            except Exception:
+                # Сбой БД не должен молча останавливать продление
+                logger.exception(f"Не удалось продлить аренду расписания {schedule_id}")
+                continue
+            if not renewed:
+                logger.warning(f"Аренда расписания {schedule_id} перехвачена другим воркером")
+                return
+
+    def _defer_until_lease_expires(self, schedule: ChatSchedule):
+        """Чужая аренда: проверим ещё раз, когда она истечёт."""
+        expires_at = schedule.lease_expires_at or utcnow()
+        self._push(schedule.schedule_id, expires_at + timedelta(seconds=1))
+
+    async def _fire(self, schedule_id: int, fire_at: datetime):
+        schedule = None
+        try:
+            async with self._semaphore:
+                schedule = await ChatSchedule.get_or_none(schedule_id=schedule_id, enabled=True)
+                if schedule is None:
+                    return
+
+                previous_run = schedule.last_run_at
+                if not await self._claim(schedule, fire_at):
+                    schedule = await ChatSchedule.get_or_none(schedule_id=schedule_id)
+                    if schedule is not None and schedule.last_run_at == previous_run \
+                            and schedule.lease_owner:
+                        logger.info(
+                            f"Расписание {schedule_id} выполняет воркер {schedule.lease_owner}")
+                        self._defer_until_lease_expires(schedule)
+                        schedule = None
+                    return
+
+                self.counters["fired"] += 1
+                renewer = asyncio.create_task(self._renew_lease(schedule_id))
+                try:
+                    await self.job(schedule, previous_run, fire_at)
+                except Exception:
+                    self.counters["failed"] += 1
+                    logger.exception(f"Ошибка выполнения расписания {schedule_id}")
+                    # Запуск не засчитан: окно previous_run..fire_at повторим позже
+                    await self._release(schedule)
+                    self._push(schedule_id, utcnow() + timedelta(seconds=self.options.retry_delay))
+                    schedule = None
+                    return
+                finally:
+                    renewer.cancel()
+                    await asyncio.gather(renewer, return_exceptions=True)
+
+                if not await self._complete(schedule, fire_at):
+                    logger.warning(f"Аренда расписания {schedule_id} истекла до завершения")
+                schedule.last_run_at = fire_at
+                schedule.enabled = schedule.schedule_type != "once"
+        finally:
+            self._jobs.pop(schedule_id, None)
+            if schedule is not None:
+                self.reschedule(schedule)
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": len(self.heap),
+            "heap_size": self.heap.size,
+            "running": len(self._jobs),
+            **self.counters,
+        }
+
+
+scheduler = ScheduleRunner()
+
+
+@post_save(ChatSchedule)
+async def _on_schedule_saved(sender, instance: ChatSchedule, *args):
+    if scheduler.running:
+        scheduler.reschedule(instance)
+
+
+@post_delete(ChatSchedule)
+async def _on_schedule_deleted(sender, instance: ChatSchedule, *args):
+    if scheduler.running:
+        scheduler.remove(instance.schedule_id)
@@ -0,0 +1,282 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, NamedTuple
+from loguru import logger
+from tortoise import connections
+from tortoise.exceptions import ConfigurationError
+from tortoise.backends.base.client import BaseDBAsyncClient
+from app.database.models import Message
+from app.search.stemmer import stem_words
+from app.utils.pagination import InvalidCursor, Page, decode_cursor, encode_cursor
+
+SEARCH_FIELDS = ("message_id", "chat_id", "user_id", "timestamp", "text")
+
+
+class SearchQuery(NamedTuple):
+    """Запрос поиска: слова, фильтры окна и страница."""
+    text: str
+    chat_id: int | None = None
+    user_id: int | None = None
+    date_from: int | None = None
+    date_to: int | None = None
+    limit: int = 20
+    cursor: str | None = None
+
+
+class SearchBackend(ABC):
+    """
+    Полнотекстовый поиск по messages.text. Бэкенд отвечает за индекс и
+    условие совпадения; выборка по компании и keyset-пагинация по
+    (timestamp, message_id) от новых к старым — общие.
+    """
+
+    source = '"messages" m'
+
+    async def prepare(self, connection: BaseDBAsyncClient) -> bool:
+        """Создаёт индекс, если его ещё нет; True — индекс только что построен."""
+        return False
+
+    async def index_messages(self, connection: BaseDBAsyncClient, messages: list[Message]):
+        """Добавляет в индекс только что вставленные сообщения."""
+
+    async def update_messages(self, connection: BaseDBAsyncClient, messages: list[Message]):
+        """Переиндексирует сообщения с изменённым текстом."""
+
+    @abstractmethod
+    def placeholder(self, index: int) -> str:
+        ...
+
+    @abstractmethod
+    def match_clause(self, placeholder: str) -> str:
+        ...
+
+    @abstractmethod
+    def match_value(self, query: str) -> str | None:
+        """Параметр условия совпадения; None — в запросе нет слов."""
+
+    def uuid_value(self, value):
+        return str(value)
+
+    def _cursor_clause(self, cursor: str, bind: Callable) -> str:
+        state = decode_cursor(cursor)
+        if state["s"] != "timestamp" or state["d"] is not True:
+            raise InvalidCursor("Курсор выдан для другой выборки")
+        if isinstance(state["v"], bool) or not isinstance(state["v"], int):
+            raise InvalidCursor("Некорректный курсор")
+        try:
+            last_id = self.uuid_value(uuid.UUID(str(state["id"])))
+        except ValueError as e:
+            raise InvalidCursor("Некорректный курсор") from e
+        return (
+            f'(m."timestamp" < {bind(state["v"])} OR '
+            f'(m."timestamp" = {bind(state["v"])} AND m."message_id" < {bind(last_id)}))'
+        )
+
+    async def search(
+        self, connection: BaseDBAsyncClient, company_id, query: SearchQuery
+    ) -> Page:
+        match = self.match_value(query.text)
+        if match is None:
+            return Page([], None, None)
+        await self.prepare(connection)
+
+        params = []
+
+        def bind(value) -> str:
+            params.append(value)
+            return self.placeholder(len(params))
+
+        where = [
+            f'c."company_id" = {bind(self.uuid_value(company_id))}',
+            self.match_clause(bind(match)),
+        ]
+        for column, op, value in (
+            ("chat_id", "=", query.chat_id),
+            ("user_id", "=", query.user_id),
+            ("timestamp", ">=", query.date_from),
+            ("timestamp", "<=", query.date_to),
+        ):
+            if value is not None:
+                where.append(f'm."{column}" {op} {bind(value)}')
+        if query.cursor is not None:
+            where.append(self._cursor_clause(query.cursor, bind))
+
+        columns = ", ".join(f'm."{field}"' for field in SEARCH_FIELDS)
+        rows = await connection.execute_query_dict(
+            f'SELECT {columns} FROM {self.source} '
+            f'JOIN "chats" c ON c."chat_id" = m."chat_id" '
+            f'WHERE {" AND ".join(where)} '
+            f'ORDER BY m."timestamp" DESC, m."message_id" DESC LIMIT {int(query.limit) + 1}',
+            params,
+        )
+        rows = [{**row, "message_id": str(row["message_id"])} for row in rows]
+
+        next_cursor = None
+        if len(rows) > query.limit:
+            rows = rows[:query.limit]
+            next_cursor = encode_cursor({
+                "v": rows[-1]["timestamp"],
+                "id": rows[-1]["message_id"],
+                "s": "timestamp",
+                "d": True,
+            })
+        return Page(rows, next_cursor, None)
+
+
+class SqliteFtsBackend(SearchBackend):
+    """
+    FTS5-таблица messages_fts с message_id сообщения (UNINDEXED), по нему же
+    идёт соединение с messages. Неявный rowid messages для этого не годится:
+    у таблицы UUID-ключ, и VACUUM может перенумеровать её rowid. rowid строки
+    индекса берётся из messages_fts_ids (INTEGER PRIMARY KEY стабилен), чтобы
+    удаление и переиндексация сообщения не сканировали индекс целиком.
+    Встроенные токенизаторы SQLite не знают русской морфологии, поэтому в
+    индекс и в запрос попадают основы слов после стеммера Snowball.
+    """
+
+    source = '"messages_fts" JOIN "messages" m ON m."message_id" = "messages_fts"."message_id"'
+    batch_size = 5000
+
+    def __init__(self):
+        self._ready_for: BaseDBAsyncClient | None = None
+        self._lock = asyncio.Lock()
+
+    async def prepare(self, connection: BaseDBAsyncClient) -> bool:
+        if self._ready_for is connection:
+            return False
+        async with self._lock:
+            if self._ready_for is connection:
+                return False
+            tables = await connection.execute_query_dict(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'table' "
+                "AND name IN ('messages_fts', 'messages_fts_ids')")
+            # Индекс прежнего формата (по rowid messages) строится заново
+            current = len(tables) == 2 and all('"message_id"' in t["sql"] for t in tables)
+            if not current:
+                await connection.execute_script(
+                    'DROP TRIGGER IF EXISTS "messages_fts_delete";'
+                    'DROP TABLE IF EXISTS "messages_fts";'
+                    'DROP TABLE IF EXISTS "messages_fts_ids";'
+                    'CREATE TABLE "messages_fts_ids" ('
+                    '"fts_rowid" INTEGER PRIMARY KEY, "message_id" CHAR(36) NOT NULL UNIQUE);'
+                    'CREATE VIRTUAL TABLE "messages_fts" USING fts5('
+                    '"body", "message_id" UNINDEXED, tokenize = \'unicode61 remove_diacritics 2\');'
+                    'CREATE TRIGGER "messages_fts_delete" AFTER DELETE ON "messages" BEGIN '
+                    'DELETE FROM "messages_fts" WHERE rowid = (SELECT "fts_rowid" '
+                    'FROM "messages_fts_ids" WHERE "message_id" = old."message_id"); '
+                    'DELETE FROM "messages_fts_ids" WHERE "message_id" = old."message_id"; END;'
+                )
+                await self.rebuild(connection)
+            self._ready_for = connection
+            return not current
+
+    async def _insert(self, connection: BaseDBAsyncClient, rows: list[list[str]]):
+        """rows — пары [message_id, основы слов через пробел]."""
+        await connection.execute_many(
+            'INSERT OR IGNORE INTO "messages_fts_ids" ("message_id") VALUES (?)',
+            [[message_id] for message_id, _ in rows],
+        )
+        await connection.execute_many(
+            'INSERT INTO "messages_fts" (rowid, "body", "message_id") '
+            'SELECT "fts_rowid", ?, "message_id" FROM "messages_fts_ids" WHERE "message_id" = ?',
+            [[body, message_id] for message_id, body in rows],
+        )
+
+    async def rebuild(self, connection: BaseDBAsyncClient):
+        """Заполняет индекс заново по всем сообщениям, пачками по message_id."""
+        await connection.execute_script('DELETE FROM "messages_fts"; DELETE FROM "messages_fts_ids";')
+        last, indexed = "", 0
+        while True:
+            rows = await connection.execute_query_dict(
+                'SELECT "message_id", "text" FROM "messages" '
+                'WHERE "message_id" > ? AND "text" IS NOT NULL ORDER BY "message_id" LIMIT ?',
+                [last, self.batch_size],
+            )
+            if not rows:
+                break
+            await self._insert(connection, [
+                [str(row["message_id"]), " ".join(stem_words(row["text"]))] for row in rows])
+            last = str(rows[-1]["message_id"])
+            indexed += len(rows)
+        logger.info(f"🔎 Поисковый индекс сообщений построен: {indexed}")
+
+    async def index_messages(self, connection: BaseDBAsyncClient, messages: list[Message]):
+        if await self.prepare(connection):
+            # Свежий индекс уже построен по всей таблице, включая эти сообщения
+            return
+        rows = [[str(m.message_id), " ".join(stem_words(m.text))] for m in messages if m.text]
+        if rows:
+            await self._insert(connection, rows)
+
+    async def update_messages(self, connection: BaseDBAsyncClient, messages: list[Message]):
+        if not messages or await self.prepare(connection):
+            return
+        await connection.execute_many(
+            'DELETE FROM "messages_fts" WHERE rowid = '
+            '(SELECT "fts_rowid" FROM "messages_fts_ids" WHERE "message_id" = ?)',
+            [[str(m.message_id)] for m in messages],
+        )
+        await self.index_messages(connection, messages)
+
+    def placeholder(self, index: int) -> str:
+        return "?"
+
+    def match_clause(self, placeholder: str) -> str:
+        return f'"messages_fts" MATCH {placeholder}'
+
+    def match_value(self, query: str) -> str | None:
+        # Каждое слово — отдельная фраза в кавычках: все слова обязательны,
+        # синтаксис FTS5 в пользовательском запросе не интерпретируется
+        words = list(dict.fromkeys(stem_words(query)))
+        return " ".join(f'"{word}"' for word in words) if words else None
+
+
+class PostgresFtsBackend(SearchBackend):
+    """
+    Генерируемая колонка messages.search_vector (to_tsvector('russian', text))
+    с GIN-индексом — создаётся миграцией и обновляется самой базой.
+    """
+
+    def placeholder(self, index: int) -> str:
+        return f"${index}"
+
+    def match_clause(self, placeholder: str) -> str:
+        return f"m.\"search_vector\" @@ websearch_to_tsquery('russian', {placeholder})"
+
+    def match_value(self, query: str) -> str | None:
+        return query if stem_words(query) else None
+
+    def uuid_value(self, value):
+        return uuid.UUID(str(value))
+
+
+class MessageSearch:
+    """Выбирает бэкенд поиска по диалекту подключения Tortoise."""
+
+    def __init__(self):
+        self._backends = {
+            "sqlite": SqliteFtsBackend(),
+            "postgres": PostgresFtsBackend(),
+        }
+
+    def backend(self, connection: BaseDBAsyncClient) -> SearchBackend:
+        dialect = connection.capabilities.dialect
+        if dialect not in self._backends:
+            raise ConfigurationError(f"Полнотекстовый поиск не поддерживается для {dialect}")
+        return self._backends[dialect]
+
+    async def index_messages(self, messages: list[Message]):
+        connection = connections.get("default")
+        await self.backend(connection).index_messages(connection, messages)
+
+    async def update_messages(self, messages: list[Message]):
+        connection = connections.get("default")
+        await self.backend(connection).update_messages(connection, messages)
+
+    async def search(self, company_id, query: SearchQuery) -> Page:
+        connection = connections.get("default")
+        return await self.backend(connection).search(connection, company_id, query)
+
+
+message_search = MessageSearch()
@@ -0,0 +1,127 @@
+import re
+
+# Стеммер Snowball для русского языка — тот же алгоритм, что у словаря
+# russian_stem в Postgres, поэтому SQLite и Postgres находят одинаковые формы.
+
+VOWELS = "аеиоуыэюя"
+
+# Окончания с суффиксом _A допустимы только после «а» или «я»
+PERFECTIVE_GERUND_A = ("в", "вши", "вшись")
+PERFECTIVE_GERUND = ("ив", "ивши", "ившись", "ыв", "ывши", "ывшись")
+REFLEXIVE = ("ся", "сь")
+ADJECTIVE = (
+    "ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым",
+    "ом", "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+)
+PARTICIPLE_A = ("ем", "нн", "вш", "ющ", "щ")
+PARTICIPLE = ("ивш", "ывш", "ующ")
+VERB_A = (
+    "ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют", "ны",
+    "ть", "ешь", "нно",
+)
+VERB = (
+    "ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил", "ыл", "им",
+    "ым", "ен", "ило", "ыло", "ено", "ят", "ует", "уют", "ит", "ыт", "ены", "ить", "ыть",
+    "ишь", "ую", "ю",
+)
+NOUN = (
+    "а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ей",
+    "ой", "ий", "й", "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах", "иях", "ях",
+    "ы", "ь", "ию", "ью", "ю", "ия", "ья", "я",
+)
+DERIVATIONAL = ("ост", "ость")
+SUPERLATIVE = ("ейше", "ейш")
+
+WORD_RE = re.compile(r"\w+")
+
+
+def _past(word: str, start: int, vowel: bool) -> int | None:
+    for i in range(start, len(word)):
+        if (word[i] in VOWELS) == vowel:
+            return i + 1
+    return None
+
+
+def _regions(word: str) -> tuple[int, int]:
+    """RV — после первой гласной, R2 — после второго сочетания «гласная + согласная»."""
+    rv = _past(word, 0, True)
+    if rv is None:
+        return len(word), len(word)
+    r2 = _past(word, rv, False)
+    for vowel in (True, False):
+        if r2 is None:
+            break
+        r2 = _past(word, r2, vowel)
+    return rv, len(word) if r2 is None else r2
+
+
+def _longest(word: str, start: int, suffixes) -> str | None:
+    found = [s for s in suffixes if word.endswith(s) and len(word) - len(s) >= start]
+    return max(found, key=len) if found else None
+
+
+def _strip(word: str, rv: int, suffixes, after_a=()) -> str | None:
+    """
+    Снимает самое длинное окончание; окончания after_a — только после
+    «а» или «я». None, если снимать нечего.
+    """
+    suffix = _longest(word, rv, suffixes + after_a)
+    if suffix is None:
+        return None
+    stem = word[:-len(suffix)]
+    if suffix in after_a and not (len(stem) > rv and stem[-1] in "ая"):
+        return None
+    return stem
+
+
+def _adjectival(word: str, rv: int) -> str | None:
+    stem = _strip(word, rv, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _strip(stem, rv, PARTICIPLE, PARTICIPLE_A)
+    return stem if participle is None else participle
+
+
+def stem(word: str) -> str:
+    word = word.lower().replace("ё", "е")
+    rv, r2 = _regions(word)
+
+    stemmed = _strip(word, rv, PERFECTIVE_GERUND, PERFECTIVE_GERUND_A)
+    if stemmed is None:
+        reflexive = _strip(word, rv, REFLEXIVE)
+        if reflexive is not None:
+            word = reflexive
+        for step in (
+            lambda w: _adjectival(w, rv),
+            lambda w: _strip(w, rv, VERB, VERB_A),
+            lambda w: _strip(w, rv, NOUN),
+        ):
+            stemmed = step(word)
+            if stemmed is not None:
+                break
+    if stemmed is not None:
+        word = stemmed
+
+    if word.endswith("и") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    suffix = _longest(word, r2, DERIVATIONAL)
+    if suffix is not None:
+        word = word[:-len(suffix)]
+
+    suffix = _longest(word, rv, SUPERLATIVE)
+    if suffix is not None:
+        word = word[:-len(suffix)]
+    if word.endswith("нн") and len(word) - 2 >= rv:
+        word = word[:-1]
+    elif suffix is None and word.endswith("ь") and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+def stem_words(text: str | None) -> list[str]:
+    """Слова текста в нижнем регистре; кириллические — приведённые к основе."""
+    return [
+        stem(word) if re.search("[а-яё]", word) else word
+        for word in WORD_RE.findall((text or "").lower())
+    ]
@@ -0,0 +1,174 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from config import Settings
+
+settings = Settings()
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SCHEDULED = 1
+LANES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_SCHEDULED: "scheduled"}
+
+# Приоритет наследуется задачами, созданными внутри (gather, create_task)
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def priority_lane(priority: int):
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class ApiGovernor:
+    """
+    Token bucket (rate запросов в секунду, запас burst) плюс ограничение
+    одновременных запросов. Запросы сверх лимита не отклоняются, а ждут
+    в очереди; из очереди первым выходит запрос с меньшим номером
+    приоритета, при равном — пришедший раньше.
+    """
+
+    def __init__(self, name: str, rate: float = 10, burst: int = 10, concurrency: int = 10):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.concurrency = concurrency
+
+        self._tokens = float(self.burst)
+        self._updated = monotonic()
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_loop: asyncio.AbstractEventLoop | None = None
+
+        self.granted = 0
+        self._waits = {lane: {"count": 0, "total": 0.0, "max": 0.0} for lane in LANES.values()}
+
+    def _refill(self):
+        now = monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        else:
+            self._tokens = self.burst
+        self._updated = now
+
+    def _grant(self):
+        self._tokens -= 1
+        self._active += 1
+        self.granted += 1
+
+    def _dispatch(self):
+        self._refill()
+        while self._waiters and self._active < self.concurrency:
+            if self._waiters[0][2].done():
+                # Ожидание отменено
+                heapq.heappop(self._waiters)
+                continue
+            if self._tokens < 1:
+                loop = asyncio.get_running_loop()
+                if self._timer is None or self._timer_loop is not loop:
+                    delay = (1 - self._tokens) / self.rate
+                    self._timer = loop.call_later(delay, self._on_timer)
+                    self._timer_loop = loop
+                return
+            _, _, future = heapq.heappop(self._waiters)
+            self._grant()
+            future.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _record_wait(self, priority: int, waited: float):
+        stats = self._waits[LANES.get(priority, LANES[PRIORITY_SCHEDULED])]
+        stats["count"] += 1
+        stats["total"] += waited
+        stats["max"] = max(stats["max"], waited)
+
+    async def acquire(self, priority: int | None = None):
+        if priority is None:
+            priority = request_priority.get()
+        started = monotonic()
+        self._refill()
+        if not self._waiters and self._active < self.concurrency and self._tokens >= 1:
+            self._grant()
+            self._record_wait(priority, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже выдан — возвращаем его следующему
+                self.release()
+            raise
+        self._record_wait(priority, monotonic() - started)
+
+    def release(self):
+        self._active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int | None = None):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        queued = {lane: 0 for lane in LANES.values()}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                queued[LANES.get(priority, LANES[PRIORITY_SCHEDULED])] += 1
+        return {
+            "active": self._active,
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "granted": self.granted,
+            "queued": queued,
+            "wait": {
+                lane: {
+                    "count": w["count"],
+                    "avg_ms": round(w["total"] / w["count"] * 1000, 1) if w["count"] else 0.0,
+                    "max_ms": round(w["max"] * 1000, 1),
+                }
+                for lane, w in self._waits.items()
+            },
+        }
+
+
+API_LIMITS = {
+    "gpt": lambda: (
+        settings.YANDEX_GPT_RATE_LIMIT, settings.YANDEX_GPT_BURST,
+        settings.YANDEX_GPT_MAX_CONCURRENCY),
+    "speechkit": lambda: (
+        settings.SPEECHKIT_RATE_LIMIT, settings.SPEECHKIT_BURST,
+        settings.SPEECHKIT_MAX_CONCURRENCY),
+}
+
+_governors: dict[tuple[str, str | None], ApiGovernor] = {}
+
+
+def get_governor(api: str, folder_id: str | None = None) -> ApiGovernor:
+    """Отдельный лимит на каждую пару (API, каталог облака): квоты Yandex считаются по каталогу."""
+    key = (api, folder_id)
+    governor = _governors.get(key)
+    if governor is None:
+        rate, burst, concurrency = API_LIMITS[api]()
+        governor = ApiGovernor(f"{api}:{folder_id}", rate, burst, concurrency)
+        _governors[key] = governor
+    return governor
+
+
+def governors_stats() -> dict:
+    return {governor.name: governor.stats() for governor in _governors.values()}
@@ -1,5 +1,72 @@
+from typing import AsyncIterator, NamedTuple
+from uuid import UUID
+from tortoise.expressions import Q
+from tortoise.functions import Count, Max, Min, Sum
 from app.database.models import Message
 
 
+class MessageRow(NamedTuple):
+    message_id: UUID
+    timestamp: int
+    chat_id: int
+    user_id: int
+    text: str | None
+    s3_key: str | None
+
+
 async def get_messages_for_company(company_id, **filters):
     return await Message.filter(chat__company=company_id, **filters)
+
+
+def message_page_query(
+    company_id, last: MessageRow | None = None, chunk_size: int = 1000, **filters
+):
+    """Запрос одной страницы iter_messages_for_company: chunk_size строк после last."""
+    query = Message.filter(chat__company=company_id, **filters)
+    if last is not None:
+        query = query.filter(
+            Q(timestamp__gt=last.timestamp)
+            | Q(timestamp=last.timestamp, message_id__gt=last.message_id)
+        )
+    return query.order_by("timestamp", "message_id").limit(chunk_size).values_list(
+        *MessageRow._fields
+    )
+
+
+async def iter_messages_for_company(
+    company_id, chunk_size: int = 1000, **filters
+) -> AsyncIterator[MessageRow]:
+    """
+    Постранично отдаёт сообщения компании в порядке (timestamp, message_id).
+    Keyset-пагинация: каждая страница начинается после последней строки
+    предыдущей, поэтому стоимость не растёт с глубиной, а в памяти держится
+    не больше chunk_size лёгких кортежей.
+    """
+    last: MessageRow | None = None
+    while True:
+        rows = await message_page_query(company_id, last, chunk_size, **filters)
+        for row in rows:
+            yield MessageRow(*row)
+
+        if len(rows) < chunk_size:
+            return
+        last = MessageRow(*rows[-1])
+
+
+async def message_window_digest(
+    company_id, **filters
+) -> tuple[int, int | None, int | None, int]:
+    """
+    Сводка набора сообщений окна одним агрегатным запросом:
+    (количество, первый timestamp, последний timestamp, число правок).
+    Меняется при появлении в окне новых сообщений и при их правке.
+    """
+    # Без явного group_by Tortoise при JOIN группирует по всем полям сообщения
+    rows = await Message.filter(chat__company=company_id, **filters).annotate(
+        count=Count("message_id"), first=Min("timestamp"), last=Max("timestamp"),
+        edits=Sum("edits_count"),
+    ).group_by("chat__company_id").values("count", "first", "last", "edits")
+    if not rows:
+        return 0, None, None, 0
+    row = rows[0]
+    return row["count"], row["first"], row["last"], int(row["edits"] or 0)
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import random
+from contextlib import nullcontext
+from time import monotonic
+from typing import Any, AsyncIterator
+from urllib.parse import urlsplit
+import aiohttp
+from loguru import logger
+from config import Settings
+from app.utils.governor import ApiGovernor
+
+settings = Settings()
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# После отправки запроса (таймаут, обрыв соединения) повторяем только их:
+# неидемпотентный POST мог уже выполниться
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class HttpClient:
+    """
+    Одна aiohttp-сессия на приложение: keep-alive соединения, кэш DNS
+    и лимит соединений на хост переиспользуются всеми интеграциями.
+    Сетевые ошибки и ответы 429/5xx повторяются с экспоненциальной
+    задержкой и случайным разбросом, чтобы воркеры не били в API синхронно.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        keepalive_timeout: float = 60,
+        timeout: float = 30,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 10,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._session: aiohttp.ClientSession | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._hosts: dict[str, dict] = {}
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed:
+            if self._loop is loop:
+                return
+            # Сессия от другого цикла: закрываем, чтобы не оставлять соединения
+            try:
+                await self._session.close()
+            except Exception as e:
+                logger.warning(f"Не удалось закрыть HTTP-сессию прежнего цикла: {e!r}")
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=300,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        self._loop = loop
+        logger.info("🌐 HTTP-клиент открыт")
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("HTTP-клиент закрыт")
+        self._session = None
+        self._loop = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # Лениво (до startup, в тестах) и заново, если сессия от другого цикла
+        await self.start()
+        return self._session
+
+    def _delay(self, attempt: int, retry_after: str | None = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def _retryable(method: str, error: Exception) -> bool:
+        # ClientConnectorError — соединение не установлено, запрос не ушёл
+        return method.upper() in IDEMPOTENT_METHODS or isinstance(
+            error, aiohttp.ClientConnectorError)
+
+    def _record(self, host: str, elapsed: float, error: bool = False, retry: bool = False):
+        stats = self._hosts.setdefault(
+            host, {"requests": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["requests"] += 1
+        stats["errors"] += error
+        stats["retries"] += retry
+        elapsed_ms = elapsed * 1000
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    async def request_bytes(
+        self,
+        method: str,
+        url: str,
+        *,
+        retries: int | None = None,
+        timeout: float | None = None,
+        governor: ApiGovernor | None = None,
+        **kwargs,
+    ) -> tuple[int, bytes]:
+        """
+        Запрос с повторами; возвращает (статус, тело ответа).
+        Последний ответ с ошибкой возвращается вызывающему как есть.
+        С governor каждая попытка берёт у него отдельный слот, а пауза
+        перед повтором проходит вне слота: повторы после 429 расходуют
+        токены наравне с остальными запросами.
+        """
+        session = await self._get_session()
+        host = urlsplit(url).netloc
+        retries = self.retries if retries is None else retries
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        for attempt in range(retries + 1):
+            last_attempt = attempt == retries
+            started = monotonic()
+            try:
+                async with governor.slot() if governor is not None else nullcontext():
+                    async with session.request(method, url, **kwargs) as response:
+                        body = await response.read()
+                        status = response.status
+                        retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                retryable = not last_attempt and self._retryable(method, e)
+                self._record(host, monotonic() - started, error=True, retry=retryable)
+                if not retryable:
+                    raise
+                logger.warning(f"Ошибка соединения с {host}: {e!r}, повтор {attempt + 1}/{retries}")
+                await asyncio.sleep(self._delay(attempt))
+                continue
+
+            failed = status in RETRY_STATUSES
+            self._record(host, monotonic() - started, error=failed, retry=failed and not last_attempt)
+            if not failed or last_attempt:
+                return status, body
+            logger.warning(f"{host} ответил {status}, повтор {attempt + 1}/{retries}")
+            await asyncio.sleep(self._delay(attempt, retry_after))
+
+    async def request_json(self, method: str, url: str, **kwargs) -> tuple[int, Any]:
+        """request_bytes с разбором JSON; тело не в JSON — None."""
+        status, body = await self.request_bytes(method, url, **kwargs)
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            data = None
+        return status, data
+
+    async def iter_bytes(
+        self, url: str, chunk_size: int = 1024 * 1024, **kwargs
+    ) -> AsyncIterator[bytes]:
+        """
+        Потоковый GET: тело ответа отдаётся частями и целиком в памяти не
+        держится. Без повторов — уже отданные части не вернуть; ответ не
+        2xx — aiohttp.ClientResponseError.
+        """
+        session = await self._get_session()
+        host = urlsplit(url).netloc
+        started = monotonic()
+        failed = True
+        try:
+            async with session.get(url, **kwargs) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    yield chunk
+            failed = False
+        finally:
+            self._record(host, monotonic() - started, error=failed)
+
+    def stats(self) -> dict:
+        return {
+            host: {
+                "requests": s["requests"],
+                "errors": s["errors"],
+                "retries": s["retries"],
+                "avg_ms": round(s["total_ms"] / s["requests"], 1) if s["requests"] else 0.0,
+                "max_ms": round(s["max_ms"], 1),
+            }
+            for host, s in self._hosts.items()
+        }
+
+
+http_client = HttpClient(
+    limit=settings.HTTP_POOL_LIMIT,
+    limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+    keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+    timeout=settings.HTTP_TIMEOUT,
+    retries=settings.HTTP_RETRIES,
+    backoff=settings.HTTP_BACKOFF,
+)
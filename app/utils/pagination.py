@@ -0,0 +1,90 @@
+import base64
+import json
+from typing import NamedTuple
+from tortoise.expressions import Q, RawSQL
+from tortoise.queryset import QuerySet
+
+
+class InvalidCursor(ValueError):
+    """Курсор повреждён или выдан для другой сортировки."""
+
+
+class Page(NamedTuple):
+    items: list[dict]
+    next_cursor: str | None
+    total: int | None
+
+
+def encode_cursor(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Некорректный курсор") from e
+    if not isinstance(payload, dict) or not {"v", "id", "s", "d"} <= payload.keys():
+        raise InvalidCursor("Некорректный курсор")
+    return payload
+
+
+async def paginate_keyset(
+    query: QuerySet,
+    fields: list[str],
+    sort_field: str,
+    pk_field: str,
+    descending: bool = False,
+    limit: int = 20,
+    cursor: str | None = None,
+    with_total: bool = False,
+) -> Page:
+    """
+    Keyset-пагинация по (sort_field, pk_field): страница начинается строго
+    после последней строки предыдущей, поэтому стоимость не зависит от глубины.
+    sort_field должен быть NOT NULL.
+
+    Общее количество считается только по запросу и только на первой
+    странице — оконной функцией COUNT(*) OVER () в том же запросе; дальше
+    оно переносится в курсоре и может устареть (оценка).
+    """
+    fields = list(dict.fromkeys([*fields, sort_field, pk_field]))
+    total = None
+    if cursor is not None:
+        state = decode_cursor(cursor)
+        if state["s"] != sort_field or state["d"] != descending:
+            raise InvalidCursor("Курсор выдан для другой сортировки")
+        op = "lt" if descending else "gt"
+        query = query.filter(
+            Q(**{f"{sort_field}__{op}": state["v"]})
+            | Q(**{sort_field: state["v"], f"{pk_field}__{op}": state["id"]})
+        )
+        total = state.get("t")
+    elif with_total:
+        query = query.annotate(_total=RawSQL("COUNT(*) OVER ()"))
+        fields = [*fields, "_total"]
+
+    prefix = "-" if descending else ""
+    rows = await query.order_by(f"{prefix}{sort_field}", f"{prefix}{pk_field}").limit(
+        limit + 1).values(*fields)
+
+    if cursor is None and with_total:
+        total = rows[0]["_total"] if rows else 0
+        for row in rows:
+            del row["_total"]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor({
+            "v": last[sort_field],
+            "id": last[pk_field],
+            "s": sort_field,
+            "d": descending,
+            "t": total,
+        })
+    return Page(rows, next_cursor, total)
+
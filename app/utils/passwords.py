@@ -0,0 +1,66 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from config import Settings
+
+settings = Settings()
+
+
+class PasswordHasher:
+    """
+    Асинхронная обёртка над bcrypt. Хэширование выполняется в отдельном
+    пуле потоков (bcrypt отпускает GIL), чтобы не блокировать event loop.
+    Семафор ограничивает число задач, ожидающих пул.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 2, concurrency: int = 8):
+        self.rounds = rounds
+        self.workers = workers
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, func, *args):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    def _hash_sync(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds)).decode()
+
+    @staticmethod
+    def _verify_sync(password: str, password_hash: str) -> bool:
+        try:
+            return bcrypt.checkpw(password.encode(), password_hash.encode())
+        except ValueError:
+            return False
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash_sync, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(self._verify_sync, password, password_hash)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Хэш создан с другим cost-фактором: $2b$<rounds>$..."""
+        try:
+            return int(password_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    concurrency=settings.PASSWORD_HASH_CONCURRENCY,
+)
@@ -0,0 +1,92 @@
+import asyncio
+from abc import ABC, abstractmethod
+from loguru import logger
+
+
+class BackgroundWorker(ABC):
+    """
+    Общий жизненный цикл фоновых воркеров приложения: start() запускает
+    concurrency копий _run(), stop() перестаёт принимать задачи, дожидается
+    разбора очереди (если она есть) и отменяет задачи.
+    Сообщения started_message/stopped_message форматируются с self.
+    """
+
+    started_message: str | None = None
+    stopped_message: str | None = None
+
+    def __init__(self, concurrency: int = 1, queue_size: int = 0):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    @property
+    def accepting(self) -> bool:
+        return self.running and not self._closing
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self):
+        if self.running:
+            return
+        if self.queue_size:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._closing = False
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        if self.started_message:
+            logger.info(self.started_message.format(self=self))
+
+    async def stop(self, timeout: float = 30.0):
+        """Перестаёт принимать задачи и дожидается уже поставленных в очередь."""
+        if not self._tasks:
+            return
+        self._closing = True
+        if self._queue is not None and self.running:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.error(
+                    f"{type(self).__name__}: не дождались очереди, осталось: {self.qsize()}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.stopped_message:
+            logger.info(self.stopped_message.format(self=self))
+
+    async def _put(self, item, timeout: float):
+        """Кладёт задачу в очередь; asyncio.TimeoutError — очередь не освободилась."""
+        await asyncio.wait_for(self._queue.put(item), timeout=timeout)
+
+    @abstractmethod
+    async def _run(self):
+        ...
+
+    def stats(self) -> dict:
+        return {"queued": self.qsize(), "max_queue": self.queue_size}
+
+
+class PeriodicWorker(BackgroundWorker):
+    """Вызывает run_once() раз в interval секунд; ошибка прогона не останавливает цикл."""
+
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = interval
+
+    @abstractmethod
+    async def run_once(self):
+        ...
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception(f"{type(self).__name__}: ошибка фонового прогона")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,425 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timezone
+from time import time
+from typing import AsyncIterator, NamedTuple
+from loguru import logger
+from config import Settings
+from app.database.models import AnalysisChunk, AnalysisResult, RollingSummary, User
+from app.s3.message_archive import iter_company_messages, window_digest
+from app.utils.helpers import MessageRow, iter_messages_for_company
+from app.yandex_funcs.yandex_gpt import yandex_gpt_complete
+
+settings = Settings()
+
+MAP_INSTRUCTION = (
+    "Ниже фрагмент переписки (часть {index}). "
+    "Выполни задачу только по этому фрагменту, результат будет объединён с остальными."
+)
+REDUCE_INSTRUCTION = (
+    "Ниже частичные результаты анализа разных фрагментов одной переписки. "
+    "Объедини их в один итоговый ответ на задачу, без повторов."
+)
+
+
+class PromptTooLong(ValueError):
+    """Промпт не оставляет места под переписку в пределах chunk_tokens."""
+
+
+class AnalysisWindow(NamedTuple):
+    """Окно анализируемых сообщений; None — граница не задана."""
+
+    chat_id: int | None = None
+    user_id: int | None = None
+    date_from: int | None = None
+    date_to: int | None = None
+    # Граница по времени приёма сообщения (received_at)
+    received_until: int | None = None
+
+    def filters(self) -> dict:
+        filters = {}
+        if self.chat_id is not None:
+            filters["chat_id"] = self.chat_id
+        if self.user_id is not None:
+            filters["user_id"] = self.user_id
+        if self.date_from is not None:
+            filters["timestamp__gte"] = self.date_from
+        if self.date_to is not None:
+            filters["timestamp__lte"] = self.date_to
+        if self.received_until is not None:
+            filters["received_at__lte"] = self.received_until
+        return filters
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка с запасом: ~3 символа на токен для русского текста."""
+    return len(text) // 3 + 1
+
+
+class AnalysisEngine:
+    """
+    Map-reduce анализ переписки:
+    поток сообщений режется на фрагменты в пределах бюджета токенов,
+    фрагменты анализируются параллельно (частоту и очередь запросов к API
+    по приоритетам ограничивает ApiGovernor),
+    частичные результаты сворачиваются в один итог.
+    """
+
+    def __init__(
+        self,
+        complete=yandex_gpt_complete,
+        chunk_tokens: int = 6000,
+        max_output_tokens: int = 2000,
+        concurrency: int = 4,
+        ingest_lag: float = 60,
+    ):
+        self.complete = complete
+        self.chunk_tokens = chunk_tokens
+        self.max_output_tokens = max_output_tokens
+        self.concurrency = concurrency
+        self.ingest_lag = ingest_lag
+
+        self.computed = 0
+        self.reused = 0
+
+    def _budget(self, task_text: str, instruction: str) -> int:
+        """
+        Токены фрагмента, остающиеся под переписку. Под неё должна оставаться
+        хотя бы четверть chunk_tokens, иначе анализ свёлся бы к запросу на
+        каждое (обрезанное) сообщение.
+        """
+        budget = self.chunk_tokens - estimate_tokens(task_text) - estimate_tokens(instruction)
+        if budget < self.chunk_tokens // 4:
+            raise PromptTooLong(
+                f"Промпт слишком длинный (~{estimate_tokens(task_text)} токенов) "
+                f"для фрагмента в {self.chunk_tokens} токенов")
+        return budget
+
+    async def _call(self, system_text: str, user_text: str):
+        return await self.complete(system_text, user_text, self.max_output_tokens)
+
+    async def iter_chunks(
+        self, rows: AsyncIterator[MessageRow], budget: int
+    ) -> AsyncIterator[list[MessageRow]]:
+        """Группирует сообщения во фрагменты, укладывающиеся в budget токенов."""
+        chunk: list[MessageRow] = []
+        used = 0
+        async for row in rows:
+            if not row.text:
+                continue
+            # +15 токенов на дату и имя автора
+            cost = min(estimate_tokens(row.text) + 15, budget)
+            if chunk and used + cost > budget:
+                yield chunk
+                chunk, used = [], 0
+            chunk.append(row)
+            used += cost
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    async def _render(chunk: list[MessageRow], names: dict, budget: int) -> str:
+        unknown = {row.user_id for row in chunk} - names.keys()
+        if unknown:
+            for user_id, username, account_name in await User.filter(
+                user_id__in=list(unknown)
+            ).values_list("user_id", "username", "account_name"):
+                names[user_id] = username or account_name or str(user_id)
+
+        lines = []
+        for row in chunk:
+            moment = datetime.fromtimestamp(row.timestamp, tz=timezone.utc)
+            lines.append(
+                f"[{moment:%Y-%m-%d %H:%M}] {names.get(row.user_id, row.user_id)}: {row.text}")
+        # Одиночное сообщение больше бюджета обрезаем
+        return "\n".join(lines)[:budget * 3]
+
+    async def _map_chunk(self, task_text: str, index: int, chunk, names: dict, budget: int) -> dict:
+        text = await self._render(chunk, names, budget)
+        system_text = f"{task_text}\n\n{MAP_INSTRUCTION.format(index=index + 1)}"
+        result_text, tokens_input, tokens_output = await self._call(system_text, text)
+        logger.debug(
+            f"Фрагмент {index + 1}: {len(chunk)} сообщений, токены {tokens_input}/{tokens_output}")
+        return {
+            "stage": "map",
+            "chunk_index": index,
+            "messages_count": len(chunk),
+            "result_text": result_text,
+            "tokens_input": tokens_input,
+            "tokens_output": tokens_output,
+        }
+
+    async def _reduce_group(self, task_text: str, index: int, texts: list[str]) -> dict:
+        system_text = f"{task_text}\n\n{REDUCE_INSTRUCTION}"
+        user_text = "\n\n".join(f"Часть {i + 1}:\n{text}" for i, text in enumerate(texts))
+        result_text, tokens_input, tokens_output = await self._call(system_text, user_text)
+        return {
+            "stage": "reduce",
+            "chunk_index": index,
+            "messages_count": 0,
+            "result_text": result_text,
+            "tokens_input": tokens_input,
+            "tokens_output": tokens_output,
+        }
+
+    def _group_by_budget(self, texts: list[str], budget: int) -> list[list[str]]:
+        groups, group, used = [], [], 0
+        for text in texts:
+            cost = estimate_tokens(text)
+            # В группе минимум два результата, иначе свёртка не сойдётся
+            if len(group) >= 2 and used + cost > budget:
+                groups.append(group)
+                group, used = [], 0
+            group.append(text)
+            used += cost
+        if group:
+            groups.append(group)
+        return groups
+
+    async def _reduce(self, task_text: str, texts: list[str]) -> tuple[str, list[dict]]:
+        budget = self._budget(task_text, REDUCE_INSTRUCTION)
+        records = []
+        while len(texts) > 1:
+            groups = self._group_by_budget(texts, budget)
+            results = await asyncio.gather(*(
+                self._reduce_group(task_text, len(records) + i, group)
+                for i, group in enumerate(groups)
+            ))
+            records.extend(results)
+            texts = [r["result_text"] for r in results]
+        return texts[0], records
+
+    @staticmethod
+    def fingerprint(prompt_text: str, company_id, filters: dict, digest: tuple) -> str:
+        """Хэш всего, от чего зависит результат: промпт, модель, фильтры, набор сообщений."""
+        payload = json.dumps({
+            "prompt": hashlib.sha256(prompt_text.encode()).hexdigest(),
+            "model": settings.YANDEX_GPT_MODEL,
+            "company_id": str(company_id),
+            "filters": filters,
+            "messages": digest,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def _map_reduce(
+        self, task_text: str, rows: AsyncIterator[MessageRow]
+    ) -> tuple[str, list[dict]] | None:
+        """Итоговый текст и записи фрагментов; None — сообщений нет."""
+        budget = self._budget(task_text, MAP_INSTRUCTION)
+        names: dict = {}
+        # Не держим в памяти больше concurrency необработанных фрагментов
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks: list[asyncio.Task] = []
+        try:
+            async for chunk in self.iter_chunks(rows, budget):
+                await slots.acquire()
+                task = asyncio.create_task(
+                    self._map_chunk(task_text, len(tasks), chunk, names, budget))
+                task.add_done_callback(lambda _: slots.release())
+                tasks.append(task)
+            partials = list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        if not partials:
+            return None
+
+        final_text, reduced = await self._reduce(
+            task_text, [p["result_text"] for p in partials])
+        return final_text, partials + reduced
+
+    async def _store(self, prompt, company_id, final_text: str, parts: list[dict], **fields):
+        result = await AnalysisResult.create(
+            prompt=prompt,
+            result_text=final_text,
+            company_id=company_id,
+            tokens_input=sum(p["tokens_input"] for p in parts),
+            tokens_output=sum(p["tokens_output"] for p in parts),
+            **fields,
+        )
+        self.computed += 1
+        await AnalysisChunk.bulk_create([AnalysisChunk(analysis=result, **p) for p in parts])
+        logger.success(
+            f"Анализ {result.analysis_id}: {sum(p['stage'] == 'map' for p in parts)} фрагментов, "
+            f"токены {result.tokens_input}/{result.tokens_output}")
+        return result
+
+    async def _reusable(
+        self, prompt, company_id, filters: dict
+    ) -> tuple[str, AnalysisResult | None] | None:
+        """Отпечаток окна и сохранённый по нему результат; None — в окне нет сообщений."""
+        digest = await window_digest(company_id, **filters)
+        count, *_, archived = digest
+        if not count and not archived:
+            return None
+        fingerprint = self.fingerprint(prompt.text, company_id, filters, digest)
+        cached = await AnalysisResult.filter(
+            fingerprint=fingerprint, company_id=company_id
+        ).order_by("-created_at").first()
+        return fingerprint, cached
+
+    async def analyze(
+        self,
+        prompt,
+        company_id,
+        window: AnalysisWindow = AnalysisWindow(),
+        schedule=None,
+        reuse: bool = True,
+    ) -> AnalysisResult | None:
+        """
+        При reuse=True повторный анализ того же промпта по тому же окну
+        возвращает сохранённый AnalysisResult без обращения к YandexGPT,
+        пока в окне не появились новые сообщения.
+        """
+        filters = window.filters()
+
+        fingerprint = None
+        if reuse:
+            found = await self._reusable(prompt, company_id, filters)
+            if found is None:
+                logger.info(f"Нет сообщений для анализа: {filters}")
+                return None
+            fingerprint, cached = found
+            if cached is not None:
+                self.reused += 1
+                logger.info(f"♻️ Окно не изменилось, используем анализ {cached.analysis_id}")
+                return cached
+
+        run = await self._map_reduce(prompt.text, iter_company_messages(company_id, **filters))
+        if run is None:
+            logger.info(f"Нет сообщений для анализа: {filters}")
+            return None
+        final_text, parts = run
+        return await self._store(
+            prompt, company_id, final_text, parts,
+            chat_id=window.chat_id,
+            user_id=window.user_id,
+            date_from=window.date_from,
+            date_to=window.date_to,
+            schedule=schedule,
+            fingerprint=fingerprint,
+        )
+
+    @staticmethod
+    async def _unsummarized(
+        company_id, summary: RollingSummary, window: AnalysisWindow
+    ) -> AsyncIterator[MessageRow]:
+        """
+        Сообщения, ещё не вошедшие в сводку: опоздавшие (timestamp в уже
+        покрытом окне, но приняты после прошлого запуска) и новые по timestamp.
+        Оба окна ограничены received_until, поэтому каждое сообщение попадает
+        ровно в один запуск.
+        """
+        if summary.received_until is not None:
+            async for row in iter_messages_for_company(
+                company_id,
+                chat_id=window.chat_id,
+                timestamp__lte=summary.covered_until,
+                received_at__gt=summary.received_until,
+                received_at__lte=window.received_until,
+            ):
+                yield row
+        async for row in iter_messages_for_company(
+            company_id,
+            chat_id=window.chat_id,
+            timestamp__gt=summary.covered_until,
+            timestamp__lte=window.date_to,
+            received_at__lte=window.received_until,
+        ):
+            yield row
+
+    @staticmethod
+    def _advance(summary: RollingSummary, window: AnalysisWindow):
+        summary.covered_until = max(summary.covered_until, window.date_to)
+        summary.received_until = max(summary.received_until or 0, window.received_until)
+        summary.updated_at = int(time())
+
+    async def analyze_incremental(
+        self,
+        prompt,
+        company_id,
+        window: AnalysisWindow,
+        schedule=None,
+        full_recompute_every: int = 0,
+    ) -> AnalysisResult | None:
+        """
+        Накопительный анализ чата: анализируются только сообщения, которых
+        ещё нет в сохранённой сводке по (чат, промпт), их итог сворачивается
+        с ней. Стоимость запуска пропорциональна новым сообщениям, а не всей
+        истории. Раз в full_recompute_every запусков (0 — никогда) сводка
+        пересчитывается по всей истории.
+
+        Из окна учитываются chat_id, date_to и received_until. Учтённое
+        отслеживается по timestamp и по времени приёма: сообщение,
+        доставленное с опозданием (timestamp раньше covered_until), войдёт
+        в следующий запуск. received_until — граница приёма, по умолчанию
+        текущее время минус ingest_lag: к этому моменту пачки, принятые
+        раньше, уже записаны в БД.
+        """
+        window = AnalysisWindow(
+            chat_id=window.chat_id,
+            date_to=window.date_to,
+            received_until=(
+                int(time() - self.ingest_lag)
+                if window.received_until is None else window.received_until),
+        )
+        summary = await RollingSummary.get_or_none(chat_id=window.chat_id, prompt=prompt)
+        full = summary is None or 0 < full_recompute_every <= summary.runs_since_full
+
+        if full:
+            rows = iter_company_messages(company_id, **window.filters())
+        else:
+            rows = self._unsummarized(company_id, summary, window)
+        run = await self._map_reduce(prompt.text, rows)
+        if run is None:
+            if not full:
+                self._advance(summary, window)
+                await summary.save(update_fields=["covered_until", "received_until", "updated_at"])
+            return None
+
+        final_text, parts = run
+        messages_count = sum(p["messages_count"] for p in parts)
+        if not full:
+            final_text, folded = await self._reduce(
+                prompt.text, [summary.summary_text, final_text])
+            parts += [{**p, "chunk_index": len(parts) + i} for i, p in enumerate(folded)]
+
+        # Результат — сводка за всю историю чата по date_to включительно
+        result = await self._store(
+            prompt, company_id, final_text, parts,
+            chat_id=window.chat_id, date_to=window.date_to, schedule=schedule)
+
+        if summary is None:
+            summary = RollingSummary(chat_id=window.chat_id, prompt=prompt)
+        if full:
+            summary.covered_until = window.date_to
+            summary.received_until = window.received_until
+            summary.messages_count = messages_count
+            summary.runs_since_full = 0
+            summary.updated_at = int(time())
+        else:
+            self._advance(summary, window)
+            summary.messages_count += messages_count
+            summary.runs_since_full += 1
+        summary.summary_text = final_text
+        await summary.save()
+        return result
+
+    def stats(self) -> dict:
+        total = self.computed + self.reused
+        return {
+            "computed": self.computed,
+            "reused": self.reused,
+            "reuse_rate": round(self.reused / total, 4) if total else 0.0,
+        }
+
+
+analysis_engine = AnalysisEngine(
+    chunk_tokens=settings.ANALYSIS_CHUNK_TOKENS,
+    max_output_tokens=settings.ANALYSIS_MAX_OUTPUT_TOKENS,
+    concurrency=settings.ANALYSIS_CONCURRENCY,
+    ingest_lag=settings.ANALYSIS_INGEST_LAG,
+)
@@ -0,0 +1,159 @@
+import asyncio
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Awaitable, Callable, NamedTuple
+from loguru import logger
+from tortoise.exceptions import IntegrityError
+from config import Settings
+from app.database.models import TranscriptionSegment
+
+settings = Settings()
+
+WINDOW_MS = 20
+# Громкость окна оценивается по прореженным сэмплам: ~2000 в секунду
+# хватает для паузы в 20 мс и в разы сокращает работу под GIL
+ENERGY_RATE = 2000
+
+
+class SplitParams(NamedTuple):
+    """Нарезка длинной записи: длина фрагмента и что считать паузой."""
+    max_seconds: float = 29
+    min_seconds: float = 5
+    threshold: int = 500
+    min_silence_ms: int = 300
+
+
+class AudioKey(NamedTuple):
+    """Запись в кэше распознавания: хэш исходного файла, язык и частота."""
+    audio_hash: str
+    language: str
+    sample_rate: int
+
+
+def _samples(audio_data: bytes) -> array:
+    samples = array("h")
+    samples.frombytes(audio_data[:len(audio_data) - len(audio_data) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples
+
+
+def _silent_windows(samples: array, window: int, step: int, threshold: int) -> list[bool]:
+    silent = []
+    for i in range(0, len(samples), window):
+        probe = samples[i:i + window:step]
+        silent.append(sum(map(abs, probe)) < threshold * len(probe))
+    return silent
+
+
+def _pause_cuts(silent: list[bool], window: int, min_run: int) -> list[int]:
+    """Середины пауз не короче min_run окон, в сэмплах."""
+    cuts = []
+    run_start = None
+    for index, is_silent in enumerate(silent + [False]):
+        if is_silent and run_start is None:
+            run_start = index
+        elif not is_silent and run_start is not None:
+            if index - run_start >= min_run:
+                cuts.append((run_start + index) * window // 2)
+            run_start = None
+    return cuts
+
+
+def _bounds(total: int, cuts: list[int], max_len: int, min_len: int) -> list[tuple[int, int]]:
+    bounds = []
+    start = 0
+    while total - start > max_len:
+        lo = bisect_left(cuts, start + min_len)
+        hi = bisect_right(cuts, start + max_len)
+        end = cuts[hi - 1] if hi > lo else start + max_len
+        bounds.append((start, end))
+        start = end
+    if start < total:
+        bounds.append((start, total))
+    return bounds
+
+
+def split_on_silence(
+    audio_data: bytes, sample_rate: int = 16000, params: SplitParams = SplitParams()
+) -> list[tuple[int, int]]:
+    """
+    Нарезает LPCM (s16le, моно) на фрагменты не длиннее params.max_seconds.
+    Разрез ставится в середину самой поздней паузы (средняя амплитуда окна
+    ниже threshold не меньше min_silence_ms), если её нет — режем по max_seconds.
+    Возвращает границы фрагментов в сэмплах; полностью тихие фрагменты пропускаются.
+    """
+    samples = _samples(audio_data)
+    window = max(sample_rate * WINDOW_MS // 1000, 1)
+    silent = _silent_windows(
+        samples, window, max(sample_rate // ENERGY_RATE, 1), params.threshold)
+    cuts = _pause_cuts(silent, window, max(params.min_silence_ms // WINDOW_MS, 1))
+    bounds = _bounds(
+        len(samples), cuts,
+        int(params.max_seconds * sample_rate), int(params.min_seconds * sample_rate))
+    return [
+        (start, end) for start, end in bounds
+        if not all(silent[start // window:-(-end // window)])
+    ]
+
+
+async def transcribe_long(
+    key: AudioKey,
+    audio_data: bytes,
+    recognize: Callable[[bytes, str, int], Awaitable[str]],
+    concurrency: int = settings.SPEECHKIT_CONCURRENCY,
+) -> str:
+    """
+    Распознаёт длинную запись по фрагментам с ограниченным параллелизмом
+    и склеивает текст по порядку. Каждый фрагмент пишется в
+    transcription_segments сразу, поэтому после сбоя повторный вызов
+    распознаёт только недостающие фрагменты. Фрагмент определяется своими
+    границами в сэмплах: после смены настроек нарезки тексты прежних
+    фрагментов не подставляются в новые.
+    """
+    bounds = await asyncio.to_thread(split_on_silence, audio_data, key.sample_rate, SplitParams(
+        settings.SPEECHKIT_SYNC_MAX_SECONDS,
+        settings.SPEECHKIT_SEGMENT_MIN_SECONDS,
+        settings.SILENCE_THRESHOLD,
+        settings.SILENCE_MIN_MS,
+    ))
+    texts = {
+        (start, end): text
+        for start, end, text in await TranscriptionSegment.filter(**key._asdict()).values_list(
+            "start_sample", "end_sample", "text")
+    }
+    logger.info(
+        f"🎙 Длинное аудио {key.audio_hash[:12]}: фрагментов {len(bounds)}, "
+        f"готово {sum(bound in texts for bound in bounds)}")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def recognize_segment(index: int, start: int, end: int):
+        async with semaphore:
+            text = await recognize(audio_data[start * 2:end * 2], key.language, key.sample_rate)
+        texts[(start, end)] = text
+        try:
+            await TranscriptionSegment.create(
+                **key._asdict(),
+                segment_index=index,
+                start_sample=start,
+                end_sample=end,
+                start_ms=start * 1000 // key.sample_rate,
+                end_ms=end * 1000 // key.sample_rate,
+                text=text,
+            )
+        except IntegrityError:
+            pass
+
+    results = await asyncio.gather(
+        *(recognize_segment(index, start, end)
+          for index, (start, end) in enumerate(bounds) if (start, end) not in texts),
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        logger.error(f"Не распознано фрагментов: {len(errors)} из {len(bounds)}")
+        raise errors[0]
+
+    return " ".join(texts[bound].strip() for bound in bounds if texts[bound].strip())
@@ -0,0 +1,151 @@
+import asyncio
+from loguru import logger
+from config import Settings
+from app.utils.workers import BackgroundWorker
+
+settings = Settings()
+
+
+class TranscodeQueueFull(Exception):
+    """Очередь перекодирования переполнена — задачу нужно повторить позже."""
+
+
+class TranscodeError(Exception):
+    """ffmpeg завершился с ошибкой или не уложился в таймаут."""
+
+
+class AudioTranscoder(BackgroundWorker):
+    """
+    Перекодирование аудио в LPCM (16 бит, моно) для SpeechKit.
+    Каждая задача — отдельный процесс ffmpeg, данные идут через
+    stdin/stdout без временных файлов. Одновременно работает не больше
+    workers процессов, остальные задачи ждут в ограниченной очереди,
+    поэтому поток голосовых не отнимает CPU у API.
+    """
+
+    started_message = "🎧 Перекодирование аудио запущено, процессов: {self.concurrency}"
+    stopped_message = "🛑 Перекодирование аудио остановлено"
+
+    def __init__(
+        self,
+        ffmpeg_path: str = "ffmpeg",
+        workers: int = 2,
+        max_queue: int = 100,
+        put_timeout: float = 2.0,
+        timeout: float = 120.0,
+    ):
+        super().__init__(concurrency=workers, queue_size=max_queue)
+        self.ffmpeg_path = ffmpeg_path
+        self.put_timeout = put_timeout
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(workers)
+
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def transcode(
+        self, audio: bytes, file_format: str | None = None, sample_rate: int = 16000
+    ) -> bytes:
+        """
+        Возвращает сырые LPCM-данные (s16le, моно, sample_rate Гц).
+        Если очередь не освобождается за put_timeout — TranscodeQueueFull.
+        """
+        if not self.running:
+            # Без фонового пула (тесты, скрипты) — тот же лимит через семафор
+            async with self._semaphore:
+                return await self._convert(audio, file_format, sample_rate)
+
+        if self._closing:
+            raise TranscodeQueueFull("Перекодирование останавливается")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await self._put((audio, file_format, sample_rate, future), self.put_timeout)
+        except asyncio.TimeoutError as exc:
+            self.rejected += 1
+            logger.warning("⚠️ Очередь перекодирования аудио переполнена")
+            raise TranscodeQueueFull("Очередь перекодирования переполнена") from exc
+        return await future
+
+    def _command(self, file_format: str | None, sample_rate: int) -> list[str]:
+        command = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostdin"]
+        if file_format:
+            command += ["-f", file_format]
+        return command + [
+            "-i", "pipe:0",
+            "-ac", "1",
+            "-ar", str(sample_rate),
+            "-f", "s16le",
+            "-acodec", "pcm_s16le",
+            "pipe:1",
+        ]
+
+    async def _convert(self, audio: bytes, file_format: str | None, sample_rate: int) -> bytes:
+        self.active += 1
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self._command(file_format, sample_rate),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(audio), timeout=self.timeout)
+            if process.returncode != 0:
+                raise TranscodeError(
+                    f"ffmpeg завершился с кодом {process.returncode}: "
+                    f"{stderr.decode(errors='replace').strip()[-500:]}")
+            self.completed += 1
+            return stdout
+        except asyncio.TimeoutError as exc:
+            self.failed += 1
+            raise TranscodeError(f"ffmpeg не уложился в {self.timeout} с") from exc
+        except FileNotFoundError as exc:
+            self.failed += 1
+            raise TranscodeError(f"ffmpeg не найден: {self.ffmpeg_path}") from exc
+        except TranscodeError:
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+            if process is not None and process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    async def _run(self):
+        while True:
+            audio, file_format, sample_rate, future = await self._queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                try:
+                    result = await self._convert(audio, file_format, sample_rate)
+                except Exception as exc:
+                    if not future.done():
+                        future.set_exception(exc)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "workers": self.concurrency,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+audio_transcoder = AudioTranscoder(
+    ffmpeg_path=settings.FFMPEG_PATH,
+    workers=settings.TRANSCODE_WORKERS,
+    max_queue=settings.TRANSCODE_QUEUE_SIZE,
+    put_timeout=settings.TRANSCODE_PUT_TIMEOUT,
+    timeout=settings.TRANSCODE_TIMEOUT,
+)
@@ -0,0 +1,100 @@
+import asyncio
+from typing import Awaitable, Callable
+from tortoise.exceptions import IntegrityError
+from config import Settings
+from app.database.models import Transcription
+from app.utils.cache import LRUCache
+
+settings = Settings()
+
+
+class TranscriptionCache:
+    """
+    Кэш распознанного текста по (хэш аудио, язык, частота дискретизации).
+    Горячий слой — LRU в памяти процесса, основной — таблица transcriptions,
+    общая для всех воркеров. Одновременные запросы одного аудио ждут
+    одно распознавание.
+    """
+
+    def __init__(self, maxsize: int = 5000, ttl: float | None = 86400):
+        self._hot = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._pending: dict[tuple, asyncio.Future] = {}
+
+        self.db_hits = 0
+        self.recognized = 0
+
+    async def get(self, audio_hash: str, language: str, sample_rate: int) -> str | None:
+        key = (audio_hash, language, sample_rate)
+        text = self._hot.get(key)
+        if text is not None:
+            return text
+
+        text = await Transcription.filter(
+            audio_hash=audio_hash, language=language, sample_rate=sample_rate
+        ).first().values_list("text", flat=True)
+        if text is not None:
+            self.db_hits += 1
+            self._hot.set(key, text)
+        return text
+
+    async def set(self, audio_hash: str, language: str, sample_rate: int, text: str):
+        self._hot.set((audio_hash, language, sample_rate), text)
+        try:
+            await Transcription.create(
+                audio_hash=audio_hash, language=language, sample_rate=sample_rate, text=text)
+        except IntegrityError:
+            # То же аудио уже записал другой воркер
+            pass
+
+    async def get_or_recognize(
+        self,
+        audio_hash: str,
+        language: str,
+        sample_rate: int,
+        recognize: Callable[[], Awaitable[str]],
+    ) -> str:
+        text = await self.get(audio_hash, language, sample_rate)
+        if text is not None:
+            return text
+
+        key = (audio_hash, language, sample_rate)
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            text = await recognize()
+            self.recognized += 1
+            await self.set(audio_hash, language, sample_rate, text)
+            future.set_result(text)
+            return text
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    def clear(self):
+        self._hot.clear()
+
+    def stats(self) -> dict:
+        hot = self._hot.stats()
+        lookups = hot["hits"] + hot["misses"]
+        hits = hot["hits"] + self.db_hits
+        return {
+            "size": hot["size"],
+            "maxsize": hot["maxsize"],
+            "memory_hits": hot["hits"],
+            "db_hits": self.db_hits,
+            "recognized": self.recognized,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+transcription_cache = TranscriptionCache(
+    maxsize=settings.TRANSCRIPTION_CACHE_SIZE,
+    ttl=settings.TRANSCRIPTION_CACHE_TTL,
+)
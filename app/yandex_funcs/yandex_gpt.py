@@ -0,0 +1,54 @@
+from loguru import logger
+from config import Settings
+from app.utils.governor import get_governor
+from app.utils.http_client import http_client
+
+settings = Settings()
+
+
+class YandexGPTError(Exception):
+    pass
+
+
+async def yandex_gpt_complete(system_text: str, user_text: str, max_tokens: int = 2000):
+    """
+    Один запрос к YandexGPT.
+    Возвращает (текст ответа, входные токены, выходные токены).
+    """
+    headers = {
+        "Authorization": f"Api-Key {settings.YANDEX_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "modelUri": f"gpt://{settings.FOLDER_ID}/{settings.YANDEX_GPT_MODEL}",
+        "completionOptions": {
+            "stream": False,
+            "temperature": 0.6,
+            "maxTokens": max_tokens
+        },
+        "messages": [
+            {"role": "system", "text": system_text},
+            {"role": "user", "text": user_text}
+        ]
+    }
+
+    _, response_data = await http_client.request_json(
+        "POST",
+        settings.YANDEX_GPT_API_URL,
+        headers=headers,
+        json=payload,
+        timeout=300,
+        governor=get_governor("gpt", settings.FOLDER_ID),
+    )
+
+    if not response_data or "result" not in response_data:
+        logger.error(f"Ошибка анализа: {response_data}")
+        raise YandexGPTError(str(response_data))
+
+    result = response_data["result"]
+    usage = result.get("usage", {})
+    return (
+        result["alternatives"][0]["message"]["text"],
+        int(usage.get("inputTextTokens", 0)),
+        int(usage.get("completionTokens", 0)),
+    )
@@ -23,7 +23,7 @@ class Settings:
     JWT_SECRET = os.getenv('JWT_SECRET')
     ENDPOINT_URL = os.getenv('ENDPOINT_URL')
     REGION_NAME = os.getenv('REGION_NAME')
-    AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID ')
+    AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
     BUCKET_NAME = os.getenv('BUCKET_NAME')
     WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL')
@@ -34,3 +34,108 @@ class Settings:
     # Токен и ID каталога
     YANDEX_API_KEY = os.getenv('YANDEX_API_KEY')
     FOLDER_ID = os.getenv('FOLDER_ID')
+
+    # Очередь приёма сообщений из вебхука
+    INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', "10000"))
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', "500"))
+    INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', "1.0"))
+    INGEST_PUT_TIMEOUT = float(os.getenv('INGEST_PUT_TIMEOUT', "2.0"))
+    INGEST_DRAIN_TIMEOUT = float(os.getenv('INGEST_DRAIN_TIMEOUT', "30.0"))
+    # Медиафайлы сообщений: скачиваются из Telegram и хранятся в S3 по sha256
+    INGEST_MEDIA = os.getenv('INGEST_MEDIA', "true").lower() == "true"
+    # Bot API отдаёт через getFile файлы не больше 20 МБ
+    INGEST_MEDIA_MAX_BYTES = int(os.getenv('INGEST_MEDIA_MAX_BYTES', str(20 * 1024 * 1024)))
+    INGEST_MEDIA_CONCURRENCY = int(os.getenv('INGEST_MEDIA_CONCURRENCY', "4"))
+    # Файлы грузятся в фоне; при переполнении очереди сообщение остаётся без s3_key
+    INGEST_MEDIA_QUEUE_SIZE = int(os.getenv('INGEST_MEDIA_QUEUE_SIZE', "1000"))
+
+    # Кэш ботов по секрету вебхука
+    BOT_REGISTRY_TTL = float(os.getenv('BOT_REGISTRY_TTL', "300"))
+
+    # Кэш авторизованных пользователей
+    PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', "1024"))
+    PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', "60"))
+
+    # Хэширование паролей
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', "12"))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', "2"))
+    PASSWORD_HASH_CONCURRENCY = int(os.getenv('PASSWORD_HASH_CONCURRENCY', "8"))
+
+    # Анализ сообщений через YandexGPT
+    YANDEX_GPT_MODEL = os.getenv('YANDEX_GPT_MODEL', "yandexgpt-lite")
+    ANALYSIS_CHUNK_TOKENS = int(os.getenv('ANALYSIS_CHUNK_TOKENS', "6000"))
+    ANALYSIS_MAX_OUTPUT_TOKENS = int(os.getenv('ANALYSIS_MAX_OUTPUT_TOKENS', "2000"))
+    ANALYSIS_CONCURRENCY = int(os.getenv('ANALYSIS_CONCURRENCY', "4"))
+
+    # Планировщик ChatSchedule
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', "true").lower() == "true"
+    SCHEDULER_TIMEZONE = os.getenv('SCHEDULER_TIMEZONE', "UTC")
+    # skip — пропустить, latest — один запуск сразу, all — все пропущенные
+    SCHEDULER_CATCH_UP = os.getenv('SCHEDULER_CATCH_UP', "latest")
+    SCHEDULER_MAX_CATCH_UP = int(os.getenv('SCHEDULER_MAX_CATCH_UP', "10"))
+    SCHEDULER_CONCURRENCY = int(os.getenv('SCHEDULER_CONCURRENCY', "4"))
+    SCHEDULER_REFRESH_INTERVAL = float(os.getenv('SCHEDULER_REFRESH_INTERVAL', "300"))
+    # Время аренды запуска; продлевается, пока задача выполняется
+    SCHEDULER_LEASE_TTL = float(os.getenv('SCHEDULER_LEASE_TTL', "300"))
+    # Пауза перед повтором запуска, завершившегося ошибкой
+    SCHEDULER_RETRY_DELAY = float(os.getenv('SCHEDULER_RETRY_DELAY', "60"))
+
+    # S3
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', "20"))
+    # Размер части multipart-загрузки (S3 требует не меньше 5 МБ)
+    S3_PART_SIZE = int(os.getenv('S3_PART_SIZE', str(8 * 1024 * 1024)))
+    S3_UPLOAD_CONCURRENCY = int(os.getenv('S3_UPLOAD_CONCURRENCY', "4"))
+    # Локальный индекс объектов S3 по префиксу пользователя
+    S3_INDEX_MAX_PREFIXES = int(os.getenv('S3_INDEX_MAX_PREFIXES', "10000"))
+    S3_INDEX_TTL = float(os.getenv('S3_INDEX_TTL', "3600"))
+
+    # Перекодирование аудио для SpeechKit (ffmpeg)
+    FFMPEG_PATH = os.getenv('FFMPEG_PATH', "ffmpeg")
+    TRANSCODE_WORKERS = int(os.getenv('TRANSCODE_WORKERS', "2"))
+    TRANSCODE_QUEUE_SIZE = int(os.getenv('TRANSCODE_QUEUE_SIZE', "100"))
+    TRANSCODE_PUT_TIMEOUT = float(os.getenv('TRANSCODE_PUT_TIMEOUT', "2"))
+    TRANSCODE_TIMEOUT = float(os.getenv('TRANSCODE_TIMEOUT', "120"))
+
+    # Кэш распознавания речи (горячий слой в памяти, основной — в БД)
+    TRANSCRIPTION_CACHE_SIZE = int(os.getenv('TRANSCRIPTION_CACHE_SIZE', "5000"))
+    TRANSCRIPTION_CACHE_TTL = float(os.getenv('TRANSCRIPTION_CACHE_TTL', "86400"))
+
+    # Длинное аудио: нарезка по паузам и параллельное распознавание фрагментов
+    SPEECHKIT_SYNC_MAX_SECONDS = float(os.getenv('SPEECHKIT_SYNC_MAX_SECONDS', "29"))
+    SPEECHKIT_SEGMENT_MIN_SECONDS = float(os.getenv('SPEECHKIT_SEGMENT_MIN_SECONDS', "5"))
+    SPEECHKIT_CONCURRENCY = int(os.getenv('SPEECHKIT_CONCURRENCY', "4"))
+    SILENCE_THRESHOLD = int(os.getenv('SILENCE_THRESHOLD', "500"))
+    SILENCE_MIN_MS = int(os.getenv('SILENCE_MIN_MS', "300"))
+
+    # Общий HTTP-клиент для внешних API (Telegram, Yandex)
+    HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', "100"))
+    HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', "20"))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', "60"))
+    HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', "30"))
+    HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', "3"))
+    HTTP_BACKOFF = float(os.getenv('HTTP_BACKOFF', "0.5"))
+
+    # Ограничение обращений к API Yandex на каждый FOLDER_ID (квоты облака)
+    YANDEX_GPT_RATE_LIMIT = float(os.getenv('YANDEX_GPT_RATE_LIMIT', "10"))
+    YANDEX_GPT_BURST = int(os.getenv('YANDEX_GPT_BURST', "10"))
+    YANDEX_GPT_MAX_CONCURRENCY = int(os.getenv('YANDEX_GPT_MAX_CONCURRENCY', "10"))
+    SPEECHKIT_RATE_LIMIT = float(os.getenv('SPEECHKIT_RATE_LIMIT', "20"))
+    SPEECHKIT_BURST = int(os.getenv('SPEECHKIT_BURST', "20"))
+    SPEECHKIT_MAX_CONCURRENCY = int(os.getenv('SPEECHKIT_MAX_CONCURRENCY', "20"))
+
+    # Накопительный анализ для расписаний типа interval
+    ANALYSIS_INCREMENTAL = os.getenv('ANALYSIS_INCREMENTAL', "true").lower() == "true"
+    # Полный пересчёт сводки раз в N запусков, 0 — не пересчитывать
+    ANALYSIS_FULL_RECOMPUTE_EVERY = int(os.getenv('ANALYSIS_FULL_RECOMPUTE_EVERY', "0"))
+    # Запуск учитывает сообщения, принятые не позже чем ANALYSIS_INGEST_LAG секунд
+    # назад: более свежие пачки могут быть ещё не записаны в БД
+    ANALYSIS_INGEST_LAG = float(os.getenv('ANALYSIS_INGEST_LAG', "60"))
+
+    # Счётчики активности чатов
+    ACTIVITY_HOURLY_RETENTION_DAYS = int(os.getenv('ACTIVITY_HOURLY_RETENTION_DAYS', "7"))
+    ACTIVITY_COMPACT_INTERVAL = float(os.getenv('ACTIVITY_COMPACT_INTERVAL', "3600"))
+
+    # Архивирование старых сообщений в S3 по политике хранения компании
+    RETENTION_INTERVAL = float(os.getenv('RETENTION_INTERVAL', "21600"))
+    ARCHIVE_SEGMENT_SIZE = int(os.getenv('ARCHIVE_SEGMENT_SIZE', "10000"))
+    ARCHIVE_DELETE_BATCH = int(os.getenv('ARCHIVE_DELETE_BATCH', "1000"))
@@ -77,6 +77,8 @@ class Company(Model):
     company_id = fields.UUIDField(pk=True, default=uuid.uuid4)
     company_name = fields.CharField(max_length=255)
     description = fields.TextField(null=True)
+    # Сообщения старше стольких дней уходят в архив S3; None — хранить в БД всегда
+    message_retention_days = fields.IntField(null=True)
 
     class Meta:
         table = "companies"
@@ -127,6 +129,10 @@ class ChatSchedule(Model):
     enabled = fields.BooleanField(default=True)
     last_run_at = fields.DatetimeField(null=True)
 
+    # Аренда запуска: какой воркер выполняет расписание и до какого момента
+    lease_owner = fields.CharField(max_length=100, null=True)
+    lease_expires_at = fields.DatetimeField(null=True)
+
     created_at = fields.BigIntField(default=lambda: int(time()))
 
     class Meta:
@@ -142,6 +148,8 @@ class BotInfo(Model):
     company = fields.ForeignKeyField(
         "diff_models.Company", related_name="bots")
     is_active = fields.BooleanField(default=True)
+    # Секрет для проверки заголовка X-Telegram-Bot-Api-Secret-Token
+    secret_token = fields.CharField(max_length=64, unique=True, null=True)
     created_at = fields.BigIntField(default=lambda: int(time()))
 
     class Meta:
@@ -174,11 +182,73 @@ class AnalysisResult(Model):
 
     tokens_input = fields.IntField()
     tokens_output = fields.IntField()
+    # Хэш промпта, фильтров и набора сообщений окна — для повторного использования
+    fingerprint = fields.CharField(max_length=64, null=True, index=True)
 
     class Meta:
         table = "analysis_results"
 
 
+class RollingSummary(Model):
+    """Накопительная сводка по чату для промпта; дополняется новыми сообщениями."""
+
+    summary_id = fields.IntField(pk=True)
+    chat = fields.ForeignKeyField("diff_models.Chat", related_name="rolling_summaries")
+    prompt = fields.ForeignKeyField("diff_models.Prompt", related_name="rolling_summaries")
+    summary_text = fields.TextField()
+    # Учтены сообщения с timestamp до covered_until включительно,
+    # полученные не позже received_until
+    covered_until = fields.BigIntField()
+    received_until = fields.BigIntField(null=True)
+    messages_count = fields.IntField(default=0)
+    runs_since_full = fields.IntField(default=0)
+    updated_at = fields.BigIntField(default=lambda: int(time()))
+
+    class Meta:
+        table = "rolling_summaries"
+        unique_together = (("chat", "prompt"),)
+
+
+class AnalysisUsage(Model):
+    """
+    Суточная сводка расхода токенов на анализ по компании, чату и промпту.
+    Обновляется при каждой записи AnalysisResult.
+    """
+
+    usage_id = fields.IntField(pk=True)
+    company = fields.ForeignKeyField("diff_models.Company", related_name="analysis_usage")
+    day = fields.DateField()
+    # 0 — анализ без привязки к чату
+    chat_id = fields.BigIntField(default=0)
+    prompt = fields.ForeignKeyField("diff_models.Prompt", related_name="analysis_usage")
+    analyses_count = fields.IntField(default=0)
+    tokens_input = fields.BigIntField(default=0)
+    tokens_output = fields.BigIntField(default=0)
+
+    class Meta:
+        table = "analysis_usage_daily"
+        unique_together = (("company", "day", "chat_id", "prompt"),)
+
+
+class AnalysisChunk(Model):
+    """Частичный результат анализа одного фрагмента переписки."""
+
+    chunk_id = fields.IntField(pk=True)
+    analysis = fields.ForeignKeyField(
+        "diff_models.AnalysisResult", related_name="chunks")
+    # 'map' — фрагмент сообщений, 'reduce' — свёртка частичных результатов
+    stage = fields.CharField(max_length=10, default="map")
+    chunk_index = fields.IntField()
+    messages_count = fields.IntField(default=0)
+    result_text = fields.TextField()
+    tokens_input = fields.IntField()
+    tokens_output = fields.IntField()
+    created_at = fields.BigIntField(default=lambda: int(time()))
+
+    class Meta:
+        table = "analysis_chunks"
+
+
 class Message(Model):
 
     message_id = fields.UUIDField(pk=True, default=uuid.uuid4)
@@ -188,9 +258,108 @@ class Message(Model):
     chat = fields.ForeignKeyField("diff_models.Chat", related_name="messages")
     text = fields.TextField(null=True)
     s3_key = fields.CharField(max_length=255, null=True)
+    # message_id из Telegram: повторная доставка и правки не создают дубликатов
+    telegram_message_id = fields.BigIntField(null=True)
+    # Время приёма сервисом: сообщение может прийти позже своего timestamp
+    received_at = fields.BigIntField(default=lambda: int(time()))
+    edits_count = fields.IntField(default=0)
 
     class Meta:
         table = "messages"
+        unique_together = (("chat", "telegram_message_id"),)
+        # Окна анализа и выгрузки: фильтр по чату/автору и диапазону времени;
+        # накопительный анализ дочитывает опоздавшие сообщения по received_at
+        indexes = (("chat_id", "timestamp"), ("user_id", "timestamp"), ("chat_id", "received_at"))
+
+
+class ChatActivity(Model):
+    """
+    Счётчик сообщений пользователя в чате за час или сутки.
+    Часовые корзины старше нескольких дней сворачиваются в суточные.
+    """
+
+    activity_id = fields.IntField(pk=True)
+    chat = fields.ForeignKeyField("diff_models.Chat", related_name="activity")
+    user = fields.ForeignKeyField("diff_models.User", related_name="activity")
+    granularity = fields.CharField(max_length=5, default="hour")  # hour / day
+    bucket_start = fields.BigIntField()
+    messages_count = fields.IntField(default=0)
+
+    class Meta:
+        table = "chat_activity"
+        unique_together = (("chat", "user", "granularity", "bucket_start"),)
+        indexes = (("chat", "bucket_start"),)
+
+
+class MessageArchive(Model):
+    """
+    Сегмент архива сообщений компании в S3: NDJSON, сжатый gzip,
+    сообщения по возрастанию (timestamp, message_id).
+    """
+
+    archive_id = fields.IntField(pk=True)
+    company = fields.ForeignKeyField("diff_models.Company", related_name="message_archives")
+    s3_key = fields.CharField(max_length=255)
+    ts_from = fields.BigIntField()
+    ts_to = fields.BigIntField()
+    messages_count = fields.IntField()
+    size = fields.IntField()
+    created_at = fields.BigIntField(default=lambda: int(time()))
+
+    class Meta:
+        table = "message_archives"
+        indexes = (("company", "ts_to"),)
+
+
+class MediaObject(Model):
+    """Медиафайл в S3, адресуемый по содержимому (sha256)."""
+
+    content_hash = fields.CharField(max_length=64, pk=True)
+    # Telegram file_unique_id одинаков для одного файла во всех чатах и ботах
+    file_unique_id = fields.CharField(max_length=64, unique=True, null=True)
+    s3_key = fields.CharField(max_length=255)
+    size = fields.BigIntField()
+    created_at = fields.BigIntField(default=lambda: int(time()))
+
+    class Meta:
+        table = "media_objects"
+
+
+class Transcription(Model):
+    """Кэш распознавания речи: одно обращение к SpeechKit на уникальное аудио."""
+
+    transcription_id = fields.IntField(pk=True)
+    audio_hash = fields.CharField(max_length=64)
+    language = fields.CharField(max_length=16)
+    sample_rate = fields.IntField()
+    text = fields.TextField()
+    created_at = fields.BigIntField(default=lambda: int(time()))
+
+    class Meta:
+        table = "transcriptions"
+        unique_together = (("audio_hash", "language", "sample_rate"),)
+
+
+class TranscriptionSegment(Model):
+    """Распознанный фрагмент длинного аудио; сохраняется сразу по готовности."""
+
+    segment_id = fields.IntField(pk=True)
+    audio_hash = fields.CharField(max_length=64)
+    language = fields.CharField(max_length=16)
+    sample_rate = fields.IntField()
+    segment_index = fields.IntField()
+    # Границы в сэмплах — ключ фрагмента: при другой нарезке номера те же, границы нет
+    start_sample = fields.IntField()
+    end_sample = fields.IntField()
+    start_ms = fields.IntField()
+    end_ms = fields.IntField()
+    text = fields.TextField()
+    created_at = fields.BigIntField(default=lambda: int(time()))
+
+    class Meta:
+        table = "transcription_segments"
+        unique_together = (
+            ("audio_hash", "language", "sample_rate", "start_sample", "end_sample"),)
 
 
 class Prompt(Model):
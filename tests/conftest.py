@@ -43,6 +43,9 @@ async def setup_db():
 pytest_plugins = [
     "tests.fixtures.main_fixtures",  # Фикстуры, связанные с именами, статусами, ролями
     "tests.fixtures.prompts",
+    "tests.fixtures.bots",
+    "tests.fixtures.messages",
+    "tests.fixtures.schedules",
 ]
 
 
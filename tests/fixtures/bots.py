@@ -0,0 +1,19 @@
+import pytest
+from app.database.models import BotInfo, Company
+from app.handlers.bot_registry import bot_registry
+
+
+@pytest.mark.usefixtures("setup_db")
+@pytest.fixture(scope="function")
+@pytest.mark.asyncio
+async def seed_bot(seed_company):
+    company = await Company.get(company_id=seed_company["company_id"])
+    bot = await BotInfo.create(
+        bot_id=777,
+        bot_token="777:token",
+        bot_name="observer_bot",
+        company=company,
+        secret_token="webhook-secret",
+    )
+    bot_registry.invalidate_all()
+    return {"bot_id": bot.bot_id, "secret_token": bot.secret_token}
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+import pytest
+from app.database.models import Chat, Company, Message, User, UserRole
+from app.handlers.telegram_handlers import parse_update
+
+
+@pytest.mark.usefixtures("setup_db")
+@pytest.fixture(scope="function")
+@pytest.mark.asyncio
+async def seed_chat(seed_company):
+    company = await Company.get(company_id=seed_company["company_id"])
+    role, _ = await UserRole.get_or_create(
+        role_id="user", defaults={"role_name": "Пользователь"})
+    chat = await Chat.create(chat_id=-100500, chat_name="Рабочий чат", company=company)
+    user = await User.create(user_id=42, username="tester", role=role, company=company)
+    return {
+        "chat_id": chat.chat_id,
+        "user_id": user.user_id,
+        "company_id": company.company_id,
+    }
+
+
+@pytest.mark.usefixtures("setup_db")
+@pytest.fixture(scope="function")
+@pytest.mark.asyncio
+async def seed_messages(seed_chat):
+    """Пять сообщений, по два с одинаковым timestamp."""
+    await Message.bulk_create([
+        Message(
+            chat_id=seed_chat["chat_id"],
+            user_id=seed_chat["user_id"],
+            timestamp=1700000000 + i // 2,
+            text=f"Сообщение {i}",
+        )
+        for i in range(5)
+    ])
+    return seed_chat
+
+
+@pytest.fixture
+def message_record():
+    """Фабрика записей в формате parse_update для save_messages."""
+    def make(company_id, timestamp, text="Привет", chat_id=-100500, user_id=42):
+        return {
+            "company_id": company_id,
+            "chat_id": chat_id,
+            "chat_name": "Рабочий чат",
+            "user_id": user_id,
+            "username": f"user{user_id}",
+            "account_name": "Тест",
+            "timestamp": timestamp,
+            "text": text,
+        }
+    return make
+
+
+@pytest.fixture
+def telegram_update():
+    """Фабрика апдейтов Telegram, разобранных parse_update; fields дополняют сообщение."""
+    def make(company_id, message_id, chat_id=-100500, user_id=42, text="Привет",
+             kind="message", bot_token=None, **fields):
+        bot = SimpleNamespace(company_id=company_id, bot_token=bot_token)
+        message = {
+            "message_id": message_id,
+            "date": 1700000000 + message_id,
+            "from": {"id": user_id, "username": "tester", "first_name": "Тест"},
+            "chat": {"id": chat_id, "title": "Рабочий чат"},
+            "text": text,
+            **fields,
+        }
+        return parse_update(bot, {"update_id": message_id, kind: message})
+    return make
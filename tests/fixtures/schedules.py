@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.database.models import ChatSchedule
+
+
+@pytest.mark.usefixtures("setup_db")
+@pytest.fixture(scope="function")
+@pytest.mark.asyncio
+async def seed_schedule(seed_chat, seed_prompt):
+    """Интервальное расписание, последний запуск которого был час назад."""
+    schedule = await ChatSchedule.create(
+        chat_id=seed_chat["chat_id"],
+        prompt_id=seed_prompt["prompt_id"],
+        schedule_type="interval",
+        interval_minutes=15,
+        enabled=True,
+        last_run_at=datetime.now(timezone.utc) - timedelta(hours=1),
+    )
+    return {
+        "schedule_id": schedule.schedule_id,
+        "last_run_at": schedule.last_run_at,
+    }
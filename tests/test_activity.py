@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+import pytest
+from httpx import AsyncClient
+from tortoise.expressions import F
+from app.database.models import ChatActivity, ChatSchedule, Message
+from app.handlers.activity_counters import DAY, HOUR, compact_activity, has_activity
+from app.handlers.telegram_handlers import save_messages
+from app.scheduler.jobs import run_schedule
+
+START = 1760000000 - 1760000000 % DAY
+
+
+@pytest.mark.asyncio
+async def test_counters_compaction_and_endpoint(
+        test_app: AsyncClient, jwt_token_admin, seed_admin, message_record):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    company_id = seed_admin["company"].company_id
+
+    await save_messages([
+        message_record(company_id, START + 10),
+        message_record(company_id, START + 20),
+        message_record(company_id, START + 30, user_id=43),
+        message_record(company_id, START + HOUR + 5),
+        message_record(company_id, START + DAY + 5, chat_id=-2),
+    ])
+    # Второй пачкой — в уже существующую корзину
+    await save_messages([message_record(company_id, START + 40)])
+
+    assert await ChatActivity.get(
+        chat_id=-100500, user_id=42, bucket_start=START).values_list(
+            "messages_count", flat=True) == 3
+    assert await ChatActivity.all().count() == 4
+
+    response = test_app.get(
+        "/api/activity", headers=headers, params={"granularity": "hour", "group_by": "chat_id"})
+    assert response.status_code == 200, response.text
+    rows = [(r["bucket_start"], r["chat_id"], r["messages_count"]) for r in response.json()["rows"]]
+    assert rows == [(START, -100500, 4), (START + HOUR, -100500, 1), (START + DAY, -2, 1)]
+
+    # Первые сутки сворачиваются в одну суточную строку на пользователя
+    assert await compact_activity(START + DAY, batch_size=2) == 3
+    assert await ChatActivity.filter(granularity="day").count() == 2
+    assert await ChatActivity.filter(granularity="hour").count() == 1
+
+    response = test_app.get(
+        "/api/activity", headers=headers, params={"date_to": START + DAY - 1})
+    assert [(r["bucket_start"], r["granularity"], r["messages_count"])
+            for r in response.json()["rows"]] == [(START, "day", 5)]
+
+    response = test_app.get("/api/activity", headers=headers, params={"group_by": "text"})
+    assert response.status_code == 400
+
+    # Сообщения приняты вовремя, не позже своего timestamp
+    await Message.all().update(received_at=F("timestamp"))
+    assert await has_activity(-100500, START + 100)
+    assert not await has_activity(-100500, START + DAY)
+
+    # Без счётчиков (не обновились при записи) ответ даёт таблица сообщений
+    await ChatActivity.all().delete()
+    assert await has_activity(-100500, START + 100)
+    assert not await has_activity(-100500, START + DAY)
+    # Опоздавшее сообщение со старой датой — тоже активность
+    late = await Message.filter(chat_id=-100500).first()
+    late.received_at = START + DAY + 10
+    await late.save(update_fields=["received_at"])
+    assert await has_activity(-100500, START + DAY)
+
+
+@pytest.mark.asyncio
+async def test_schedule_skipped_without_new_messages(seed_schedule):
+    schedule = await ChatSchedule.get(schedule_id=seed_schedule["schedule_id"])
+    fire_at = datetime.now(timezone.utc)
+    # Анализ с вызовом YandexGPT не начинается, если сообщений не было
+    assert await run_schedule(schedule, seed_schedule["last_run_at"], fire_at) is None
@@ -0,0 +1,152 @@
+import pytest
+from tortoise.expressions import F
+from app.database.models import AnalysisChunk, Message, Prompt, RollingSummary
+from app.handlers.telegram_handlers import save_messages
+from app.yandex_funcs.analysis_engine import AnalysisEngine, AnalysisWindow, PromptTooLong
+
+
+class FakeGPT:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, system_text, user_text, max_tokens):
+        self.calls.append((system_text, user_text))
+        return f"итог {len(self.calls)}", len(user_text), 3
+
+
+@pytest.mark.asyncio
+async def test_analysis_map_reduce(seed_messages, seed_prompt):
+    """Сообщения режутся на фрагменты, итог сворачивается, токены пишутся по фрагментам."""
+    gpt = FakeGPT()
+    engine = AnalysisEngine(
+        complete=gpt, chunk_tokens=90, concurrency=2)
+    prompt = await Prompt.get(prompt_id=seed_prompt["prompt_id"])
+
+    result = await engine.analyze(prompt, seed_messages["company_id"])
+
+    chunks = await AnalysisChunk.filter(analysis=result).order_by("chunk_id")
+    map_chunks = [c for c in chunks if c.stage == "map"]
+    assert len(map_chunks) > 1
+    assert sum(c.messages_count for c in map_chunks) == 5
+    assert chunks[-1].stage == "reduce"
+    assert result.result_text == chunks[-1].result_text
+    assert result.tokens_input == sum(c.tokens_input for c in chunks)
+    assert result.tokens_output == 3 * len(gpt.calls)
+
+
+@pytest.mark.asyncio
+async def test_analysis_single_chunk_skips_reduce(seed_messages, seed_prompt):
+    gpt = FakeGPT()
+    engine = AnalysisEngine(complete=gpt)
+    prompt = await Prompt.get(prompt_id=seed_prompt["prompt_id"])
+
+    result = await engine.analyze(prompt, seed_messages["company_id"])
+
+    assert len(gpt.calls) == 1
+    assert "tester: Сообщение 4" in gpt.calls[0][1]
+    assert result.result_text == "итог 1"
+
+
+@pytest.mark.asyncio
+async def test_analysis_rejects_prompt_longer_than_chunk(seed_messages, seed_prompt):
+    gpt = FakeGPT()
+    engine = AnalysisEngine(complete=gpt, chunk_tokens=90)
+    prompt = await Prompt.get(prompt_id=seed_prompt["prompt_id"])
+    prompt.text = "Очень подробная задача. " * 20
+
+    with pytest.raises(PromptTooLong):
+        await engine.analyze(prompt, seed_messages["company_id"], reuse=False)
+    assert not gpt.calls
+
+
+@pytest.mark.asyncio
+async def test_analysis_without_messages(seed_chat, seed_prompt):
+    engine = AnalysisEngine(complete=FakeGPT())
+    prompt = await Prompt.get(prompt_id=seed_prompt["prompt_id"])
+    assert await engine.analyze(prompt, seed_chat["company_id"]) is None
+
+
+@pytest.mark.asyncio
+async def test_analysis_reused_until_window_changes(seed_messages, seed_prompt):
+    gpt = FakeGPT()
+    engine = AnalysisEngine(complete=gpt)
+    prompt = await Prompt.get(prompt_id=seed_prompt["prompt_id"])
+    window = AnalysisWindow(chat_id=seed_messages["chat_id"], date_to=1700000010)
+
+    first = await engine.analyze(prompt, seed_messages["company_id"], window)
+    again = await engine.analyze(prompt, seed_messages["company_id"], window)
+    assert again.analysis_id == first.analysis_id
+    assert len(gpt.calls) == 1
+
+    # Новое сообщение в окне — результат устарел
+    await Message.create(
+        chat_id=seed_messages["chat_id"], user_id=seed_messages["user_id"],
+        timestamp=1700000005, text="Опоздавшее сообщение")
+    fresh = await engine.analyze(prompt, seed_messages["company_id"], window)
+    assert fresh.analysis_id != first.analysis_id
+    assert len(gpt.calls) == 2
+    assert engine.stats() == {"computed": 2, "reused": 1, "reuse_rate": 0.3333}
+
+
+@pytest.mark.asyncio
+async def test_analysis_recomputed_after_edit(seed_company, seed_prompt, telegram_update):
+    """Правка сообщения не меняет набор окна, но делает сохранённый результат устаревшим."""
+    gpt = FakeGPT()
+    engine = AnalysisEngine(complete=gpt)
+    prompt = await Prompt.get(prompt_id=seed_prompt["prompt_id"])
+    company_id = seed_company["company_id"]
+    await save_messages([telegram_update(company_id, 1, text="Встреча в 10")])
+    window = AnalysisWindow(chat_id=-100500)
+
+    first = await engine.analyze(prompt, company_id, window)
+    await save_messages([
+        telegram_update(company_id, 1, text="Встреча в 11", kind="edited_message")])
+    fresh = await engine.analyze(prompt, company_id, window)
+
+    assert fresh.analysis_id != first.analysis_id
+    assert "Встреча в 11" in gpt.calls[1][1]
+
+
+@pytest.mark.asyncio
+async def test_incremental_analysis_folds_new_messages(seed_messages, seed_prompt):
+    gpt = FakeGPT()
+    engine = AnalysisEngine(complete=gpt)
+    prompt = await Prompt.get(prompt_id=seed_prompt["prompt_id"])
+    company_id, chat_id = seed_messages["company_id"], seed_messages["chat_id"]
+
+    # Запуски в момент date_to: принято всё, что пришло до него
+    await Message.filter(chat_id=chat_id).update(received_at=F("timestamp"))
+    await engine.analyze_incremental(
+        prompt, company_id, AnalysisWindow(chat_id, date_to=1700000010, received_until=1700000010))
+    assert len(gpt.calls) == 1
+
+    user_id = seed_messages["user_id"]
+    await Message.create(
+        chat_id=chat_id, user_id=user_id, timestamp=1700000015, received_at=1700000015,
+        text="Новое")
+    # Доставлено после первого запуска с датой из уже покрытого окна
+    await Message.create(
+        chat_id=chat_id, user_id=user_id, timestamp=1700000003, received_at=1700000018,
+        text="Опоздавшее")
+    result = await engine.analyze_incremental(
+        prompt, company_id, AnalysisWindow(chat_id, date_to=1700000020, received_until=1700000020))
+
+    # Один вызов на новые сообщения и одна свёртка со старой сводкой
+    assert len(gpt.calls) == 3
+    assert "Новое" in gpt.calls[1][1] and "Опоздавшее" in gpt.calls[1][1]
+    assert "Сообщение" not in gpt.calls[1][1]
+    assert "итог 1" in gpt.calls[2][1]
+    summary = await RollingSummary.get(chat_id=chat_id, prompt=prompt)
+    assert summary.summary_text == result.result_text == "итог 3"
+    assert (summary.covered_until, summary.messages_count, summary.runs_since_full) == (
+        1700000020, 7, 1)
+
+    assert await engine.analyze_incremental(
+        prompt, company_id, AnalysisWindow(chat_id, date_to=1700000030, received_until=1700000030)
+    ) is None
+    assert len(gpt.calls) == 3
+
+    await engine.analyze_incremental(
+        prompt, company_id, AnalysisWindow(chat_id, date_to=1700000040), full_recompute_every=1)
+    await summary.refresh_from_db()
+    assert (summary.messages_count, summary.runs_since_full) == (7, 0)
@@ -0,0 +1,74 @@
+import pytest
+from httpx import AsyncClient
+from app.database.models import AnalysisResult, AnalysisUsage, Chat, Prompt
+from app.handlers.analytics_handlers import register_signals
+
+DAY = 86400
+START = 1760000000 - 1760000000 % DAY
+
+
+async def add_result(prompt, chat_id, day, tokens_input, tokens_output):
+    return await AnalysisResult.create(
+        prompt=prompt,
+        company_id=prompt.company_id,
+        chat_id=chat_id,
+        result_text="итог",
+        created_at=START + day * DAY + 3600,
+        tokens_input=tokens_input,
+        tokens_output=tokens_output,
+    )
+
+
+@pytest.mark.asyncio
+async def test_usage_rollup_and_endpoint(test_app: AsyncClient, jwt_token_admin, seed_admin):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    company = seed_admin["company"]
+    prompt = await Prompt.create(company=company, prompt_name="Сводка", text="текст")
+    other = await Prompt.create(company=company, prompt_name="Риски", text="текст")
+    await Chat.create(chat_id=-1, company=company)
+    await Chat.create(chat_id=-2, company=company)
+
+    await add_result(prompt, -1, 0, 100, 10)
+    await add_result(prompt, -1, 0, 50, 5)
+    await add_result(other, -2, 0, 30, 3)
+    await add_result(prompt, -2, 1, 20, 2)
+    removed = await add_result(prompt, -2, 1, 999, 99)
+    await removed.delete()
+
+    # Сводка ведётся инкрементально: по строке на (день, чат, промпт)
+    assert await AnalysisUsage.all().count() == 3
+
+    response = test_app.get("/api/analytics/usage", headers=headers)
+    assert response.status_code == 200, response.text
+    by_day = response.json()["rows"]
+    assert [(r["analyses_count"], r["tokens_input"], r["tokens_output"]) for r in by_day] == [
+        (3, 180, 18), (1, 20, 2)]
+
+    response = test_app.get(
+        "/api/analytics/usage", headers=headers,
+        params={"group_by": ["prompt_id"], "date_to": by_day[0]["day"]})
+    rows = {r["prompt_id"]: r["tokens_input"] for r in response.json()["rows"]}
+    assert rows == {str(prompt.prompt_id): 150, str(other.prompt_id): 30}
+
+    response = test_app.get("/api/analytics/usage", headers=headers, params={"group_by": "text"})
+    assert response.status_code == 400
+
+    response = test_app.get(
+        "/api/analytics/results", headers=headers, params={"page_size": 3, "chat_id": -2})
+    data = response.json()
+    assert [r["tokens_input"] for r in data["results"]] == [20, 30]
+    assert data["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_repeated_registration_counts_once(seed_admin):
+    register_signals()
+    register_signals()
+    company = seed_admin["company"]
+    prompt = await Prompt.create(company=company, prompt_name="Сводка", text="текст")
+    await Chat.create(chat_id=-1, company=company)
+
+    await add_result(prompt, -1, 0, 100, 10)
+
+    usage = await AnalysisUsage.get(chat_id=-1)
+    assert (usage.analyses_count, usage.tokens_input) == (1, 100)
@@ -0,0 +1,63 @@
+import pytest
+from httpx import AsyncClient
+from app.database.models import BotInfo, Message
+from app.handlers.bot_registry import bot_registry
+
+
+@pytest.mark.asyncio
+async def test_webhook_saves_message(test_app: AsyncClient, seed_bot):
+    """Тест приёма апдейта вебхуком."""
+    payload = {
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": 1700000000,
+            "from": {"id": 42, "username": "tester"},
+            "chat": {"id": -100500, "title": "Рабочий чат"},
+            "text": "Привет",
+        },
+    }
+    response = test_app.post(
+        "/api/bots/webhook",
+        headers={"X-Telegram-Bot-Api-Secret-Token": seed_bot["secret_token"]},
+        json=payload
+    )
+
+    assert response.status_code == 200, f"Ошибка: {response.status_code}, {response.text}"
+    assert await Message.filter(chat_id=-100500, text="Привет").exists()
+
+
+@pytest.mark.asyncio
+async def test_webhook_unknown_secret(test_app: AsyncClient, seed_bot):
+    response = test_app.post(
+        "/api/bots/webhook",
+        headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+        json={"update_id": 1}
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_registry_serves_from_memory(seed_bot):
+    """Повторные запросы отдаются из кэша, деактивация убирает бота."""
+    bot = await bot_registry.get(seed_bot["secret_token"])
+    assert bot is not None and bot.bot_id == seed_bot["bot_id"]
+    hits = bot_registry.stats()["hits"]
+
+    await bot_registry.get(seed_bot["secret_token"])
+    assert bot_registry.stats()["hits"] == hits + 1
+
+    await BotInfo.filter(bot_id=seed_bot["bot_id"]).update(is_active=False)
+    bot_registry.invalidate(seed_bot["bot_id"])
+    assert await bot_registry.get(seed_bot["secret_token"]) is None
+
+
+@pytest.mark.asyncio
+async def test_deactivate_bot(test_app: AsyncClient, jwt_token_admin, seed_bot):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    response = test_app.post(
+        f"/api/bots/{seed_bot['bot_id']}/deactivate", headers=headers)
+
+    assert response.status_code == 204, f"Ошибка: {response.status_code}, {response.text}"
+    bot = await BotInfo.get(bot_id=seed_bot["bot_id"])
+    assert bot.is_active is False
@@ -0,0 +1,54 @@
+import pytest
+from httpx import AsyncClient
+from app.database.models import AdminUser, Company
+from app.handlers.auth_handlers import get_current_admin, principal_cache
+from app.utils.cache import LRUCache
+
+
+def test_lru_cache_evicts_oldest():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["hits"] == 3
+
+
+def test_lru_cache_ttl():
+    cache = LRUCache(maxsize=2, ttl=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_principal_cached_and_invalidated(seed_admin):
+    """Пользователь кэшируется и сбрасывается при изменении компании."""
+    principal_cache.clear()
+    first = await get_current_admin("admin")
+    second = await get_current_admin("admin")
+    assert first is second
+
+    company = await Company.get(company_id=first.company_id)
+    company.company_name = "Renamed"
+    await company.save()
+    assert principal_cache.get("admin") is None
+
+    user = await get_current_admin("admin")
+    assert user.company.company_name == "Renamed"
+
+    admin = await AdminUser.get(username="admin")
+    await admin.delete()
+    assert principal_cache.get("admin") is None
+
+
+@pytest.mark.asyncio
+async def test_metrics(test_app: AsyncClient, jwt_token_admin):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    response = test_app.get("/api/metrics", headers=headers)
+
+    assert response.status_code == 200, f"Ошибка: {response.status_code}, {response.text}"
+    assert "hit_rate" in response.json()["principal_cache"]
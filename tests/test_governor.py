@@ -0,0 +1,48 @@
+import asyncio
+from time import monotonic
+import pytest
+from app.utils.governor import (
+    ApiGovernor, PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED, priority_lane,
+)
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_overtake_scheduled():
+    governor = ApiGovernor("test", rate=0, concurrency=1)
+    order = []
+
+    async def call(name: str):
+        async with governor.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await governor.acquire(PRIORITY_INTERACTIVE)
+    with priority_lane(PRIORITY_SCHEDULED):
+        scheduled = [asyncio.create_task(call(f"s{i}")) for i in range(3)]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(call("i"))
+    await asyncio.sleep(0)
+
+    stats = governor.stats()
+    assert stats["queued"] == {"interactive": 1, "scheduled": 3}
+
+    governor.release()
+    await asyncio.gather(*scheduled, interactive)
+    assert order == ["i", "s0", "s1", "s2"]
+    assert governor.stats()["wait"]["scheduled"]["count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_queues_instead_of_failing():
+    governor = ApiGovernor("test", rate=20, burst=1, concurrency=10)
+    started = monotonic()
+
+    async def call():
+        async with governor.slot():
+            pass
+
+    await asyncio.gather(*(call() for _ in range(4)))
+    # Первый запрос из запаса, остальные три — по одному на 50 мс
+    assert monotonic() - started >= 0.14
+    assert governor.granted == 4
+    assert governor.stats()["wait"]["interactive"]["max_ms"] > 0
@@ -0,0 +1,140 @@
+import asyncio
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.utils.governor import ApiGovernor
+from app.utils.http_client import HttpClient
+
+
+@pytest.mark.asyncio
+async def test_request_json_retries_and_reuses_session():
+    calls = []
+
+    async def flaky(request: web.Request):
+        calls.append(request.path)
+        if len(calls) < 3:
+            return web.json_response({"error": "busy"}, status=503)
+        return web.json_response({"ok": True})
+
+    async def broken(request: web.Request):
+        return web.Response(status=500, text="not json")
+
+    app = web.Application()
+    app.router.add_get("/flaky", flaky)
+    app.router.add_get("/broken", broken)
+    server = TestServer(app)
+    await server.start_server()
+    host = server.make_url("/").authority
+    client = HttpClient(retries=3, backoff=0)
+    try:
+        status, data = await client.request_json("GET", str(server.make_url("/flaky")))
+        session = client._session
+        assert (status, data) == (200, {"ok": True})
+        assert len(calls) == 3
+
+        status, data = await client.request_json(
+            "GET", str(server.make_url("/broken")), retries=1)
+        assert (status, data) == (500, None)
+        assert client._session is session
+    finally:
+        await client.close()
+        await server.close()
+
+    host = client.stats()[host]
+    assert host["requests"] == 5
+    assert host["retries"] == 3
+    assert host["errors"] == 4
+    assert host["avg_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_each_retry_takes_governor_slot():
+    calls = []
+
+    async def limited(request: web.Request):
+        calls.append(request.path)
+        if len(calls) < 3:
+            return web.json_response({"error": "rate"}, status=429)
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_post("/limited", limited)
+    server = TestServer(app)
+    await server.start_server()
+    client = HttpClient(retries=3, backoff=0)
+    governor = ApiGovernor("test", rate=0, concurrency=1)
+    try:
+        status, data = await client.request_json(
+            "POST", str(server.make_url("/limited")), governor=governor)
+    finally:
+        await client.close()
+        await server.close()
+
+    assert (status, data) == (200, {"ok": True})
+    assert governor.granted == 3
+    assert governor.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_timeouts_are_retried_only_for_idempotent_methods():
+    calls = []
+
+    async def slow(request: web.Request):
+        calls.append(request.method)
+        await asyncio.sleep(1)
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_route("*", "/slow", slow)
+    server = TestServer(app)
+    await server.start_server()
+    client = HttpClient(retries=2, backoff=0)
+    url = str(server.make_url("/slow"))
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await client.request_json("POST", url, timeout=0.1)
+        assert calls == ["POST"]
+
+        with pytest.raises(asyncio.TimeoutError):
+            await client.request_json("GET", url, timeout=0.1)
+        assert calls == ["POST", "GET", "GET", "GET"]
+    finally:
+        await client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_dropped_connections_are_retried_only_before_sending():
+    """Обрыв после отправки не повторяется для POST, отказ в соединении — повторяется."""
+    calls = []
+
+    async def drop(request: web.Request):
+        calls.append(request.method)
+        request.transport.close()
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_route("*", "/drop", drop)
+    server = TestServer(app)
+    await server.start_server()
+    client = HttpClient(retries=2, backoff=0)
+    url = str(server.make_url("/drop"))
+    host = server.make_url("/").authority
+    try:
+        with pytest.raises(aiohttp.ServerDisconnectedError):
+            await client.request_json("POST", url)
+        assert calls == ["POST"]
+        assert client.stats()[host]["retries"] == 0
+
+        with pytest.raises(aiohttp.ServerDisconnectedError):
+            await client.request_json("GET", url)
+        assert client.stats()[host]["retries"] == 2
+
+        await server.close()
+        with pytest.raises(aiohttp.ClientConnectorError):
+            await client.request_json("POST", url)
+        assert client.stats()[host]["retries"] == 4
+    finally:
+        await client.close()
+        await server.close()
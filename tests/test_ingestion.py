@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+import pytest
+from app.database.models import Chat, Message, User
+from app.handlers.ingestion_queue import MessageIngestionQueue, IngestionQueueFull
+from app.handlers.telegram_handlers import parse_update, save_messages
+from app.search.message_search import SearchQuery, message_search
+
+
+@pytest.mark.asyncio
+async def test_parse_update_skips_non_message(seed_company):
+    bot = SimpleNamespace(company_id=seed_company["company_id"])
+    assert parse_update(bot, {"update_id": 1, "my_chat_member": {}}) is None
+    channel_post = {
+        "message_id": 7,
+        "date": 1700000000,
+        "chat": {"id": -100777, "type": "channel"},
+        "sender_chat": {"id": -100777, "type": "channel"},
+        "text": "Пост канала",
+    }
+    assert parse_update(bot, {"update_id": 2, "channel_post": channel_post}) is None
+
+
+@pytest.mark.asyncio
+async def test_queue_flushes_batches_and_drains(seed_company, telegram_update):
+    """Очередь пишет сообщения пачками и дописывает остаток при остановке."""
+    queue = MessageIngestionQueue(max_size=100, batch_size=10, flush_interval=0.05)
+    await queue.start()
+
+    for i in range(25):
+        await queue.submit(telegram_update(seed_company["company_id"], i))
+
+    await queue.stop(timeout=5)
+
+    assert await Message.all().count() == 25
+    assert await Chat.filter(chat_id=-100500).exists()
+    assert await User.filter(user_id=42).count() == 1
+    assert queue.stats()["saved"] == 25
+    assert queue.stats()["dropped"] == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_rejects_after_stop(seed_company, telegram_update):
+    queue = MessageIngestionQueue(max_size=1, batch_size=1, flush_interval=0.01)
+    await queue.start()
+    await queue.stop(timeout=5)
+
+    with pytest.raises(IngestionQueueFull):
+        await queue.submit(telegram_update(seed_company["company_id"], 1))
+
+
+@pytest.mark.asyncio
+async def test_redelivery_and_edits_do_not_duplicate(seed_company, telegram_update):
+    """Повторная доставка апдейта не дублирует сообщение, правка обновляет текст."""
+    company_id = seed_company["company_id"]
+    original = telegram_update(company_id, 1, text="Встреча в 10")
+
+    assert await save_messages([original, telegram_update(company_id, 2)]) == 2
+    assert await save_messages([original]) == 0
+    # Правка в одной пачке с оригиналом другого сообщения
+    assert await save_messages([
+        telegram_update(company_id, 3, text="Черновик"),
+        telegram_update(company_id, 3, text="Итог", kind="edited_message"),
+        telegram_update(company_id, 1, text="Встреча в 11", kind="edited_message"),
+    ]) == 2
+
+    texts = await Message.all().order_by("telegram_message_id").values_list("text", flat=True)
+    assert texts == ["Встреча в 11", "Привет", "Итог"]
+    # Поисковый индекс видит только новый текст
+    page = await message_search.search(company_id, SearchQuery("встреча 11"))
+    assert [r["text"] for r in page.items] == ["Встреча в 11"]
+    assert not (await message_search.search(company_id, SearchQuery("встреча 10"))).items
@@ -1,5 +1,7 @@
 import json
 import pytest
+from app.database.models import AdminUser
+from app.utils.passwords import password_hasher
 
 
 @pytest.mark.usefixtures("seed_admin")
@@ -49,3 +51,20 @@ async def test_refresh_token_invalid(test_app):
 
     assert response.status_code == 401
     assert response.json()["detail"] == "Неверный или просроченный токен"
+
+
+@pytest.mark.usefixtures("seed_admin")
+@pytest.mark.asyncio
+async def test_login_rehashes_on_cost_change(test_app, monkeypatch):
+    """При смене cost-фактора хэш пароля обновляется при входе."""
+    monkeypatch.setattr(password_hasher, "rounds", 5)
+
+    response = test_app.post(
+        "/auth/token",
+        json={"username": "admin", "password": "qweasdzcx"}
+    )
+
+    assert response.status_code == 200
+    admin = await AdminUser.get(username="admin")
+    assert admin.password_hash.startswith("$2b$05$")
+    assert await password_hasher.verify("qweasdzcx", admin.password_hash)
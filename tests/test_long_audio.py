@@ -0,0 +1,91 @@
+import asyncio
+from array import array
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.database.models import TranscriptionSegment
+from app.yandex_funcs import long_audio, yandex_funcs
+from app.yandex_funcs.long_audio import AudioKey, SplitParams, split_on_silence, transcribe_long
+from app.utils.http_client import http_client
+
+RATE = 8000
+
+
+def make_audio(bursts: int, burst_seconds: float = 3, pause_seconds: float = 0.5) -> bytes:
+    """Тон с амплитудой 1000 * номер, между тонами — тишина."""
+    samples = array("h")
+    for n in range(1, bursts + 1):
+        amplitude = 1000 * n
+        samples.extend(amplitude if i % 2 else -amplitude for i in range(int(burst_seconds * RATE)))
+        samples.extend([0] * int(pause_seconds * RATE))
+    return samples.tobytes()
+
+
+def test_split_on_silence_cuts_in_pauses():
+    bounds = split_on_silence(make_audio(4), RATE, SplitParams(max_seconds=4, min_seconds=1))
+    assert len(bounds) == 4
+    for start, end in bounds:
+        assert end - start <= 4 * RATE
+    # Разрезы приходятся на паузы, а не на середину тона
+    assert 3 * RATE < bounds[0][1] < 3.5 * RATE
+
+
+@pytest.mark.asyncio
+async def test_transcribe_long_against_stand_in_server(monkeypatch):
+    requests = []
+    in_flight = 0
+    peak = 0
+    failing = True
+
+    async def recognize(request: web.Request):
+        nonlocal in_flight, peak
+        samples = array("h")
+        samples.frombytes(await request.read())
+        word = max(abs(s) for s in samples) // 1000
+        requests.append(word)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        if word == 3 and failing:
+            return web.json_response({"error_code": "UNAVAILABLE"}, status=503)
+        assert request.query["sampleRateHertz"] == str(RATE)
+        return web.json_response({"result": f"слово{word}"})
+
+    app = web.Application()
+    app.router.add_post("/speech/v1/stt:recognize", recognize)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        monkeypatch.setattr(
+            yandex_funcs.settings, "YANDEX_SPEECHKIT_API_URL",
+            str(server.make_url("/speech/v1/stt:recognize")))
+        monkeypatch.setattr(yandex_funcs.settings, "FOLDER_ID", "folder")
+        monkeypatch.setattr(http_client, "backoff", 0)
+        monkeypatch.setattr(long_audio.settings, "SPEECHKIT_SYNC_MAX_SECONDS", 4)
+        monkeypatch.setattr(long_audio.settings, "SPEECHKIT_SEGMENT_MIN_SECONDS", 1)
+        audio = make_audio(4)
+        key = AudioKey("hash", "ru-RU", RATE)
+
+        with pytest.raises(yandex_funcs.SpeechKitError):
+            await transcribe_long(key, audio, yandex_funcs.speechkit_recognize, concurrency=2)
+        # Готовые фрагменты сохранены, несмотря на ошибку
+        assert await TranscriptionSegment.filter(audio_hash="hash").count() == 3
+
+        failing = False
+        text = await transcribe_long(key, audio, yandex_funcs.speechkit_recognize, concurrency=2)
+        # Другая нарезка: прежние тексты по номеру фрагмента не подставляются
+        monkeypatch.setattr(long_audio.settings, "SPEECHKIT_SYNC_MAX_SECONDS", 8)
+        regrouped = await transcribe_long(
+            key, audio, yandex_funcs.speechkit_recognize, concurrency=2)
+    finally:
+        await server.close()
+        await http_client.close()
+
+    assert text == "слово1 слово2 слово3 слово4"
+    assert regrouped == "слово2 слово4"
+    # Ошибка фрагмента повторялась клиентом, остальные запрошены по разу
+    assert requests.count(3) == http_client.retries + 2
+    assert sorted(set(requests)) == [1, 2, 3, 4]
+    assert len(requests) == http_client.retries + 5 + 2
+    assert peak <= 2
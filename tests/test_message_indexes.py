@@ -0,0 +1,66 @@
+import os
+import statistics
+from time import perf_counter
+import pytest
+from tortoise import Tortoise
+from app.database.models import Chat, Message
+from app.utils.helpers import message_page_query
+
+BENCH_MESSAGES = int(os.getenv("BENCH_MESSAGES", "2000000"))
+
+
+async def query_plan(query) -> str:
+    connection = Tortoise.get_connection("default")
+    sql = query.sql(params_inline=True)
+    _, rows = await connection.execute_query(f"EXPLAIN QUERY PLAN {sql}")
+    return "\n".join(str(row["detail"]) for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_window_queries_use_composite_indexes(seed_messages):
+    company_id = seed_messages["company_id"]
+    by_chat = await query_plan(message_page_query(
+        company_id, chat_id=seed_messages["chat_id"], timestamp__gte=1700000000))
+    assert "idx_messages_chat_id" in by_chat
+
+    by_user = await query_plan(message_page_query(
+        company_id, user_id=seed_messages["user_id"], timestamp__gte=1700000000))
+    assert "idx_messages_user_id" in by_user
+
+
+@pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="бенчмарк: RUN_BENCHMARKS=1")
+@pytest.mark.asyncio
+async def test_window_query_latency(seed_chat):
+    """Окно в час по одному чату среди BENCH_MESSAGES сообщений из 100 чатов."""
+    connection = Tortoise.get_connection("default")
+    company_id = seed_chat["company_id"]
+    chats = [seed_chat["chat_id"] - i for i in range(100)]
+    await Chat.bulk_create([
+        Chat(chat_id=chat_id, chat_name=f"Чат {chat_id}", company_id=company_id)
+        for chat_id in chats[1:]
+    ])
+    start = 1700000000
+    batch = 100000
+    for offset in range(0, BENCH_MESSAGES, batch):
+        await Message.bulk_create([
+            Message(timestamp=start + i * 3, received_at=start + i * 3, chat_id=chats[i % 100],
+                    user_id=seed_chat["user_id"], text="текст")
+            for i in range(offset, min(offset + batch, BENCH_MESSAGES))
+        ], batch_size=10000)
+    await connection.execute_script("ANALYZE")
+
+    timings = []
+    for hour in range(20):
+        date_from = start + hour * 3600 * 7
+        began = perf_counter()
+        rows = await message_page_query(
+            company_id,
+            chat_id=chats[hour],
+            timestamp__gte=date_from,
+            timestamp__lt=date_from + 3600,
+        )
+        timings.append(perf_counter() - began)
+        assert rows
+
+    median_ms = statistics.median(timings) * 1000
+    assert median_ms < 20, f"Окно в час среди {BENCH_MESSAGES} сообщений: медиана {median_ms:.2f} мс"
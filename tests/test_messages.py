@@ -0,0 +1,53 @@
+import json
+import pytest
+from httpx import AsyncClient
+from app.utils.helpers import iter_messages_for_company
+
+
+@pytest.mark.asyncio
+async def test_iter_messages_keyset(seed_messages):
+    """Итератор проходит все страницы без пропусков и дублей."""
+    rows = [
+        row async for row in iter_messages_for_company(seed_messages["company_id"], chunk_size=2)
+    ]
+
+    assert len(rows) == 5
+    assert len({row.message_id for row in rows}) == 5
+    keys = [(row.timestamp, str(row.message_id)) for row in rows]
+    assert keys == sorted(keys)
+
+
+@pytest.mark.asyncio
+async def test_iter_messages_filters(seed_messages):
+    rows = [
+        row async for row in iter_messages_for_company(
+            seed_messages["company_id"], timestamp__gte=1700000002)
+    ]
+    assert len(rows) == 1
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson(test_app: AsyncClient, jwt_token_admin, seed_messages):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    response = test_app.get(
+        "/api/messages/export",
+        headers=headers,
+        params={"chat_id": seed_messages["chat_id"]}
+    )
+
+    assert response.status_code == 200, f"Ошибка: {response.status_code}, {response.text}"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 5
+    assert lines[0]["timestamp"] == 1700000000
+
+
+@pytest.mark.asyncio
+async def test_export_csv(test_app: AsyncClient, jwt_token_admin, seed_messages):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    response = test_app.get(
+        "/api/messages/export", headers=headers, params={"format": "csv"})
+
+    assert response.status_code == 200, f"Ошибка: {response.status_code}, {response.text}"
+    lines = response.text.splitlines()
+    assert lines[0].startswith("message_id,timestamp")
+    assert len(lines) == 6
@@ -97,3 +97,37 @@ async def test_get_prompts(test_app: AsyncClient, jwt_token_admin, seed_prompt):
     prompt_ids = [prompt["prompt_id"] for prompt in prompts]
     assert str(seed_prompt["prompt_id"]
                ) in prompt_ids, "Тестовый промпт отсутствует в списке"
+
+
+@pytest.mark.asyncio
+async def test_get_prompts_keyset_pages(test_app: AsyncClient, jwt_token_admin, seed_prompt):
+    """Листание курсором: без пропусков и повторов, total считается один раз."""
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    prompt = await Prompt.get(prompt_id=seed_prompt["prompt_id"])
+    # Одинаковые названия — порядок решает prompt_id
+    await Prompt.bulk_create([
+        Prompt(prompt_name=f"Промпт {i // 2}", text="текст", company_id=prompt.company_id)
+        for i in range(24)
+    ])
+
+    seen, cursor, totals = [], None, set()
+    while True:
+        params = {"page_size": 10, "sort_by": "prompt_name", "order": "desc"}
+        if cursor:
+            params["cursor"] = cursor
+        response = test_app.get("/api/prompts/all", headers=headers, params=params)
+        assert response.status_code == 200, response.text
+        data = response.json()
+        seen += [(p["prompt_name"], p["prompt_id"]) for p in data["prompts"]]
+        totals.add(data["total"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 25 and len(set(seen)) == 25
+    assert seen == sorted(seen, reverse=True)
+    assert totals == {25}
+
+    response = test_app.get(
+        "/api/prompts/all", headers=headers, params={"cursor": "не-курсор"})
+    assert response.status_code == 400
@@ -0,0 +1,304 @@
+import asyncio
+import hashlib
+import pytest
+from app.database.models import Chat, MediaObject, Message, MessageArchive, User, UserRole
+from app.handlers import media_queue, telegram_handlers
+from app.handlers.media_queue import MediaIngestionQueue
+from app.handlers.retention import ArchiveBatches, archive_company
+from app.handlers.telegram_handlers import save_messages
+from app.s3.media_store import find_media, store_media, store_media_stream
+from app.s3.message_archive import iter_company_messages, window_digest
+from app.s3.s3_manager import AsyncS3Manager
+
+
+@pytest.fixture
+async def s3():
+    manager = AsyncS3Manager()
+    manager.endpoint_url = "http://127.0.0.1:9"
+    manager.region_name = "ru-central1"
+    manager.aws_access_key_id = "test"
+    manager.aws_secret_access_key = "test"
+    manager.bucket_name = "observer"
+    yield manager
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_presigned_url_offline(s3):
+    """Ссылка подписывается локально одним и тем же клиентом."""
+    first = await s3.generate_presigned_url(42, "voice.ogg")
+    client = s3._client
+    second = await s3.generate_presigned_url(42, "photo.jpg", expiration=60)
+
+    assert first.startswith("http://127.0.0.1:9/observer/web_app/42/voice.ogg?")
+    assert "X-Amz-Signature" in second or "Signature" in second
+    assert s3._client is client
+
+
+class FakeBody:
+    """Потоковое тело ответа get_object."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self, size: int) -> bytes:
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+
+class FakeS3Client:
+    """Заглушка multipart API S3 для проверки без сети."""
+
+    def __init__(self, fail_part: int | None = None):
+        self.fail_part = fail_part
+        self.objects: dict[str, bytes] = {}
+        self.parts: dict[int, bytes] = {}
+        self.aborted = False
+        self.calls: list[str] = []
+
+    async def put_object(self, Bucket, Key, Body, **kwargs):
+        self.calls.append("put_object")
+        self.objects[Key] = Body
+        return {"ETag": '"single"'}
+
+    async def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.calls.append("create_multipart_upload")
+        return {"UploadId": "upload-1"}
+
+    async def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_part:
+            raise RuntimeError("part failed")
+        self.parts[PartNumber] = Body
+        return {"ETag": f'"etag-{PartNumber}"'}
+
+    async def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.calls.append("complete_multipart_upload")
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        self.objects[Key] = b"".join(self.parts[n] for n in numbers)
+        return {"ETag": '"multi"'}
+
+    async def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted = True
+
+    async def get_object(self, Bucket, Key):
+        return {"Body": FakeBody(self.objects[Key])}
+
+    async def delete_object(self, Bucket, Key):
+        self.calls.append("delete_object")
+        self.objects.pop(Key, None)
+
+    async def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None, MaxKeys=2):
+        self.calls.append("list_objects_v2")
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + MaxKeys]
+        response = {
+            "Contents": [
+                {"Key": k, "Size": len(self.objects[k]), "ETag": '"e"'} for k in page
+            ],
+            "IsTruncated": start + MaxKeys < len(keys),
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = str(start + MaxKeys)
+        return response
+
+
+async def byte_stream(data: bytes, step: int):
+    for i in range(0, len(data), step):
+        yield data[i:i + step]
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_multipart(s3):
+    s3._client = FakeS3Client()
+    s3.part_size = 10
+    s3.upload_concurrency = 2
+    data = bytes(range(95))
+
+    key = await s3.upload_stream(byte_stream(data, 7), 42, "video.mp4")
+
+    assert key == "web_app/42/video.mp4"
+    assert s3._client.objects[key] == data
+    assert len(s3._client.parts) == 10
+    s3._client = None
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_small_file_uses_put(s3):
+    s3._client = FakeS3Client()
+    s3.part_size = 100
+
+    await s3.upload_stream(byte_stream(b"voice", 2), 42, "voice.ogg")
+
+    assert s3._client.calls == ["put_object"]
+    s3._client = None
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_aborts_on_failure(s3):
+    s3._client = FakeS3Client(fail_part=2)
+    s3.part_size = 10
+
+    with pytest.raises(RuntimeError):
+        await s3.upload_stream(byte_stream(bytes(50), 10), 42, "video.mp4")
+
+    assert s3._client.aborted
+    assert "complete_multipart_upload" not in s3._client.calls
+    s3._client = None
+
+
+@pytest.mark.asyncio
+async def test_list_user_files_paginates_and_uses_index(s3):
+    """Листинг читает все страницы, а затем обслуживается из индекса."""
+    client = FakeS3Client()
+    client.objects = {f"web_app/42/file{i}.jpg": b"x" * i for i in range(5)}
+    client.objects["web_app/43/other.jpg"] = b"y"
+    s3._client = client
+
+    files = await s3.list_user_files(42)
+    assert files == [f"web_app/42/file{i}.jpg" for i in range(5)]
+    assert client.calls.count("list_objects_v2") == 3
+
+    await s3.upload_bytes(b"new", 42, "new.jpg")
+    objects = await s3.list_user_objects(42)
+    assert objects["web_app/42/new.jpg"]["size"] == 3
+    assert client.calls.count("list_objects_v2") == 3
+    s3._client = None
+
+
+@pytest.mark.asyncio
+async def test_store_media_dedups_by_content_and_file_unique_id(s3):
+    s3._client = FakeS3Client()
+    data = b"voice-bytes" * 10
+
+    first = await store_media(data, manager=s3)
+    second = await store_media(data, file_unique_id="AgADxyz", manager=s3)
+    third = await store_media(b"other", file_unique_id="AgADxyz", manager=s3)
+
+    assert first == second == third == f"web_app/media/{hashlib.sha256(data).hexdigest()}"
+    assert s3._client.calls.count("put_object") == 1
+    assert await find_media("AgADxyz") == first
+    assert await MediaObject.all().count() == 1
+
+
+@pytest.mark.asyncio
+async def test_ingestion_stores_media_once(s3, seed_company, telegram_update, monkeypatch):
+    """
+    Сообщения пишутся без ожидания файла; медиа загружается в S3 в фоне
+    один раз и привязывается к Message.s3_key.
+    """
+    downloads = []
+    telegram_responds = asyncio.Event()
+
+    async def open_telegram_file(bot_token, file_id):
+        downloads.append(file_id)
+        await telegram_responds.wait()
+        return byte_stream(b"voice-bytes", 4)
+
+    s3._client = FakeS3Client()
+    queue = MediaIngestionQueue(workers=2, max_queue=10)
+    monkeypatch.setattr(telegram_handlers, "media_queue", queue)
+    monkeypatch.setattr(media_queue, "open_telegram_file", open_telegram_file)
+    monkeypatch.setattr(media_queue, "store_media_stream",
+                        lambda chunks, file_unique_id: store_media_stream(
+                            chunks, file_unique_id, manager=s3))
+
+    def voice_update(message_id: int, chat_id: int) -> dict:
+        return telegram_update(
+            seed_company["company_id"], message_id, chat_id=chat_id, text=None,
+            bot_token="123:abc",
+            voice={"file_id": f"file-{message_id}", "file_unique_id": "AgADvoice"})
+
+    # Один и тот же голосовой, пересланный в два чата, и повторная доставка
+    await queue.start()
+    assert await save_messages([voice_update(1, -1), voice_update(2, -2)]) == 2
+    assert set(await Message.all().values_list("s3_key", flat=True)) == {None}
+    telegram_responds.set()
+    await queue.stop()
+    assert await save_messages([voice_update(1, -1)]) == 0
+
+    key = f"web_app/media/{hashlib.sha256(b'voice-bytes').hexdigest()}"
+    assert set(await Message.all().values_list("s3_key", flat=True)) == {key}
+    assert len(downloads) == 1
+    assert s3._client.objects == {key: b"voice-bytes"}
+
+    # Уже загруженный файл привязывается сразу, без фоновой задачи
+    assert await save_messages([voice_update(3, -1)]) == 1
+    assert await Message.get(telegram_message_id=3).values_list("s3_key", flat=True) == key
+    assert queue.stats()["dropped"] == 0 and len(downloads) == 1
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_old_messages_and_reads_them_back(s3, test_app, jwt_token_admin, seed_admin):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    response = test_app.put(
+        "/api/accounts/retention", headers=headers, json={"message_retention_days": 30})
+    assert response.status_code == 200, response.text
+    assert test_app.get("/api/accounts/retention", headers=headers).json() == {
+        "message_retention_days": 30}
+
+    s3._client = FakeS3Client()
+    company = seed_admin["company"]
+    role, _ = await UserRole.get_or_create(role_id="user", defaults={"role_name": "Пользователь"})
+    await Chat.create(chat_id=-1, company=company)
+    await User.create(user_id=7, username="u", role=role, company=company)
+    now = 1760000000
+    day = 86400
+    for i in range(5):
+        await Message.create(chat_id=-1, user_id=7, timestamp=now - (40 - i) * day, text=f"старое {i}")
+    await Message.create(chat_id=-1, user_id=7, timestamp=now - day, text="свежее")
+
+    # Сегменты по 2 сообщения: 3 сегмента, в БД остаётся только свежее
+    assert await archive_company(company.company_id, 30, now=now, batches=ArchiveBatches(segment_size=2), manager=s3) == 5
+    assert await MessageArchive.all().count() == 3
+    assert await Message.all().values_list("text", flat=True) == ["свежее"]
+    assert all(key.endswith(".ndjson.gz") for key in s3._client.objects)
+
+    rows = [row async for row in iter_company_messages(company.company_id, manager=s3)]
+    assert [row.text for row in rows] == [f"старое {i}" for i in range(5)] + ["свежее"]
+
+    # Сегменты вне окна не скачиваются
+    window = {"timestamp__gte": now - 37 * day, "timestamp__lte": now - 36 * day}
+    rows = [row async for row in iter_company_messages(company.company_id, manager=s3, **window)]
+    assert [row.text for row in rows] == ["старое 3", "старое 4"]
+    # В БД окна нет сообщений, в отпечатке — пересекающиеся сегменты
+    archive_ids = await MessageArchive.all().order_by("archive_id").values_list(
+        "archive_id", flat=True)
+    assert await window_digest(company.company_id, **window) == (
+        0, None, None, 0, tuple(archive_ids[1:]))
+    # Окно между сообщениями внутри сегмента пусто, хотя сегмент его пересекает
+    gap = {"timestamp__gte": now - 40 * day + 1, "timestamp__lte": now - 39 * day - 1}
+    assert [row async for row in iter_company_messages(company.company_id, manager=s3, **gap)] == []
+    assert (await window_digest(company.company_id, **gap))[0] == 0
+
+    assert await archive_company(company.company_id, 30, now=now, manager=s3) == 0
+    s3._client = None
+
+
+@pytest.mark.asyncio
+async def test_archive_during_iteration_loses_nothing(s3, seed_company):
+    s3._client = FakeS3Client()
+    company_id = seed_company["company_id"]
+    role, _ = await UserRole.get_or_create(role_id="user", defaults={"role_name": "Пользователь"})
+    await Chat.create(chat_id=-1, company_id=company_id)
+    await User.create(user_id=7, username="u", role=role, company_id=company_id)
+    now = 1760000000
+    day = 86400
+    for i in range(5):
+        await Message.create(chat_id=-1, user_id=7, timestamp=now - (40 - i) * day, text=f"старое {i}")
+    await Message.create(chat_id=-1, user_id=7, timestamp=now - day, text="свежее")
+
+    rows = iter_company_messages(company_id, manager=s3, chunk_size=2)
+    texts = [(await anext(rows)).text]
+    # Архивирование проходит, пока читатель стоит на первой странице
+    assert await archive_company(company_id, 30, now=now, batches=ArchiveBatches(segment_size=2), manager=s3) == 5
+    texts += [row.text async for row in rows]
+
+    assert texts == [f"старое {i}" for i in range(5)] + ["свежее"]
+    s3._client = None
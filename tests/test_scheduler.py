@@ -0,0 +1,148 @@
+import asyncio
+from datetime import datetime, time, timedelta, timezone
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+import pytest
+from app.database.models import ChatSchedule
+from app.scheduler.schedule_calc import compute_next_fire, next_run_time
+from app.scheduler.scheduler import ScheduleRunner, SchedulerSettings
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def make_schedule(**kwargs):
+    data = {
+        "schedule_type": "interval",
+        "interval_hours": None,
+        "interval_minutes": None,
+        "time_of_day": None,
+        "cron_expression": None,
+        "run_at": None,
+        "last_run_at": None,
+        "created_at": int((NOW - timedelta(days=30)).timestamp()),
+    }
+    data.update(kwargs)
+    return SimpleNamespace(**data)
+
+
+def test_next_run_time_types():
+    interval = make_schedule(interval_hours=1, interval_minutes=30)
+    assert next_run_time(interval, NOW) == NOW + timedelta(minutes=90)
+
+    daily = make_schedule(schedule_type="daily_time", time_of_day=time(5, 0))
+    moscow = ZoneInfo("Europe/Moscow")
+    assert next_run_time(daily, NOW, moscow) == datetime(2026, 3, 11, 2, 0, tzinfo=timezone.utc)
+
+    cron = make_schedule(schedule_type="cron", cron_expression="*/10 * * * *")
+    assert next_run_time(cron, NOW) == NOW + timedelta(minutes=10)
+
+    once = make_schedule(schedule_type="once", run_at=NOW + timedelta(days=1))
+    assert next_run_time(once, NOW) == NOW + timedelta(days=1)
+    once.last_run_at = NOW
+    assert next_run_time(once, NOW) is None
+
+
+def test_catch_up_policies():
+    """После простоя: skip — следующий по сетке, latest — сразу, all — первый пропущенный."""
+    schedule = make_schedule(
+        interval_minutes=15, last_run_at=NOW - timedelta(minutes=50))
+
+    assert compute_next_fire(schedule, NOW, catch_up="skip") == NOW + timedelta(minutes=15)
+    assert compute_next_fire(schedule, NOW, catch_up="latest") == NOW
+    assert compute_next_fire(schedule, NOW, catch_up="all") == NOW - timedelta(minutes=35)
+    assert compute_next_fire(schedule, NOW, catch_up="all", max_catch_up=1) == NOW
+
+
+@pytest.mark.asyncio
+async def test_runner_fires_and_updates_last_run(seed_schedule):
+    fired = asyncio.Event()
+    calls = []
+
+    async def job(schedule, previous_run, fire_at):
+        calls.append((schedule.schedule_id, previous_run, fire_at))
+        fired.set()
+
+    runner = ScheduleRunner(job=job, options=SchedulerSettings(catch_up="latest"))
+    await runner.start()
+    await asyncio.wait_for(fired.wait(), timeout=5)
+    await runner.stop()
+
+    schedule = await ChatSchedule.get(schedule_id=seed_schedule["schedule_id"])
+    schedule_id, previous_run, fire_at = calls[0]
+    assert schedule_id == seed_schedule["schedule_id"]
+    assert previous_run == seed_schedule["last_run_at"]
+    assert schedule.last_run_at == fire_at
+    # После запуска расписание снова в куче на +15 минут
+    assert runner.stats()["scheduled"] == 1
+    assert runner.stats()["fired"] == 1
+
+
+@pytest.mark.asyncio
+async def test_runner_claim_is_atomic(seed_schedule):
+    """Пока аренда у одного воркера, второй запуск не проходит."""
+    first = ScheduleRunner(job=None, worker_id="worker-1")
+    second = ScheduleRunner(job=None, worker_id="worker-2")
+    schedule = await ChatSchedule.get(schedule_id=seed_schedule["schedule_id"])
+    now = datetime.now(timezone.utc)
+
+    assert await first._claim(schedule, now) is True
+    assert await second._claim(schedule, now) is False
+
+    assert await first._complete(schedule, now) is True
+    # last_run_at сдвинулся — старый снимок расписания больше не проходит
+    assert await second._claim(schedule, now) is False
+
+
+@pytest.mark.asyncio
+async def test_two_workers_run_schedule_once(seed_schedule):
+    calls = []
+
+    async def job(schedule, previous_run, fire_at):
+        calls.append(schedule.schedule_id)
+        await asyncio.sleep(0.1)
+
+    runners = [ScheduleRunner(job=job, worker_id=f"worker-{i}") for i in range(3)]
+    for runner in runners:
+        await runner.start()
+    await asyncio.sleep(0.5)
+    for runner in runners:
+        await runner.stop()
+
+    assert calls == [seed_schedule["schedule_id"]]
+    schedule = await ChatSchedule.get(schedule_id=seed_schedule["schedule_id"])
+    assert schedule.lease_owner is None
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_taken_over(seed_schedule):
+    """Аренду упавшего воркера перехватывают после истечения."""
+    await ChatSchedule.filter(schedule_id=seed_schedule["schedule_id"]).update(
+        lease_owner="dead-worker",
+        lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+    )
+    runner = ScheduleRunner(job=None, worker_id="worker-1")
+    schedule = await ChatSchedule.get(schedule_id=seed_schedule["schedule_id"])
+
+    assert await runner._claim(schedule, datetime.now(timezone.utc)) is True
+    schedule = await ChatSchedule.get(schedule_id=seed_schedule["schedule_id"])
+    assert schedule.lease_owner == "worker-1"
+
+
+@pytest.mark.asyncio
+async def test_failed_run_is_not_counted(seed_schedule):
+    """Упавший запуск не сдвигает last_run_at и откладывается на retry_delay."""
+    async def job(schedule, previous_run, fire_at):
+        raise RuntimeError("boom")
+
+    runner = ScheduleRunner(
+        job=job, options=SchedulerSettings(retry_delay=3600), worker_id="worker-1")
+    await runner.start()
+    await asyncio.sleep(0.3)
+    await runner.stop()
+
+    assert runner.fired == 1
+    assert runner.failed == 1
+    schedule = await ChatSchedule.get(schedule_id=seed_schedule["schedule_id"])
+    assert schedule.last_run_at == seed_schedule["last_run_at"]
+    assert schedule.lease_owner is None
+    assert schedule.schedule_id in runner.heap
@@ -0,0 +1,94 @@
+import uuid
+import pytest
+from httpx import AsyncClient
+from tortoise import connections
+from app.database.models import Company, Message
+from app.handlers.telegram_handlers import save_messages
+from app.search.message_search import SearchQuery, message_search
+from app.search.stemmer import stem
+from app.utils.pagination import encode_cursor
+
+START = 1760000000
+
+
+def test_russian_stemmer():
+    assert {stem(w) for w in ("книга", "книги", "книгами", "книге")} == {"книг"}
+    assert {stem(w) for w in ("работать", "работает", "работала")} == {"работа"}
+    assert stem("Отчётность") == "отчетн"
+
+
+@pytest.mark.asyncio
+async def test_search_endpoint(test_app: AsyncClient, jwt_token_admin, seed_admin, message_record):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    company_id = seed_admin["company"].company_id
+    other = await Company.create(company_name="Чужая")
+
+    await save_messages([
+        message_record(company_id, START + 1, "Отправил отчёт по продажам"),
+        message_record(company_id, START + 2, "Отчёты будут завтра"),
+        message_record(company_id, START + 3, "Где отчеты за март?", chat_id=-2),
+        message_record(company_id, START + 4, "Обед в час"),
+        message_record(other.company_id, START + 5, "Чужой отчёт", chat_id=-3),
+    ])
+
+    # Разные формы слова находятся по общей основе, чужая компания не видна
+    response = test_app.get(
+        "/api/messages/search", headers=headers, params={"q": "отчетам", "page_size": 2})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert [r["timestamp"] for r in data["results"]] == [START + 3, START + 2]
+
+    response = test_app.get(
+        "/api/messages/search", headers=headers,
+        params={"q": "отчетам", "page_size": 2, "cursor": data["next_cursor"]})
+    data = response.json()
+    assert [r["text"] for r in data["results"]] == ["Отправил отчёт по продажам"]
+    assert data["next_cursor"] is None
+
+    response = test_app.get(
+        "/api/messages/search", headers=headers, params={"q": "отчёт продажи", "chat_id": -100500})
+    assert [r["timestamp"] for r in response.json()["results"]] == [START + 1]
+
+    response = test_app.get(
+        "/api/messages/search", headers=headers, params={"q": "отчёт", "cursor": "мусор"})
+    assert response.status_code == 400
+    # Курсор с подменённым значением timestamp не доходит до SQL
+    forged = encode_cursor({"v": "1; DROP", "id": str(uuid.uuid4()), "s": "timestamp", "d": True})
+    response = test_app.get(
+        "/api/messages/search", headers=headers, params={"q": "отчёт", "cursor": forged})
+    assert response.status_code == 400
+
+    # Удалённое сообщение пропадает из индекса
+    await Message.filter(timestamp=START + 2).delete()
+    page = await message_search.search(company_id, SearchQuery("отчёт"))
+    assert [r["timestamp"] for r in page.items] == [START + 3, START + 1]
+
+
+@pytest.mark.asyncio
+async def test_index_built_for_existing_messages(seed_chat):
+    await Message.create(
+        chat_id=seed_chat["chat_id"], user_id=seed_chat["user_id"],
+        timestamp=START, text="Созвон перенесли")
+    connection = connections.get("default")
+    await connection.execute_script('DROP TABLE IF EXISTS "messages_fts"')
+    message_search.backend(connection)._ready_for = None
+
+    page = await message_search.search(seed_chat["company_id"], SearchQuery("созвоны перенесли"))
+    assert [r["text"] for r in page.items] == ["Созвон перенесли"]
+
+
+@pytest.mark.asyncio
+async def test_search_survives_rowid_renumbering(seed_chat):
+    """Неявный rowid messages может смениться (VACUUM) — индекс от него не зависит."""
+    for offset, text in enumerate(("Первый созвон", "Второй отчёт", "Третий отчёт")):
+        await Message.create(
+            chat_id=seed_chat["chat_id"], user_id=seed_chat["user_id"],
+            timestamp=START + offset, text=text)
+    assert len((await message_search.search(seed_chat["company_id"], SearchQuery("отчёт"))).items) == 2
+
+    await connections.get("default").execute_script(
+        'UPDATE "messages" SET rowid = rowid + 1000; VACUUM;')
+    await Message.filter(text="Второй отчёт").delete()
+
+    page = await message_search.search(seed_chat["company_id"], SearchQuery("отчёт"))
+    assert [r["text"] for r in page.items] == ["Третий отчёт"]
@@ -0,0 +1,48 @@
+import asyncio
+import stat
+import sys
+import pytest
+from app.yandex_funcs.transcoder import AudioTranscoder, TranscodeError, TranscodeQueueFull
+
+
+def fake_ffmpeg(tmp_path, body: str) -> str:
+    """Скрипт вместо ffmpeg: аргументы игнорирует, работает со stdin/stdout."""
+    script = tmp_path / "ffmpeg"
+    script.write_text(f"#!{sys.executable}\nimport sys, time\n{body}\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+
+@pytest.mark.asyncio
+async def test_transcode_pipes_without_temp_files(tmp_path):
+    ffmpeg = fake_ffmpeg(tmp_path, "sys.stdout.buffer.write(sys.stdin.buffer.read()[::-1])")
+    transcoder = AudioTranscoder(ffmpeg_path=ffmpeg, workers=2)
+
+    assert await transcoder.transcode(b"abc", "ogg") == b"cba"
+
+    await transcoder.start()
+    results = await asyncio.gather(*(transcoder.transcode(bytes([i]) * 3, "ogg") for i in range(5)))
+    await transcoder.stop()
+
+    assert results == [bytes([i]) * 3 for i in range(5)]
+    assert transcoder.stats()["completed"] == 6
+    assert list(tmp_path.iterdir()) == [tmp_path / "ffmpeg"]
+
+
+@pytest.mark.asyncio
+async def test_transcode_error_and_backpressure(tmp_path):
+    failing = fake_ffmpeg(tmp_path, "sys.stderr.write('bad input'); sys.exit(1)")
+    with pytest.raises(TranscodeError, match="bad input"):
+        await AudioTranscoder(ffmpeg_path=failing).transcode(b"x", "ogg")
+
+    slow = fake_ffmpeg(tmp_path, "time.sleep(0.5); sys.stdout.buffer.write(sys.stdin.buffer.read())")
+    transcoder = AudioTranscoder(ffmpeg_path=slow, workers=1, max_queue=1, put_timeout=0.05)
+    await transcoder.start()
+    first = asyncio.create_task(transcoder.transcode(b"1"))
+    second = asyncio.create_task(transcoder.transcode(b"2"))
+    await asyncio.sleep(0.1)
+    with pytest.raises(TranscodeQueueFull):
+        await transcoder.transcode(b"3")
+    assert await first == b"1" and await second == b"2"
+    await transcoder.stop()
+    assert transcoder.stats()["rejected"] == 1
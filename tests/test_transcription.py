@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+from app.database.models import Transcription
+from app.yandex_funcs import yandex_funcs
+from app.yandex_funcs.transcription_cache import transcription_cache
+
+
+@pytest.mark.asyncio
+async def test_transcribe_audio_calls_speechkit_once(monkeypatch):
+    calls = []
+
+    async def fake_transcode(audio, file_format=None, sample_rate=16000):
+        return audio
+
+    async def fake_recognize(audio_data, language, sample_rate):
+        calls.append((audio_data, language, sample_rate))
+        await asyncio.sleep(0.01)
+        return "привет"
+
+    monkeypatch.setattr(yandex_funcs.audio_transcoder, "transcode", fake_transcode)
+    monkeypatch.setattr(yandex_funcs, "speechkit_recognize", fake_recognize)
+    transcription_cache.clear()
+
+    # Одновременные запросы одного аудио — одно распознавание
+    texts = await asyncio.gather(
+        *(yandex_funcs.transcribe_audio(b"voice", "ogg") for _ in range(3)))
+    assert texts == ["привет"] * 3
+    assert len(calls) == 1
+
+    # После сброса памяти текст берётся из БД
+    transcription_cache.clear()
+    assert await yandex_funcs.transcribe_audio(b"voice", "ogg") == "привет"
+    assert len(calls) == 1
+    assert transcription_cache.stats()["db_hits"] >= 1
+
+    # Другой язык — отдельная запись
+    await yandex_funcs.transcribe_audio(b"voice", "ogg", language="en-US")
+    assert len(calls) == 2
+    assert await Transcription.all().count() == 2